@@ -0,0 +1,154 @@
+"""Productivity analytics computed with grouped SQL aggregates.
+
+``GET /analytics/productivity`` summarises the focus sessions starting in a
+date range: completion rates by hour of day, weekday and category, focus
+minutes per day and planned versus completed sessions. Every figure comes
+from a ``GROUP BY`` query over ``focus_sessions`` (joined with ``tasks`` for
+the category), so the work is done by the database and the number of queries
+does not depend on the number of sessions. The endpoint caches the rendered
+report in the response cache, keyed by the table versions, so dashboards
+polling it only recompute after a write.
+
+Hours and weekdays are those of the stored (UTC) start times. Weekdays count
+from Monday (``0``) like ``WORK_DAYS``.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Date, Integer, case, cast, extract, func, select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+FocusSession = models.FocusSession
+
+
+def _rate(completed: int, sessions: int) -> float:
+    return round(completed / sessions, 4) if sessions else 0.0
+
+
+def _hour(dialect: str, column):
+    if dialect == "sqlite":
+        return cast(func.strftime("%H", column), Integer)
+    return cast(extract("hour", column), Integer)
+
+
+def _weekday(dialect: str, column):
+    if dialect == "sqlite":
+        # %w counts from Sunday
+        return (cast(func.strftime("%w", column), Integer) + 6) % 7
+    return cast(extract("isodow", column), Integer) - 1
+
+
+def _day(dialect: str, column):
+    if dialect == "sqlite":
+        return func.date(column)
+    return cast(column, Date)
+
+
+def _minutes(dialect: str, start, end):
+    if dialect == "sqlite":
+        return (func.julianday(end) - func.julianday(start)) * 1440
+    return extract("epoch", end - start) / 60
+
+
+class ProductivityReport:
+    """Aggregate the focus sessions starting in ``[start, end)``."""
+
+    def __init__(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        category_id: int | None = None,
+    ):
+        self.start = start
+        self.end = end
+        self.category_id = category_id
+
+    def _filters(self) -> list:
+        filters = []
+        if self.start is not None:
+            filters.append(FocusSession.start_time >= self.start)
+        if self.end is not None:
+            filters.append(FocusSession.start_time < self.end)
+        if self.category_id is not None:
+            filters.append(models.Task.category_id == self.category_id)
+        return filters
+
+    def _grouped(self, db: Session, *keys, columns=()):
+        """Count sessions and completed sessions per value of ``keys``."""
+        completed = func.sum(case((FocusSession.completed.is_(True), 1), else_=0))
+        query = (
+            select(*keys, func.count(FocusSession.id), completed, *columns)
+            .join(models.Task, models.Task.id == FocusSession.task_id)
+            .outerjoin(models.Category, models.Category.id == models.Task.category_id)
+            .where(*self._filters())
+            .group_by(*keys)
+            .order_by(*keys)
+        )
+        return db.execute(query).all()
+
+    def build(self, db: Session) -> schemas.ProductivityReport:
+        dialect = db.get_bind().dialect.name
+        start_time = FocusSession.start_time
+        minutes = _minutes(dialect, start_time, FocusSession.end_time)
+        completed_minutes = case((FocusSession.completed.is_(True), minutes), else_=0)
+
+        hour = _hour(dialect, start_time).label("hour")
+        by_hour = [
+            schemas.HourProductivity(
+                hour=h, sessions=n, completed=c, completion_rate=_rate(c, n)
+            )
+            for h, n, c in self._grouped(db, hour)
+        ]
+        weekday = _weekday(dialect, start_time).label("weekday")
+        by_weekday = [
+            schemas.WeekdayProductivity(
+                weekday=w, sessions=n, completed=c, completion_rate=_rate(c, n)
+            )
+            for w, n, c in self._grouped(db, weekday)
+        ]
+        by_category = [
+            schemas.CategoryProductivity(
+                category_id=category_id,
+                category=name,
+                sessions=n,
+                completed=c,
+                completion_rate=_rate(c, n),
+                focus_minutes=round(done or 0),
+            )
+            for category_id, name, n, c, done in self._grouped(
+                db,
+                models.Task.category_id,
+                models.Category.name,
+                columns=(func.sum(completed_minutes),),
+            )
+        ]
+        day = _day(dialect, start_time).label("day")
+        daily = [
+            schemas.DailyFocus(
+                day=d,
+                planned_sessions=n,
+                completed_sessions=c,
+                planned_minutes=round(planned or 0),
+                focus_minutes=round(done or 0),
+            )
+            for d, n, c, planned, done in self._grouped(
+                db, day, columns=(func.sum(minutes), func.sum(completed_minutes))
+            )
+        ]
+        planned = sum(row.planned_sessions for row in daily)
+        completed = sum(row.completed_sessions for row in daily)
+        return schemas.ProductivityReport(
+            start=self.start,
+            end=self.end,
+            category_id=self.category_id,
+            planned_sessions=planned,
+            completed_sessions=completed,
+            completion_rate=_rate(completed, planned),
+            focus_minutes=sum(row.focus_minutes for row in daily),
+            by_hour=by_hour,
+            by_weekday=by_weekday,
+            by_category=by_category,
+            daily=daily,
+        )
@@ -0,0 +1,366 @@
+"""Async variants of the CRUD endpoints used when ``DB_MODE=async``.
+
+The handlers mirror the synchronous ones in :mod:`app.main` but run on the
+event loop with an :class:`~sqlalchemy.ext.asyncio.AsyncSession`, so database
+I/O no longer occupies a threadpool worker. Relationships are always eager
+loaded because lazy loading is not available on an async session.
+"""
+
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import models, recurrence, schemas
+from .cache import reference_ids, response_cache
+from .database import get_async_db
+from .pagination import Page, task_includes
+from .recurrence import occurrence_window
+from .versioning import NOT_MODIFIED, AsyncConditionalGet
+
+router = APIRouter()
+
+APPOINTMENT_LOADS = (
+    selectinload(models.Appointment.tags),
+    selectinload(models.Appointment.overrides),
+)
+
+
+async def _ensure_category(db: AsyncSession, category_id: int | None) -> None:
+    if category_id is None:
+        return
+    known = await db.run_sync(reference_ids.ids, models.Category)
+    if category_id not in known:
+        raise HTTPException(status_code=404, detail="Category not found")
+
+
+async def _load_tags(db: AsyncSession, tag_ids: list[int]) -> list[models.Tag]:
+    if not tag_ids:
+        return []
+    tag_ids = list(dict.fromkeys(tag_ids))
+    result = await db.scalars(select(models.Tag).where(models.Tag.id.in_(tag_ids)))
+    by_id = {tag.id: tag for tag in result}
+    return [by_id[tag_id] for tag_id in tag_ids if tag_id in by_id]
+
+
+def _category_payload(data: schemas.CategoryCreate) -> dict:
+    payload = data.dict()
+    curve = payload.pop("energy_curve", None)
+    if curve is not None:
+        payload["energy_curve"] = ",".join(str(int(x)) for x in curve)
+    return payload
+
+
+@router.post("/categories", response_model=schemas.Category)
+async def create_category(
+    category: schemas.CategoryCreate, db: AsyncSession = Depends(get_async_db)
+):
+    db_cat = models.Category(**_category_payload(category))
+    db.add(db_cat)
+    await db.commit()
+    response_cache.invalidate("categories")
+    return schemas.Category.from_model(db_cat)
+
+
+@router.get(
+    "/categories",
+    response_model=list[schemas.Category],
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(AsyncConditionalGet("categories"))],
+)
+async def list_categories(
+    request: Request,
+    response: Response,
+    page: Page = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    cached = response_cache.lookup("categories", request, response)
+    if cached is not None:
+        return cached
+    query = page.apply(select(models.Category), models.Category.id)
+    cats = [schemas.Category.from_model(c) for c in page.rows(await db.scalars(query))]
+    return response_cache.store(
+        "categories", request, response, schemas.CATEGORY_LIST.dump_json(cats)
+    )
+
+
+@router.put("/categories/{category_id}", response_model=schemas.Category)
+async def update_category(
+    category_id: int,
+    data: schemas.CategoryCreate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_cat = await db.get(models.Category, category_id)
+    if not db_cat:
+        raise HTTPException(status_code=404, detail="Category not found")
+    for field, value in _category_payload(data).items():
+        setattr(db_cat, field, value)
+    await db.commit()
+    response_cache.invalidate("categories")
+    return schemas.Category.from_model(db_cat)
+
+
+@router.post("/tags", response_model=schemas.Tag)
+async def create_tag(tag: schemas.TagCreate, db: AsyncSession = Depends(get_async_db)):
+    db_tag = models.Tag(**tag.dict())
+    db.add(db_tag)
+    await db.commit()
+    response_cache.invalidate("tags")
+    return db_tag
+
+
+@router.get(
+    "/tags",
+    response_model=list[schemas.Tag],
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(AsyncConditionalGet("tags"))],
+)
+async def list_tags(
+    request: Request,
+    response: Response,
+    page: Page = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    cached = response_cache.lookup("tags", request, response)
+    if cached is not None:
+        return cached
+    query = page.apply(select(models.Tag), models.Tag.id)
+    tags = page.rows(await db.scalars(query))
+    return response_cache.store(
+        "tags", request, response, schemas.TAG_LIST.dump_json(tags)
+    )
+
+
+@router.post("/appointments", response_model=schemas.Appointment)
+async def create_appointment(
+    appointment: schemas.AppointmentCreate, db: AsyncSession = Depends(get_async_db)
+):
+    await _ensure_category(db, appointment.category_id)
+    data = appointment.dict()
+    tags = data.pop("tags", [])
+    db_app = models.Appointment(**data, overrides=[])
+    recurrence.prepare(db_app)
+    db_app.tags = await _load_tags(db, tags)
+    db.add(db_app)
+    await db.commit()
+    return db_app
+
+
+@router.get(
+    "/appointments",
+    response_model=list[schemas.Appointment],
+    responses=NOT_MODIFIED,
+    dependencies=[
+        Depends(AsyncConditionalGet("appointments", "appointment_tags", "tags"))
+    ],
+)
+async def list_appointments(
+    page: Page = Depends(),
+    window: tuple[datetime, datetime] | None = Depends(occurrence_window),
+    db: AsyncSession = Depends(get_async_db),
+):
+    query = select(models.Appointment).options(*APPOINTMENT_LOADS)
+    if window is not None:
+        query = query.where(recurrence.window_filter(*window))
+        return recurrence.expand(await db.scalars(query), *window)
+    query = page.apply(query, models.Appointment.start_time, models.Appointment.id)
+    return page.rows(await db.scalars(query))
+
+
+async def _get_appointment(db: AsyncSession, appointment_id: int) -> models.Appointment:
+    query = (
+        select(models.Appointment)
+        .options(*APPOINTMENT_LOADS)
+        .where(models.Appointment.id == appointment_id)
+    )
+    db_app = await db.scalar(query)
+    if not db_app:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    return db_app
+
+
+@router.put("/appointments/{appointment_id}", response_model=schemas.Appointment)
+async def update_appointment(
+    appointment_id: int,
+    appointment: schemas.AppointmentUpdate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_app = await _get_appointment(db, appointment_id)
+    await _ensure_category(db, appointment.category_id)
+    data = appointment.dict()
+    tags = data.pop("tags", [])
+    if (recurrence.normalize_rule(data["rrule"]), data["start_time"]) != (
+        db_app.rrule,
+        db_app.start_time,
+    ):
+        db_app.overrides = []
+    for field, value in data.items():
+        setattr(db_app, field, value)
+    recurrence.prepare(db_app)
+    if tags:
+        db_app.tags = await _load_tags(db, tags)
+    await db.commit()
+    return db_app
+
+
+@router.delete("/appointments/{appointment_id}")
+async def delete_appointment(
+    appointment_id: int, db: AsyncSession = Depends(get_async_db)
+):
+    db_app = await _get_appointment(db, appointment_id)
+    await db.delete(db_app)
+    await db.commit()
+    return {"detail": "Deleted"}
+
+
+@router.post("/tasks", response_model=schemas.Task)
+async def create_task(
+    task: schemas.TaskCreate, db: AsyncSession = Depends(get_async_db)
+):
+    await _ensure_category(db, task.category_id)
+    data = task.dict()
+    tags = data.pop("tags", [])
+    db_task = models.Task(**data)
+    db_task.tags = await _load_tags(db, tags)
+    db.add(db_task)
+    await db.commit()
+    return db_task
+
+
+@router.get(
+    "/tasks",
+    response_model=list[schemas.TaskDetail],
+    response_model_exclude_unset=True,
+    responses=NOT_MODIFIED,
+    dependencies=[
+        Depends(
+            AsyncConditionalGet(
+                "tasks", "task_tags", "tags", "subtasks", "focus_sessions"
+            )
+        )
+    ],
+)
+async def list_tasks(
+    include: list[str] = Depends(task_includes),
+    page: Page = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    options = [selectinload(getattr(models.Task, n)) for n in ["tags", *include]]
+    query = page.apply(select(models.Task).options(*options), models.Task.id)
+    tasks = page.rows(await db.scalars(query))
+    return [schemas.TaskDetail.from_task(t, include) for t in tasks]
+
+
+async def _get_task(db: AsyncSession, task_id: int) -> models.Task:
+    query = (
+        select(models.Task)
+        .options(selectinload(models.Task.tags))
+        .where(models.Task.id == task_id)
+    )
+    db_task = await db.scalar(query)
+    if not db_task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return db_task
+
+
+@router.put("/tasks/{task_id}", response_model=schemas.Task)
+async def update_task(
+    task_id: int, task: schemas.TaskUpdate, db: AsyncSession = Depends(get_async_db)
+):
+    db_task = await _get_task(db, task_id)
+    await _ensure_category(db, task.category_id)
+    data = task.dict()
+    tags = data.pop("tags", [])
+    for field, value in data.items():
+        setattr(db_task, field, value)
+    if tags:
+        db_task.tags = await _load_tags(db, tags)
+    await db.commit()
+    return db_task
+
+
+@router.delete("/tasks/{task_id}")
+async def delete_task(task_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_task = await _get_task(db, task_id)
+    await db.delete(db_task)
+    await db.commit()
+    return {"detail": "Deleted"}
+
+
+async def _get_focus_session(
+    db: AsyncSession, task_id: int, session_id: int
+) -> models.FocusSession:
+    session = await db.scalar(
+        select(models.FocusSession).where(
+            models.FocusSession.id == session_id,
+            models.FocusSession.task_id == task_id,
+        )
+    )
+    if not session:
+        raise HTTPException(status_code=404, detail="Focus session not found")
+    return session
+
+
+@router.post("/tasks/{task_id}/focus_sessions", response_model=schemas.FocusSession)
+async def create_focus_session(
+    task_id: int,
+    fs: schemas.FocusSessionCreate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    if await db.get(models.Task, task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    start = fs.start_time or datetime.utcnow()
+    session = models.FocusSession(
+        task_id=task_id,
+        start_time=start,
+        end_time=start + timedelta(minutes=fs.duration_minutes),
+        completed=False,
+    )
+    db.add(session)
+    await db.commit()
+    return session
+
+
+@router.get(
+    "/tasks/{task_id}/focus_sessions",
+    response_model=list[schemas.FocusSession],
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(AsyncConditionalGet("focus_sessions"))],
+)
+async def list_focus_sessions(
+    task_id: int, page: Page = Depends(), db: AsyncSession = Depends(get_async_db)
+):
+    query = page.apply(
+        select(models.FocusSession).where(models.FocusSession.task_id == task_id),
+        models.FocusSession.start_time,
+        models.FocusSession.id,
+    )
+    return page.rows(await db.scalars(query))
+
+
+@router.put(
+    "/tasks/{task_id}/focus_sessions/{session_id}", response_model=schemas.FocusSession
+)
+async def update_focus_session(
+    task_id: int,
+    session_id: int,
+    fs: schemas.FocusSessionUpdate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    session = await _get_focus_session(db, task_id, session_id)
+    for field, value in fs.dict(exclude_unset=True).items():
+        setattr(session, field, value)
+    await db.commit()
+    return session
+
+
+@router.delete("/tasks/{task_id}/focus_sessions/{session_id}")
+async def delete_focus_session(
+    task_id: int, session_id: int, db: AsyncSession = Depends(get_async_db)
+):
+    session = await _get_focus_session(db, task_id, session_id)
+    await db.delete(session)
+    await db.commit()
+    return {"detail": "Deleted"}
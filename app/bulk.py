@@ -0,0 +1,309 @@
+"""Set-based bulk writes of tasks, appointments and subtasks.
+
+``POST /tasks/bulk_update`` used to load every task and every tag with its own
+query and refresh each row after the commit, so a request cost a few queries
+per item. :class:`TaskBulkUpdate` issues a fixed number of statements
+whatever the number of items:
+
+1. one ``IN`` query for the ids of the target tasks, the tags being checked
+   against :data:`~app.cache.reference_ids`;
+2. one executemany ``UPDATE`` of the task columns;
+3. one ``DELETE`` of the replaced ``task_tags`` links and one executemany
+   ``INSERT`` of the new ones;
+4. after the commit, one query (plus the ``selectin`` load of the tags) for
+   the response.
+
+The bulk creates (:class:`BulkCreate`) and deletes (:class:`BulkDelete`) work
+the same way. Items are validated one by one, so an invalid item is reported
+in the :class:`~app.schemas.BulkResult` instead of failing the whole request,
+categories and tags are resolved for the whole batch at once, and the others
+are written in chunks of ``BULK_CHUNK_SIZE`` rows. Deletes remove dependent
+rows (subtasks, focus sessions, tag links, occurrence overrides) with one
+statement per table and record the sync tombstones themselves.
+
+The bulk statements go through the session, so table versions, change events
+and the search index follow them like ORM flushes.
+"""
+
+import os
+from datetime import datetime
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session, selectinload
+
+from . import models, recurrence, schemas
+from .cache import reference_ids
+
+CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+
+def chunks(items: list, size: int = CHUNK_SIZE):
+    for offset in range(0, len(items), size):
+        end = offset + size
+        yield items[offset:end]
+
+
+def existing_ids(db: Session, model, ids, *criteria) -> set[int]:
+    """Return those of ``ids`` naming a ``model`` row, one ``IN`` query a chunk."""
+    found = set()
+    for chunk in chunks(list(set(ids))):
+        query = select(model.id).where(model.id.in_(chunk), *criteria)
+        found.update(db.scalars(query))
+    return found
+
+
+def replace_task_tags(db: Session, links: dict[int, list[int]]) -> None:
+    """Replace the tag links of the tasks in ``links`` with the given tags."""
+    for chunk in chunks(list(links)):
+        db.execute(delete(models.TaskTag).where(models.TaskTag.task_id.in_(chunk)))
+    rows = [
+        {"task_id": task_id, "tag_id": tag_id}
+        for task_id, tag_ids in links.items()
+        for tag_id in tag_ids
+    ]
+    for chunk in chunks(rows):
+        db.execute(insert(models.TaskTag), chunk)
+
+
+class BulkUpdateItem(BaseModel):
+    id: int
+    data: schemas.TaskUpdate
+
+
+class TaskBulkUpdate:
+    """Apply a list of task updates with set-based statements.
+
+    Unknown task ids are skipped, as are unknown tag ids. An item with tags
+    replaces the tags of its task; an item without keeps them. When a task
+    appears more than once the last item wins.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def run(self, items: list[BulkUpdateItem]) -> list[models.Task]:
+        found = existing_ids(self.db, models.Task, (item.id for item in items))
+        known_tags = reference_ids.ids(self.db, models.Tag)
+        now = datetime.utcnow()
+        rows: dict[int, dict] = {}
+        links: dict[int, list[int]] = {}
+        for item in items:
+            if item.id not in found:
+                continue
+            payload = item.data.model_dump()
+            tags = payload.pop("tags", [])
+            rows[item.id] = {"id": item.id, **payload, "updated_at": now}
+            if tags:
+                links[item.id] = [t for t in dict.fromkeys(tags) if t in known_tags]
+        for chunk in chunks(list(rows.values())):
+            self.db.execute(update(models.Task), chunk)
+        replace_task_tags(self.db, links)
+        self.db.commit()
+        tasks = {
+            task.id: task
+            for chunk in chunks(list(rows))
+            for task in self.db.query(models.Task)
+            .options(selectinload(models.Task.tags))
+            .filter(models.Task.id.in_(chunk))
+        }
+        return [tasks[item.id] for item in items if item.id in tasks]
+
+
+def _validation_detail(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'item'}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+class BulkCreate:
+    """Validate and insert a list of items, reporting failures per item.
+
+    Subclasses name the ``model`` and input ``schema``, look up the foreign
+    keys of all items in :meth:`resolve` and turn an item into a row in
+    :meth:`row`, which raises ``HTTPException`` to reject the item.
+    """
+
+    model: type
+    schema: type[BaseModel]
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.now = datetime.utcnow()
+        self.result = schemas.BulkResult()
+
+    def run(self, items: list) -> schemas.BulkResult:
+        self.result.ids = [None] * len(items)
+        valid: dict[int, BaseModel] = {}
+        for index, item in enumerate(items):
+            try:
+                valid[index] = self.schema.model_validate(item)
+            except ValidationError as exc:
+                self._fail(index, _validation_detail(exc))
+        self.resolve(list(valid.values()))
+        rows: dict[int, dict] = {}
+        for index, data in valid.items():
+            try:
+                rows[index] = self.row(data)
+            except HTTPException as exc:
+                self._fail(index, exc.detail)
+        for chunk in chunks(list(rows)):
+            ids = self.db.scalars(
+                insert(self.model).returning(
+                    self.model.id, sort_by_parameter_order=True
+                ),
+                [rows[index] for index in chunk],
+            ).all()
+            for index, row_id in zip(chunk, ids):
+                self.result.ids[index] = row_id
+            self.inserted({row_id: valid[i] for i, row_id in zip(chunk, ids)})
+        self.db.commit()
+        self.result.errors.sort(key=lambda error: error.index)
+        return self.result
+
+    def _fail(self, index: int, detail: str) -> None:
+        self.result.errors.append(schemas.BulkError(index=index, detail=detail))
+
+    def resolve(self, items: list[BaseModel]) -> None:
+        """Look up the foreign keys referenced by ``items`` at once."""
+
+    def row(self, data: BaseModel) -> dict:
+        return {**data.model_dump(), "updated_at": self.now}
+
+    def inserted(self, items: dict[int, BaseModel]) -> None:
+        """Write the rows depending on the ids of an inserted chunk."""
+
+
+class CategorizedBulkCreate(BulkCreate):
+    """Bulk create of rows with an optional ``category_id``."""
+
+    def resolve(self, items: list[BaseModel]) -> None:
+        self.categories = reference_ids.ids(self.db, models.Category)
+
+    def row(self, data: BaseModel) -> dict:
+        if data.category_id is not None and data.category_id not in self.categories:
+            raise HTTPException(status_code=404, detail="Category not found")
+        return super().row(data)
+
+
+class TaskBulkCreate(CategorizedBulkCreate):
+    """Create tasks; unknown tag ids are skipped as in ``POST /tasks``."""
+
+    model = models.Task
+    schema = schemas.TaskCreate
+
+    def resolve(self, items: list[schemas.TaskCreate]) -> None:
+        super().resolve(items)
+        self.tags = reference_ids.ids(self.db, models.Tag)
+
+    def row(self, data: schemas.TaskCreate) -> dict:
+        row = super().row(data)
+        del row["tags"]
+        return row
+
+    def inserted(self, items: dict[int, schemas.TaskCreate]) -> None:
+        links = {
+            task_id: [t for t in dict.fromkeys(data.tags) if t in self.tags]
+            for task_id, data in items.items()
+            if data.tags
+        }
+        replace_task_tags(self.db, links)
+
+
+class AppointmentBulkCreate(CategorizedBulkCreate):
+    model = models.Appointment
+    schema = schemas.AppointmentCreate
+
+    def row(self, data: schemas.AppointmentCreate) -> dict:
+        row = super().row(data)
+        row["rrule"] = recurrence.normalize_rule(row["rrule"])
+        row["recurrence_end"] = recurrence.recurrence_end(
+            row["rrule"], row["start_time"], row["end_time"]
+        )
+        return row
+
+
+class SubtaskBulkCreate(BulkCreate):
+    model = models.Subtask
+    schema = schemas.SubtaskCreate
+
+    def __init__(self, db: Session, task_id: int):
+        super().__init__(db)
+        self.task_id = task_id
+
+    def row(self, data: schemas.SubtaskCreate) -> dict:
+        return {**super().row(data), "task_id": self.task_id}
+
+
+class BulkDelete:
+    """Delete rows by id with their dependent rows, reporting unknown ids.
+
+    ``children`` are synced models whose rows reference the deleted ones and
+    get tombstones too, ``links`` are plain association rows.
+    """
+
+    model: type
+    label: str
+    children: tuple = ()
+    links: tuple = ()
+
+    def __init__(self, db: Session, *criteria):
+        self.db = db
+        self.criteria = criteria
+
+    def run(self, ids: list[int]) -> schemas.BulkResult:
+        found = existing_ids(self.db, self.model, ids, *self.criteria)
+        result = schemas.BulkResult(ids=[i if i in found else None for i in ids])
+        result.errors = [
+            schemas.BulkError(index=index, detail=f"{self.label} not found")
+            for index, row_id in enumerate(ids)
+            if row_id not in found
+        ]
+        now = datetime.utcnow()
+        table = self.model.__tablename__
+        for chunk in chunks(list(found)):
+            tombstones = [(table, row_id) for row_id in chunk]
+            for child, column in self.children:
+                query = select(child.id).where(column.in_(chunk))
+                tombstones += [(child.__tablename__, i) for i in self.db.scalars(query)]
+            for link, column in (*self.children, *self.links):
+                self.db.execute(delete(link).where(column.in_(chunk)))
+            self.db.execute(delete(self.model).where(self.model.id.in_(chunk)))
+            self.db.execute(
+                insert(models.Tombstone),
+                [
+                    {"table_name": name, "row_id": row_id, "deleted_at": now}
+                    for name, row_id in tombstones
+                ],
+            )
+        self.db.commit()
+        return result
+
+
+class TaskBulkDelete(BulkDelete):
+    model = models.Task
+    label = "Task"
+    children = (
+        (models.Subtask, models.Subtask.task_id),
+        (models.FocusSession, models.FocusSession.task_id),
+    )
+    links = ((models.TaskTag, models.TaskTag.task_id),)
+
+
+class AppointmentBulkDelete(BulkDelete):
+    model = models.Appointment
+    label = "Appointment"
+    links = (
+        (models.AppointmentTag, models.AppointmentTag.appointment_id),
+        (models.AppointmentOverride, models.AppointmentOverride.appointment_id),
+    )
+
+
+class SubtaskBulkDelete(BulkDelete):
+    model = models.Subtask
+    label = "Subtask"
+
+    def __init__(self, db: Session, task_id: int):
+        super().__init__(db, models.Subtask.task_id == task_id)
@@ -0,0 +1,146 @@
+"""In-process cache of serialized JSON responses for hot collection endpoints.
+
+Entries are keyed by endpoint, the authenticated user (``request.state.user``,
+set by ``get_current_user``), the request's ``ETag`` (which encodes the
+table versions, see :mod:`app.versioning`) and query string, so a write made
+through any worker changes the key. The matching write endpoints also drop
+their entries explicitly so stale bodies do not linger until evicted.
+
+:class:`LRUCache` is also used by :mod:`app.ical` for rendered events and
+feeds.
+
+:data:`reference_ids` keeps the ids of the tags and categories so writes can
+validate the ones they reference without a query per id.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .pagination import NEXT_CURSOR_HEADER
+
+
+class LRUCache:
+    """Thread-safe bounded mapping evicting the least recently used entry.
+
+    A ``max_entries`` of ``0`` disables the cache. Keys are tuples whose first
+    item names the endpoint or kind of entry, see :meth:`invalidate`.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, endpoint: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == endpoint]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def cache_key(endpoint: str, request: Request, response: Response) -> tuple:
+    """Key a response by endpoint, user, ``ETag`` and query string."""
+    user = getattr(request.state, "user", None)
+    return (
+        endpoint,
+        getattr(user, "id", None),
+        response.headers.get("ETag"),
+        request.url.query,
+    )
+
+
+class ResponseCache(LRUCache):
+    """LRU cache of ``(body, headers)`` pairs for JSON responses."""
+
+    @staticmethod
+    def _response(body: bytes, response: Response, headers: dict) -> Response:
+        merged = {k: v for k, v in response.headers.items() if k != "content-length"}
+        merged.update((k.lower(), v) for k, v in headers.items())
+        return Response(body, media_type="application/json", headers=merged)
+
+    def lookup(
+        self, endpoint: str, request: Request, response: Response
+    ) -> Response | None:
+        """Return the cached response for this request, if any."""
+        entry = self.get(cache_key(endpoint, request, response))
+        if entry is None:
+            return None
+        body, headers = entry
+        return self._response(body, response, headers)
+
+    def store(
+        self, endpoint: str, request: Request, response: Response, body: bytes
+    ) -> Response:
+        """Cache ``body`` (with the next page cursor) and return it as a response."""
+        headers = {}
+        if NEXT_CURSOR_HEADER in response.headers:
+            headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+        self.set(cache_key(endpoint, request, response), (body, headers))
+        return self._response(body, response, headers)
+
+
+response_cache = ResponseCache(int(os.getenv("RESPONSE_CACHE_SIZE", "256")))
+
+
+class IdSetCache:
+    """Ids of the rows of small reference tables such as tags and categories.
+
+    Each entry is stored with the table's version from ``table_versions``
+    (see :mod:`app.versioning`), which every write through any worker bumps,
+    so checking an entry costs one primary key lookup for any number of ids
+    and a write invalidates it.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, tuple[int, frozenset[int]]] = {}
+        self._lock = threading.Lock()
+
+    def ids(self, db: Session, model) -> frozenset[int]:
+        table = model.__tablename__
+        version = db.scalar(
+            select(models.TableVersion.version).where(
+                models.TableVersion.table_name == table
+            )
+        )
+        entry = self._entries.get(table)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        ids = frozenset(db.scalars(select(model.id)))
+        with self._lock:
+            self._entries[table] = (version, ids)
+        return ids
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+reference_ids = IdSetCache()
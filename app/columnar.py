@@ -0,0 +1,168 @@
+"""Columnar export of the focus session history for offline analytics.
+
+``GET /focus_sessions/export`` writes every focus session joined with the
+difficulty, priority and category of its task as a Parquet file or an Arrow
+IPC stream. Rows are read from a server-side cursor (``yield_per`` on
+PostgreSQL) in partitions of ``COLUMNAR_ROW_GROUP_SIZE``; each partition is
+turned into one Arrow record batch, written as one Parquet row group or IPC
+batch and handed to the response before the next one is read, so memory use
+does not grow with the length of the history.
+
+pyarrow is only needed for this export. Without it the endpoint answers
+``501`` and the rest of the API works as before.
+"""
+
+import os
+from collections.abc import Iterator
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+ROW_GROUP_SIZE = int(os.getenv("COLUMNAR_ROW_GROUP_SIZE", "10000"))
+COLUMNAR_FORMATS = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+FILE_EXTENSIONS = {"parquet": "parquet", "arrow": "arrows"}
+
+# (column name, SQL expression, Arrow type name)
+COLUMNS = (
+    ("id", models.FocusSession.id, "int64"),
+    ("task_id", models.FocusSession.task_id, "int64"),
+    ("start_time", models.FocusSession.start_time, "timestamp"),
+    ("end_time", models.FocusSession.end_time, "timestamp"),
+    ("completed", models.FocusSession.completed, "bool_"),
+    ("priority", models.Task.priority, "int16"),
+    ("estimated_difficulty", models.Task.estimated_difficulty, "int16"),
+    ("perceived_difficulty", models.Task.perceived_difficulty, "int16"),
+    ("category_id", models.Task.category_id, "int64"),
+    ("category", models.Category.name, "string"),
+)
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def arrow_schema():
+    fields = []
+    for name, _, kind in COLUMNS:
+        if kind == "timestamp":
+            arrow_type = pa.timestamp("us")
+        else:
+            arrow_type = getattr(pa, kind)()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+class _Sink:
+    """Write-only file object whose bytes are drained after every batch."""
+
+    closed = False
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def readable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+class FocusSessionExport:
+    """Focus sessions starting in ``[start, end)``, optionally of one category."""
+
+    def __init__(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        category_id: int | None = None,
+        row_group_size: int = ROW_GROUP_SIZE,
+    ):
+        self.start = start
+        self.end = end
+        self.category_id = category_id
+        self.row_group_size = row_group_size
+
+    def query(self):
+        query = (
+            select(*(column for _, column, _ in COLUMNS))
+            .join(models.Task, models.Task.id == models.FocusSession.task_id)
+            .outerjoin(models.Category, models.Category.id == models.Task.category_id)
+        )
+        if self.start is not None:
+            query = query.where(models.FocusSession.start_time >= self.start)
+        if self.end is not None:
+            query = query.where(models.FocusSession.start_time < self.end)
+        if self.category_id is not None:
+            query = query.where(models.Task.category_id == self.category_id)
+        return query.order_by(models.FocusSession.start_time, models.FocusSession.id)
+
+    def batches(self, db: Session) -> Iterator:
+        """Yield one Arrow record batch per partition of the cursor."""
+        schema = arrow_schema()
+        result = db.execute(
+            self.query().execution_options(yield_per=self.row_group_size)
+        )
+        for rows in result.partitions():
+            arrays = [
+                pa.array(values, field.type)
+                for values, field in zip(zip(*rows), schema)
+            ]
+            yield pa.record_batch(arrays, schema=schema)
+
+    def stream(self, session_factory, format: str) -> Iterator[bytes]:
+        """Yield the file in chunks, one per row group, on a session of its own.
+
+        The session outlives the request handler, so it is not the one
+        injected into the endpoint.
+        """
+        sink = _Sink()
+        schema = arrow_schema()
+        if format == "parquet":
+            writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        else:
+            writer = ipc.new_stream(sink, schema)
+        with session_factory() as db:
+            for batch in self.batches(db):
+                if format == "parquet":
+                    writer.write_batch(batch, row_group_size=batch.num_rows)
+                else:
+                    writer.write_batch(batch)
+                yield sink.drain()
+        writer.close()
+        yield sink.drain()
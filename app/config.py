@@ -1,6 +1,6 @@
 import logging
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from pathlib import Path
 
 import yaml
@@ -14,6 +14,16 @@ class Settings:
     log_level: str = "INFO"
     secret_key: str = "change-me"
     access_token_expire_minutes: int = 30
+    read_database_url: str = ""
+    db_mode: str = "sync"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 268435456
+    sqlite_busy_timeout: int = 5000
 
 
 def setup_logging(level: str) -> None:
@@ -25,11 +35,22 @@ def setup_logging(level: str) -> None:
 
 
 class ConfigLoader:
-    """Load configuration from YAML and apply environment overrides."""
+    """Load configuration from YAML and apply environment overrides.
+
+    Every setting can be overridden with an environment variable named after
+    the upper-cased field, e.g. ``DB_POOL_SIZE`` for ``db_pool_size``.
+    """
 
     def __init__(self, path: str | None = None) -> None:
         self.path = Path(path or os.getenv("CONFIG_FILE", "config.yaml"))
 
+    def _coerce(self, value: str, default: object) -> object:
+        if isinstance(default, bool):
+            return value in {"1", "true", "True"}
+        if isinstance(default, int):
+            return int(value)
+        return value
+
     def load(self) -> Settings:
         data: dict[str, str] = {}
         if self.path.exists():
@@ -37,14 +58,14 @@ class ConfigLoader:
                 loaded = yaml.safe_load(f) or {}
             if isinstance(loaded, dict):
                 data.update({str(k): str(v) for k, v in loaded.items()})
-        if "API_URL" in os.environ:
-            data["api_url"] = os.environ["API_URL"]
-        if "LOG_LEVEL" in os.environ:
-            data["log_level"] = os.environ["LOG_LEVEL"]
-        if "SECRET_KEY" in os.environ:
-            data["secret_key"] = os.environ["SECRET_KEY"]
-        if "ACCESS_TOKEN_EXPIRE_MINUTES" in os.environ:
-            data["access_token_expire_minutes"] = os.environ[
-                "ACCESS_TOKEN_EXPIRE_MINUTES"
-            ]
-        return Settings(**{**Settings().__dict__, **data})
+        defaults = Settings()
+        values = defaults.__dict__.copy()
+        for field in fields(Settings):
+            env_name = field.name.upper()
+            if env_name in os.environ:
+                data[field.name] = os.environ[env_name]
+            if field.name in data:
+                values[field.name] = self._coerce(
+                    data[field.name], getattr(defaults, field.name)
+                )
+        return Settings(**values)
@@ -0,0 +1,127 @@
+"""Row counts of the tables reported by ``/admin/stats`` and ``/admin/metrics``.
+
+Counting rows with ``COUNT(*)`` scans the whole table on PostgreSQL, so the
+counts are kept in ``row_counts`` instead and a scrape reads one small table:
+
+* ORM flushes add the rows inserted and deleted (including cascaded deletes)
+  through ``after_insert``/``after_delete`` mapper events;
+* bulk ``INSERT``/``DELETE`` statements executed through a session add their
+  number of parameter sets or deleted rows.
+
+The counter update runs on the connection of the write, so it is committed or
+rolled back with it and is seen by every worker. Writes that bypass the ORM
+would let a counter drift, so :func:`reconcile` recounts every table whenever
+a scrape finds counts missing or older than ``METRICS_RECONCILE_SECONDS``
+(``0`` recounts on every scrape).
+"""
+
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.orm import Session, object_session
+
+from . import models
+
+RECONCILE_SECONDS = int(os.getenv("METRICS_RECONCILE_SECONDS", "3600"))
+
+COUNTED_TABLES = {
+    "tasks": models.Task,
+    "appointments": models.Appointment,
+    "categories": models.Category,
+    "focus_sessions": models.FocusSession,
+    "subtasks": models.Subtask,
+    "users": models.User,
+}
+
+
+def add_counts(connection, deltas: Counter) -> None:
+    """Add ``deltas`` to the counters of their tables on ``connection``.
+
+    Tables without a counter row are skipped; the next :func:`reconcile`
+    counts them.
+    """
+    counts = models.RowCount.__table__
+    for name, delta in sorted(deltas.items()):
+        if delta:
+            connection.execute(
+                update(counts)
+                .where(counts.c.table_name == name)
+                .values(count=counts.c.count + delta)
+            )
+
+
+def reconcile(connection) -> dict[str, int]:
+    """Recount every counted table and store the counts."""
+    counts = models.RowCount.__table__
+    now = datetime.utcnow()
+    # lock the counters so concurrent writes wait instead of being overwritten
+    existing = set(connection.scalars(select(counts.c.table_name).with_for_update()))
+    result = {}
+    for name, model in COUNTED_TABLES.items():
+        result[name] = connection.scalar(
+            select(func.count()).select_from(model.__table__)
+        )
+        values = {"count": result[name], "reconciled_at": now}
+        if name in existing:
+            connection.execute(
+                update(counts).where(counts.c.table_name == name).values(**values)
+            )
+        else:
+            connection.execute(insert(counts).values(table_name=name, **values))
+    return result
+
+
+def stored_counts(db: Session, max_age: int = RECONCILE_SECONDS) -> dict | None:
+    """Return the stored counts, or ``None`` if some are missing or too old."""
+    rows = db.query(models.RowCount).all()
+    counts = {row.table_name: row.count for row in rows}
+    oldest = min((row.reconciled_at for row in rows), default=None)
+    if set(COUNTED_TABLES) - set(counts) or (
+        oldest < datetime.utcnow() - timedelta(seconds=max_age)
+    ):
+        return None
+    return counts
+
+
+def _count(target, delta: int) -> None:
+    session = object_session(target)
+    if session is not None:
+        deltas = session.info.setdefault("row_count_deltas", Counter())
+        deltas[target.__tablename__] += delta
+
+
+for _model in COUNTED_TABLES.values():
+    event.listen(_model, "after_insert", lambda m, c, target: _count(target, 1))
+    event.listen(_model, "after_delete", lambda m, c, target: _count(target, -1))
+
+
+@event.listens_for(Session, "after_flush")
+def _add_flushed(session, flush_context):
+    deltas = session.info.pop("row_count_deltas", None)
+    if deltas:
+        add_counts(session.connection(), deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_deltas(session):
+    session.info.pop("row_count_deltas", None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _count_bulk_statements(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_delete):
+        return None
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is None or table.name not in COUNTED_TABLES:
+        return None
+    connection = orm_execute_state.session.connection()
+    if orm_execute_state.is_insert:
+        params = orm_execute_state.parameters
+        rows = len(params) if isinstance(params, list) else 1
+        add_counts(connection, Counter({table.name: rows}))
+        return None
+    result = orm_execute_state.invoke_statement()
+    add_counts(connection, Counter({table.name: -result.rowcount}))
+    return result
@@ -1,49 +1,174 @@
+import contextvars
+import functools
 import logging
 import os
 import time
 
 from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from .config import ConfigLoader, Settings
+from .profiler import QueryProfiler
+
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./appointments.db")
 
-connect_args = (
-    {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
+settings = ConfigLoader().load()
+
+
+def engine_options(url: str, settings: Settings) -> dict:
+    """Return ``create_engine`` keyword arguments tuned for the database dialect."""
+    if url.startswith("sqlite"):
+        return {
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": settings.sqlite_busy_timeout / 1000,
+            }
+        }
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
+def install_sqlite_pragmas(engine, settings: Settings) -> None:
+    """Apply journal, sync, mmap and busy timeout pragmas on every new connection."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+        cursor.close()
+
+
+# perf_counter() at which the pool checkout in progress started
+checkout_started: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "checkout_started", default=None
 )
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
+
+class TimedCheckout:
+    """Pool mixin setting :data:`checkout_started` while a checkout runs.
+
+    SQLAlchemy has no pool event before a checkout, so ``checkout`` listeners
+    such as :func:`app.metrics.instrument_engine` take the wait from it.
+    ``engine.dispose()`` recreates the pool from its class, keeping the mixin.
+    """
+
+    def connect(self):
+        token = checkout_started.set(time.perf_counter())
+        try:
+            return super().connect()
+        finally:
+            checkout_started.reset(token)
+
+
+@functools.cache
+def _timed(poolclass):
+    return type(f"Timed{poolclass.__name__}", (TimedCheckout, poolclass), {})
+
+
+def timed_pool_class(url: str):
+    """Return the default pool class of the dialect of ``url`` with timing."""
+    parsed = make_url(url)
+    return _timed(parsed.get_dialect().get_pool_class(parsed))
+
+
+def build_engine(url: str, settings: Settings):
+    """Create an engine for ``url`` using the pool and pragma settings."""
+    engine = create_engine(
+        url, poolclass=timed_pool_class(url), **engine_options(url, settings)
+    )
+    install_sqlite_pragmas(engine, settings)
+    return engine
+
+
+def async_url(url: str) -> str:
+    """Return ``url`` rewritten to use an asyncio database driver."""
+    scheme, _, rest = url.partition("://")
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    if scheme.startswith("postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+
+def build_async_engine(url: str, settings: Settings):
+    """Create an asyncio engine for ``url`` (requires aiosqlite or asyncpg)."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(
+        async_url(url),
+        poolclass=timed_pool_class(async_url(url)),
+        **engine_options(url, settings),
+    )
+    install_sqlite_pragmas(engine.sync_engine, settings)
+    return engine
+
+
+engine = build_engine(SQLALCHEMY_DATABASE_URL, settings)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+read_engine = (
+    build_engine(settings.read_database_url, settings)
+    if settings.read_database_url
+    else engine
+)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if settings.db_mode == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker
 
-class QueryProfiler:
-    """Log SQL query execution times to a file when enabled."""
+    async_engine = build_async_engine(SQLALCHEMY_DATABASE_URL, settings)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
 
-    def __init__(self, engine, path: str | None = None) -> None:
-        self.engine = engine
-        self.path = path or os.getenv("QUERY_LOG", "query.log")
-        self.enabled = os.getenv("ENABLE_QUERY_PROFILING", "0") in {"1", "true", "True"}
-        self.logger = logging.getLogger("sql.profiler")
 
-    def install(self) -> None:
-        if not self.enabled:
-            return
-        event.listen(self.engine, "before_cursor_execute", self._before)
-        event.listen(self.engine, "after_cursor_execute", self._after)
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
 
-    def _before(self, conn, cursor, statement, parameters, context, executemany):
-        context._query_start_time = time.perf_counter()
 
-    def _after(self, conn, cursor, statement, parameters, context, executemany):
-        duration = (time.perf_counter() - context._query_start_time) * 1000
-        msg = f"{duration:.2f} ms: {statement}"
-        self.logger.info(msg)
+def get_read_db():
+    """Yield a session on the read replica, falling back to the primary."""
+    db = ReadSessionLocal()
+    if read_engine is not engine:
         try:
-            with open(self.path, "a", encoding="utf-8") as f:
-                f.write(msg + "\n")
-        except OSError:
-            self.logger.warning("Failed to write query log")
+            db.connection()
+        except OperationalError:
+            logging.getLogger(__name__).warning(
+                "Read replica unavailable, falling back to primary"
+            )
+            db.close()
+            db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """Yield an ``AsyncSession`` on the primary (``DB_MODE=async`` only)."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+Base = declarative_base()
 
 
-QueryProfiler(engine).install()
+profiler = QueryProfiler()
+profiler.install(engine)
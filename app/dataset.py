@@ -0,0 +1,299 @@
+"""Streaming NDJSON export and import of the whole dataset.
+
+``GET /export?format=ndjson`` writes one JSON object per line, tagged with its
+``type``: every category and tag, then every task with its ``subtasks``,
+``focus_sessions`` and tag ids, then every appointment with its tag ids and
+occurrence ``overrides``. Objects carry all columns of their row. Rows are
+read with ``yield_per`` in batches of ``EXPORT_BATCH_SIZE`` (a server-side
+cursor on PostgreSQL), the related rows of each batch being loaded with one
+``selectin`` query per relationship, so memory use does not grow with the
+size of the dataset. Clients accepting gzip get the stream compressed on the
+fly.
+
+``POST /import`` reads such a file (gzipped or not) line by line and writes
+it with bulk statements in chunks of ``IMPORT_CHUNK_SIZE`` objects. Rows are
+matched by id: existing ones are updated and the others inserted with their
+id. The tag links and overrides of imported rows are replaced by those in
+the file and ``updated_at`` is set to the time of the import, so delta sync
+and the caches keyed by it see the imported rows as changed. Like the iCal
+import, the file is imported in the request's transaction, completely or not
+at all.
+"""
+
+import gzip
+import json
+import os
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from datetime import date, datetime
+from datetime import time as dtime
+from typing import BinaryIO
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+
+from . import models, schemas
+from .bulk import existing_ids
+
+BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# bytes collected before handing a chunk to the response
+CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = ("ndjson",)
+RECORD_TYPES = {
+    "category": models.Category,
+    "tag": models.Tag,
+    "task": models.Task,
+    "appointment": models.Appointment,
+}
+# nested objects of a record: (model, column referencing the parent, whether
+# they are matched by id rather than replaced)
+CHILDREN = {
+    "task": {
+        "subtasks": (models.Subtask, "task_id", True),
+        "focus_sessions": (models.FocusSession, "task_id", True),
+    },
+    "appointment": {"overrides": (models.AppointmentOverride, "appointment_id", False)},
+}
+# tag links of a record: (association model, column referencing the parent)
+TAG_LINKS = {
+    "task": (models.TaskTag, "task_id"),
+    "appointment": (models.AppointmentTag, "appointment_id"),
+}
+
+
+def _columns(obj, exclude: Iterable[str] = ()) -> dict:
+    return {
+        column.key: getattr(obj, column.key)
+        for column in obj.__table__.columns
+        if column.key not in exclude
+    }
+
+
+def _encode(value):
+    if isinstance(value, (date, dtime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def records(db: Session) -> Iterator[dict]:
+    """Yield the export objects of the whole dataset."""
+    for kind in ("category", "tag"):
+        model = RECORD_TYPES[kind]
+        for row in db.query(model).order_by(model.id).yield_per(BATCH_SIZE):
+            yield {"type": kind, **_columns(row)}
+    tasks = (
+        db.query(models.Task)
+        .options(
+            selectinload(models.Task.tags),
+            selectinload(models.Task.subtasks),
+            selectinload(models.Task.focus_sessions),
+        )
+        .order_by(models.Task.id)
+    )
+    for task in tasks.yield_per(BATCH_SIZE):
+        yield {
+            "type": "task",
+            **_columns(task),
+            "tags": [tag.id for tag in task.tags],
+            "subtasks": [_columns(s, {"task_id"}) for s in task.subtasks],
+            "focus_sessions": [_columns(f, {"task_id"}) for f in task.focus_sessions],
+        }
+    appointments = (
+        db.query(models.Appointment)
+        .options(
+            selectinload(models.Appointment.tags),
+            selectinload(models.Appointment.overrides),
+        )
+        .order_by(models.Appointment.id)
+    )
+    for appt in appointments.yield_per(BATCH_SIZE):
+        yield {
+            "type": "appointment",
+            **_columns(appt),
+            "tags": [tag.id for tag in appt.tags],
+            "overrides": [
+                _columns(o, {"id", "appointment_id"}) for o in appt.overrides
+            ],
+        }
+
+
+def export_ndjson(session_factory) -> Iterator[bytes]:
+    """Yield the NDJSON export in chunks, reading rows on a session of its own.
+
+    The session outlives the request handler, so it is not the one injected
+    into the endpoint.
+    """
+    with session_factory() as db:
+        buffer = bytearray()
+        for record in records(db):
+            buffer += json.dumps(record, default=_encode).encode()
+            buffer += b"\n"
+            if len(buffer) >= CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        yield bytes(buffer)
+
+
+def gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _lines(stream: BinaryIO) -> Iterator[bytes]:
+    """Iterate the lines of ``stream``, decompressing it if it is gzipped."""
+    magic = stream.read(2)
+    stream.seek(0)
+    if magic == b"\x1f\x8b":
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    return iter(stream)
+
+
+def _decode(model, data: dict, exclude: Iterable[str] = ()) -> dict:
+    """Return the column values of ``model`` in the JSON object ``data``."""
+    row = {}
+    for column in model.__table__.columns:
+        key = column.key
+        if key in exclude:
+            continue
+        if key not in data:
+            if column.primary_key or (column.default is None and not column.nullable):
+                raise ValueError(f"missing {key}")
+            default = column.default
+            scalar = default is not None and default.is_scalar
+            row[key] = default.arg if scalar else None
+            continue
+        value = data[key]
+        kind = column.type.python_type
+        if value is not None and kind in (datetime, date, dtime):
+            value = kind.fromisoformat(value)
+        row[key] = value
+    return row
+
+
+class DatasetImport:
+    """Import an NDJSON export, upserting rows by id in chunks."""
+
+    def __init__(self, db: Session, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.now = datetime.utcnow()
+        self.result = schemas.DatasetImportResult()
+
+    def run(self, stream: BinaryIO) -> schemas.DatasetImportResult:
+        started = time.perf_counter()
+        kind, chunk = None, {}
+        for number, line in enumerate(_lines(stream), 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                record_kind, row, nested = self._parse(record)
+            except (ValueError, TypeError, KeyError, AttributeError) as exc:
+                raise HTTPException(
+                    status_code=400, detail=f"Line {number}: invalid record: {exc}"
+                )
+            if record_kind != kind or len(chunk) >= self.chunk_size:
+                self._write(kind, chunk)
+                kind, chunk = record_kind, {}
+            # a repeated id within a chunk keeps the last object
+            chunk[row["id"]] = (row, nested)
+        self._write(kind, chunk)
+        self._reset_sequences()
+        self.result.seconds = round(time.perf_counter() - started, 3)
+        return self.result
+
+    def _parse(self, record: dict) -> tuple[str, dict, dict]:
+        kind = record["type"]
+        if kind not in RECORD_TYPES:
+            raise ValueError(f"unknown type {kind!r}")
+        row = _decode(RECORD_TYPES[kind], record)
+        nested = {}
+        for key, (model, parent, keyed) in CHILDREN.get(kind, {}).items():
+            exclude = {parent} if keyed else {parent, "id"}
+            items = record.get(key, [])
+            nested[key] = [_decode(model, item, exclude) for item in items]
+        if kind in TAG_LINKS:
+            nested["tags"] = [int(tag_id) for tag_id in record.get("tags", [])]
+        return kind, row, nested
+
+    def _write(self, kind: str | None, chunk: dict[int, tuple[dict, dict]]) -> None:
+        if not chunk:
+            return
+        rows = [row for row, _ in chunk.values()]
+        self._upsert(RECORD_TYPES[kind], rows)
+        for key, (model, parent, keyed) in CHILDREN.get(kind, {}).items():
+            children = [
+                {**child, parent: row_id}
+                for row_id, (_, nested) in chunk.items()
+                for child in nested[key]
+            ]
+            if keyed:
+                self._upsert(model, children)
+            else:
+                self._replace(model, parent, list(chunk), children)
+        if kind in TAG_LINKS:
+            model, parent = TAG_LINKS[kind]
+            tags = existing_ids(
+                self.db,
+                models.Tag,
+                (t for _, nested in chunk.values() for t in nested["tags"]),
+            )
+            links = [
+                {parent: row_id, "tag_id": tag_id}
+                for row_id, (_, nested) in chunk.items()
+                for tag_id in dict.fromkeys(nested["tags"])
+                if tag_id in tags
+            ]
+            self._replace(model, parent, list(chunk), links)
+
+    def _upsert(self, model, rows: list[dict]) -> None:
+        if not rows:
+            return
+        rows = list({row["id"]: row for row in rows}.values())
+        if "updated_at" in model.__table__.columns:
+            for row in rows:
+                row["updated_at"] = self.now
+        existing = existing_ids(self.db, model, (row["id"] for row in rows))
+        new = [row for row in rows if row["id"] not in existing]
+        changed = [row for row in rows if row["id"] in existing]
+        try:
+            if new:
+                self.db.execute(insert(model), new)
+            if changed:
+                self.db.execute(update(model), changed)
+        except IntegrityError as exc:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Conflicting {model.__tablename__}: {exc.orig}",
+            )
+        name = model.__tablename__
+        self.result.created[name] = self.result.created.get(name, 0) + len(new)
+        self.result.updated[name] = self.result.updated.get(name, 0) + len(changed)
+
+    def _replace(self, model, parent: str, parent_ids: list[int], rows: list[dict]):
+        """Replace the rows of ``model`` belonging to ``parent_ids`` by ``rows``."""
+        column = getattr(model, parent)
+        self.db.execute(delete(model).where(column.in_(parent_ids)))
+        if rows:
+            self.db.execute(insert(model), rows)
+
+    def _reset_sequences(self) -> None:
+        """Move PostgreSQL id sequences past the ids inserted explicitly."""
+        if self.db.get_bind().dialect.name != "postgresql":
+            return
+        for table in self.result.created:
+            self.db.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'),"
+                    f" coalesce(max(id), 1)) FROM {table}"
+                )
+            )
@@ -0,0 +1,268 @@
+"""Change notifications pushed to clients over Server-Sent Events.
+
+Committed ORM changes to the synced tables (see :mod:`app.sync`) are turned
+into ``{"table": ..., "op": "created"|"updated"|"deleted", "id": ...}`` events
+and published on an in-process :class:`EventBus`; ``GET /events`` streams them
+to every connected client. Because the hooks sit on the session, writes made
+by the planner are reported exactly like those of the CRUD routers. Bulk ORM
+statements report ``"id": null`` meaning "anything in this table".
+
+With several workers each process only sees its own commits. Setting
+``EVENTS_BROKER_URL=tcp://host:port`` makes every worker forward its events to
+a broker that relays them to the other workers; ``python -m app.events`` runs
+a minimal broker suitable as a local stand-in for a real message bus.
+
+Open streams are ended as soon as uvicorn starts shutting down: uvicorn waits
+for every response to finish before it runs the lifespan shutdown, so the bus
+watches the ``should_exit`` flag of the uvicorn server instead (found through
+the SIGTERM handler uvicorn installs, the bus installs none itself). Under
+other servers the streams end at lifespan shutdown, which needs
+``--timeout-graceful-shutdown`` or its equivalent. Clients reconnect after the
+``retry`` delay.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import threading
+from collections.abc import AsyncIterator
+from urllib.parse import urlparse
+
+from fastapi import Request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from . import models
+from .sync import SYNCED_MODELS
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "1000"))
+KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+BROKER_URL = os.getenv("EVENTS_BROKER_URL", "")
+# how often the uvicorn server is checked for a pending shutdown
+SHUTDOWN_POLL_SECONDS = 0.2
+
+
+def _uvicorn_server():
+    """Return the uvicorn ``Server`` running this process, if there is one.
+
+    While it serves, uvicorn installs its ``Server.handle_exit`` method as the
+    SIGTERM handler; ``should_exit`` is set on it when shutdown starts.
+    """
+    server = getattr(signal.getsignal(signal.SIGTERM), "__self__", None)
+    return server if hasattr(server, "should_exit") else None
+
+
+class EventBus:
+    """Fan events out to the ``asyncio.Queue`` of every subscriber.
+
+    :meth:`publish` may be called from any thread; delivery always happens on
+    the event loop the bus was started on.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: set[asyncio.Queue] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._broker_task: asyncio.Task | None = None
+        self._watch_task: asyncio.Task | None = None
+        self._closing = False
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def start(self, broker_url: str = "") -> None:
+        """Bind to the running loop and connect to the broker, if configured.
+
+        Under uvicorn the open streams are also ended once the server is asked
+        to exit, see :meth:`_watch_exit`.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._closing = False
+        if broker_url:
+            self._broker_task = self._loop.create_task(self._run_broker(broker_url))
+        server = _uvicorn_server()
+        if server is not None:
+            self._watch_task = self._loop.create_task(self._watch_exit(server))
+
+    async def stop(self) -> None:
+        """End the open streams and disconnect from the broker."""
+        self.close()
+        for task in (self._broker_task, self._watch_task):
+            if task is not None:
+                task.cancel()
+        self._broker_task = self._watch_task = None
+        self._loop = None
+
+    async def _watch_exit(self, server) -> None:
+        # uvicorn waits for open responses before the lifespan shutdown, so the
+        # streams have to end when it starts shutting down
+        while not server.should_exit:
+            await asyncio.sleep(SHUTDOWN_POLL_SECONDS)
+        self._closing = True
+        self._close_subscribers()
+
+    def close(self) -> None:
+        """End every open stream."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._close_subscribers)
+
+    def _close_subscribers(self) -> None:
+        for queue in list(self._subscribers):
+            while queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        if self._closing:
+            queue.put_nowait(None)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, events: list[dict]) -> None:
+        """Deliver ``events`` locally and forward them to the broker."""
+        loop = self._loop
+        if loop is None or not events:
+            return
+        loop.call_soon_threadsafe(self._dispatch, events, True)
+
+    def _dispatch(self, events: list[dict], forward: bool) -> None:
+        for data in events:
+            with self._lock:
+                self._next_id += 1
+                item = (self._next_id, data)
+            for queue in list(self._subscribers):
+                try:
+                    queue.put_nowait(item)
+                except asyncio.QueueFull:
+                    # a stalled client misses events rather than blocking others
+                    logger.warning("Dropping event for slow /events subscriber")
+        if forward and self._writer is not None:
+            payload = "".join(json.dumps(data) + "\n" for data in events)
+            self._writer.write(payload.encode())
+
+    async def _run_broker(self, url: str) -> None:
+        parsed = urlparse(url)
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_connection(
+                    parsed.hostname, parsed.port
+                )
+                logger.info("Connected to event broker %s", url)
+                while line := await reader.readline():
+                    self._dispatch([json.loads(line)], False)
+            except (OSError, ValueError) as exc:
+                logger.warning("Event broker %s unavailable: %s", url, exc)
+            finally:
+                if self._writer is not None:
+                    self._writer.close()
+                    self._writer = None
+            await asyncio.sleep(1)
+
+
+bus = EventBus()
+
+
+def _record(session: Session, table: str, op: str, row_id: int | None) -> None:
+    session.info.setdefault("pending_events", []).append(
+        {"table": table, "op": op, "id": row_id}
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_events(session, flush_context):
+    for objects, op in (
+        (session.new, "created"),
+        (session.dirty, "updated"),
+        (session.deleted, "deleted"),
+    ):
+        for obj in objects:
+            if not isinstance(obj, models.Synced):
+                continue
+            if op == "updated" and not session.is_modified(obj):
+                continue
+            _record(session, inspect(obj).mapper.local_table.name, op, obj.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_events(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        op = "updated" if orm_execute_state.is_update else "deleted"
+    elif orm_execute_state.is_insert:
+        op = "created"
+    else:
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is not None and table.name in SYNCED_MODELS:
+        _record(orm_execute_state.session, table.name, op, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_events(session):
+    bus.publish(session.info.pop("pending_events", []))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_events(session):
+    session.info.pop("pending_events", None)
+
+
+def format_event(event_id: int, data: dict) -> str:
+    return f"id: {event_id}\nevent: change\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(request: Request, tables: set[str] | None) -> AsyncIterator[str]:
+    """Yield SSE frames for ``bus`` events until the client disconnects."""
+    queue = bus.subscribe()
+    try:
+        yield "retry: 3000\n: connected\n\n"
+        while not await request.is_disconnected():
+            try:
+                item = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if item is None:
+                return
+            if tables is None or item[1]["table"] in tables:
+                yield format_event(*item)
+    finally:
+        bus.unsubscribe(queue)
+
+
+async def _serve_broker(host: str, port: int) -> None:
+    clients: set[asyncio.StreamWriter] = set()
+
+    async def relay(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        clients.add(writer)
+        try:
+            while line := await reader.readline():
+                for other in list(clients):
+                    if other is not writer:
+                        other.write(line)
+        except OSError:
+            pass
+        finally:
+            clients.discard(writer)
+            writer.close()
+
+    server = await asyncio.start_server(relay, host, port)
+    logger.info("Event broker listening on %s:%s", host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":  # pragma: no cover - manual execution
+    parser = argparse.ArgumentParser(description="Relay /events between workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve_broker(args.host, args.port))
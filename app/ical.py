@@ -0,0 +1,608 @@
+"""Streaming iCalendar export and import.
+
+The calendar is written one ``VEVENT`` at a time while rows are read in
+batches of ``ICAL_BATCH_SIZE`` with ``yield_per`` (a server-side cursor on
+PostgreSQL), so memory use does not grow with the number of events. Focus
+sessions and timed tasks can be included as additional components.
+
+Calendar clients poll subscribed feeds, so two caches avoid redoing work:
+
+* the rendered ``VEVENT`` bytes of every row, keyed by the row's
+  ``updated_at`` (and the category or task title it shows), so a rebuilt feed
+  only renders events that changed;
+* the gzip-compressed feed per user, ``ETag`` and query string. It is filled
+  while the first request streams the feed and served as is, with
+  ``Content-Encoding: gzip`` where accepted, until the data changes.
+
+Imports are parsed line by line as well. Events are matched to appointments
+by their ``UID`` and written with bulk ``INSERT``/``UPDATE`` statements in
+chunks of ``ICAL_IMPORT_CHUNK_SIZE``, all in the transaction of the request,
+so a file either imports completely or not at all.
+
+Recurring appointments (see :mod:`app.recurrence`) are exported once with
+their ``RRULE``, ``EXDATE`` and a ``RECURRENCE-ID`` event per moved
+occurrence, leaving the expansion to the client. The import reads ``RRULE``
+and ``EXDATE``; moved occurrences are skipped.
+"""
+
+import gzip
+import os
+import re
+import time
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from datetime import date, datetime, timedelta, timezone
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from icalendar import Event
+from icalendar.parser import Contentline
+from icalendar.prop import vDDDTypes, vRecur
+from sqlalchemy import and_, delete, func, insert, or_, update
+from sqlalchemy.orm import Session, selectinload
+
+from . import models, recurrence, schemas
+from .cache import LRUCache, cache_key
+
+BATCH_SIZE = int(os.getenv("ICAL_BATCH_SIZE", "500"))
+IMPORT_CHUNK_SIZE = int(os.getenv("ICAL_IMPORT_CHUNK_SIZE", "1000"))
+UID_DOMAIN = os.getenv("ICAL_UID_DOMAIN", "appointments.local")
+ICAL_COMPONENTS = ("focus_sessions", "tasks")
+# bytes collected before handing a chunk to the response
+CHUNK_SIZE = 64 * 1024
+
+# a rendered event takes about 550 bytes (benchmarks/ical_export.py), so the
+# default holds about 5 MiB per process
+vevent_cache = LRUCache(int(os.getenv("ICAL_EVENT_CACHE_SIZE", "10000")))
+feed_cache = LRUCache(int(os.getenv("ICAL_FEED_CACHE_SIZE", "32")))
+
+HEADER = b"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Appointments//Calendar//EN\r\n"
+FOOTER = b"END:VCALENDAR\r\n"
+
+
+def ical_components(include: str | None = None) -> list[str]:
+    """Return the optional components requested with ``include=tasks,...``."""
+    if not include:
+        return []
+    names = list(dict.fromkeys(n.strip() for n in include.split(",") if n.strip()))
+    unknown = [n for n in names if n not in ICAL_COMPONENTS]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown include: {', '.join(unknown)}"
+        )
+    return names
+
+
+def _event(uid: str, stamp: datetime | None, summary: str, start, end) -> Event:
+    event = Event()
+    event.add("uid", uid if "@" in uid else f"{uid}@{UID_DOMAIN}")
+    event.add("dtstamp", stamp or datetime.utcnow())
+    event.add("summary", summary)
+    event.add("dtstart", start)
+    event.add("dtend", end)
+    return event
+
+
+def appointment_vevent(appt: models.Appointment, category: str | None) -> bytes:
+    """Render an appointment, with its rule and overrides if it recurs."""
+    uid = appt.uid or f"appointment-{appt.id}"
+    event = _event(uid, appt.updated_at, appt.title, appt.start_time, appt.end_time)
+    event.add("description", appt.description or "")
+    if category:
+        event.add("categories", [category])
+    if not appt.rrule:
+        return event.to_ical()
+    event.add("rrule", vRecur.from_ical(appt.rrule))
+    exdates = [o.recurrence_id for o in appt.overrides if o.cancelled]
+    if exdates:
+        event.add("exdate", exdates)
+    data = event.to_ical()
+    for override in appt.overrides:
+        if override.cancelled:
+            continue
+        moved = _event(
+            uid,
+            appt.updated_at,
+            override.title or appt.title,
+            override.start_time,
+            override.end_time,
+        )
+        moved.add("recurrence-id", override.recurrence_id)
+        moved.add("description", override.description or appt.description or "")
+        data += moved.to_ical()
+    return data
+
+
+def focus_session_vevent(session: models.FocusSession, title: str) -> bytes:
+    event = _event(
+        f"focus-session-{session.id}",
+        session.updated_at,
+        f"Focus: {title}",
+        session.start_time,
+        session.end_time,
+    )
+    return event.to_ical()
+
+
+def task_vevent(task: models.Task, start: datetime, end: datetime) -> bytes:
+    event = _event(f"task-{task.id}", task.updated_at, task.title, start, end)
+    event.add("description", task.description or "")
+    return event.to_ical()
+
+
+def task_window(task: models.Task) -> tuple[datetime, datetime]:
+    start = datetime.combine(task.start_date, task.start_time)
+    end = datetime.combine(task.end_date or task.start_date, task.end_time)
+    return start, end
+
+
+def cached_vevent(key: tuple, version: tuple, render: Callable[[], bytes]) -> bytes:
+    """Return the rendered event for ``key`` unless ``version`` changed."""
+    entry = vevent_cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    data = render()
+    vevent_cache.set(key, (version, data))
+    return data
+
+
+class IcalExport:
+    """Filters of one export and the queries producing its components."""
+
+    def __init__(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        category_id: int | None = None,
+        include: list[str] | None = None,
+    ):
+        self.start = start
+        self.end = end
+        self.category_id = category_id
+        self.include = include or []
+
+    def appointments(self, db: Session):
+        query = (
+            db.query(models.Appointment, models.Category.name)
+            .outerjoin(
+                models.Category, models.Category.id == models.Appointment.category_id
+            )
+            .options(selectinload(models.Appointment.overrides))
+        )
+        # recurring appointments are exported once with their rule
+        if self.start is not None:
+            query = query.filter(
+                or_(
+                    models.Appointment.end_time > self.start,
+                    and_(
+                        models.Appointment.rrule.isnot(None),
+                        or_(
+                            models.Appointment.recurrence_end.is_(None),
+                            models.Appointment.recurrence_end > self.start,
+                        ),
+                    ),
+                )
+            )
+        if self.end is not None:
+            query = query.filter(models.Appointment.start_time < self.end)
+        if self.category_id is not None:
+            query = query.filter(models.Appointment.category_id == self.category_id)
+        return query.order_by(models.Appointment.start_time, models.Appointment.id)
+
+    def focus_sessions(self, db: Session):
+        query = db.query(models.FocusSession, models.Task.title).join(
+            models.Task, models.Task.id == models.FocusSession.task_id
+        )
+        if self.start is not None:
+            query = query.filter(models.FocusSession.end_time > self.start)
+        if self.end is not None:
+            query = query.filter(models.FocusSession.start_time < self.end)
+        if self.category_id is not None:
+            query = query.filter(models.Task.category_id == self.category_id)
+        return query.order_by(models.FocusSession.start_time, models.FocusSession.id)
+
+    def tasks(self, db: Session):
+        query = db.query(models.Task).filter(
+            models.Task.start_date.isnot(None),
+            models.Task.start_time.isnot(None),
+            models.Task.end_time.isnot(None),
+        )
+        # narrow by date in SQL, the exact overlap is checked per row
+        last_day = func.coalesce(models.Task.end_date, models.Task.start_date)
+        if self.start is not None:
+            query = query.filter(last_day >= self.start.date())
+        if self.end is not None:
+            query = query.filter(models.Task.start_date <= self.end.date())
+        if self.category_id is not None:
+            query = query.filter(models.Task.category_id == self.category_id)
+        return query.order_by(models.Task.start_date, models.Task.id)
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        return (self.start is None or end > self.start) and (
+            self.end is None or start < self.end
+        )
+
+    def vevents(self, db: Session) -> Iterator[bytes]:
+        for appt, category in self.appointments(db).yield_per(BATCH_SIZE):
+            yield cached_vevent(
+                ("appointment", appt.id),
+                (appt.updated_at, category),
+                lambda: appointment_vevent(appt, category),
+            )
+        if "focus_sessions" in self.include:
+            for session, title in self.focus_sessions(db).yield_per(BATCH_SIZE):
+                yield cached_vevent(
+                    ("focus_session", session.id),
+                    (session.updated_at, title),
+                    lambda: focus_session_vevent(session, title),
+                )
+        if "tasks" in self.include:
+            for task in self.tasks(db).yield_per(BATCH_SIZE):
+                start, end = task_window(task)
+                if self.overlaps(start, end):
+                    yield cached_vevent(
+                        ("task", task.id),
+                        (task.updated_at,),
+                        lambda: task_vevent(task, start, end),
+                    )
+
+    def stream(self, session_factory) -> Iterator[bytes]:
+        """Yield the calendar in chunks, reading rows on a session of its own.
+
+        The session outlives the request handler, so it is not the one
+        injected into the endpoint.
+        """
+        with session_factory() as db:
+            buffer = bytearray(HEADER)
+            for vevent in self.vevents(db):
+                buffer += vevent
+                if len(buffer) >= CHUNK_SIZE:
+                    yield bytes(buffer)
+                    buffer.clear()
+            buffer += FOOTER
+            yield bytes(buffer)
+
+
+def _compress_and_store(
+    chunks: Iterator[bytes], key: tuple, send_gzip: bool
+) -> Iterator[bytes]:
+    """Pass ``chunks`` through (gzipped if requested) and cache the gzip feed.
+
+    Nothing is cached when the client disconnects before the end.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    parts = []
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        parts.append(compressed)
+        if not send_gzip:
+            yield chunk
+        elif compressed:
+            yield compressed
+    parts.append(compressor.flush())
+    if send_gzip:
+        yield parts[-1]
+    feed_cache.set(key, b"".join(parts))
+
+
+def feed_response(
+    export: IcalExport, request: Request, response: Response, session_factory
+) -> Response:
+    """Serve the feed for ``export`` from the feed cache or stream and cache it."""
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    headers["Vary"] = "Accept-Encoding"
+    send_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    if send_gzip:
+        headers["Content-Encoding"] = "gzip"
+    key = cache_key("ical", request, response)
+    body = feed_cache.get(key)
+    if body is not None:
+        if not send_gzip:
+            body = gzip.decompress(body)
+        return Response(body, media_type="text/calendar", headers=headers)
+    chunks = _compress_and_store(export.stream(session_factory), key, send_gzip)
+    return StreamingResponse(chunks, media_type="text/calendar", headers=headers)
+
+
+# properties of a VEVENT used by the import
+IMPORTED_PROPERTIES = {
+    "UID",
+    "SUMMARY",
+    "DESCRIPTION",
+    "DTSTART",
+    "DTEND",
+    "DURATION",
+    "CATEGORIES",
+    "RECURRENCE-ID",
+    "RRULE",
+    "EXDATE",
+}
+# properties that may occur more than once per event
+REPEATED_PROPERTIES = {"EXDATE"}
+PROPERTY_NAME = re.compile(r"[^:;]*")
+ESCAPED = re.compile(r"\\([\\;,nN])")
+
+
+def _unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+    return ESCAPED.sub(lambda m: "\n" if m[1] in "nN" else m[1], value)
+
+
+def _unfold(lines: Iterable[bytes]) -> Iterator[tuple[int, str]]:
+    """Yield ``(line number, content line)`` with continuation lines joined."""
+    current, number = b"", 0
+    for index, raw in enumerate(lines, 1):
+        raw = raw.rstrip(b"\r\n")
+        if raw[:1] in (b" ", b"\t"):
+            current += raw[1:]
+            continue
+        if current:
+            yield number, current.decode("utf-8", errors="replace")
+        current, number = raw, index
+    if current:
+        yield number, current.decode("utf-8", errors="replace")
+
+
+def parse_vevents(lines: Iterable[bytes]) -> Iterator[dict[str, tuple]]:
+    """Yield the properties of each top-level ``VEVENT`` in ``lines``.
+
+    Values are ``(parameters, value)`` pairs, lists of them for ``EXDATE``.
+    Components nested in an event, such as alarms, are ignored.
+    """
+    calendar = False
+    props: dict[str, tuple] | None = None
+    depth = 0
+    for number, line in _unfold(lines):
+        # parsing a content line in full is slow, so only the properties used
+        # by the import are parsed
+        name = PROPERTY_NAME.match(line)[0].upper()
+        if name in ("BEGIN", "END"):
+            value = line.partition(":")[2].strip().upper()
+            if name == "END":
+                if props is None:
+                    continue
+                if depth:
+                    depth -= 1
+                else:
+                    yield props
+                    props = None
+            elif value == "VCALENDAR":
+                calendar = True
+            elif props is not None:
+                depth += 1
+            elif value == "VEVENT":
+                props = {}
+        elif props is not None and not depth and name in IMPORTED_PROPERTIES:
+            if line.startswith(":", len(name)):
+                prop = ({}, _unescape(line.partition(":")[2]))
+            else:
+                try:
+                    prop = tuple(Contentline(line).parts()[1:])
+                except ValueError as exc:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Invalid iCalendar line {number}: {exc}",
+                    )
+            if name in REPEATED_PROPERTIES:
+                props.setdefault(name, []).append(prop)
+            else:
+                props[name] = prop
+    if not calendar:
+        raise HTTPException(status_code=400, detail="Not an iCalendar file")
+
+
+def _to_datetime(params, value: str) -> tuple[datetime, bool]:
+    """Return the naive UTC datetime of a date-time property and if it is a date."""
+    parsed = vDDDTypes.from_ical(value, timezone=params.get("TZID"))
+    if isinstance(parsed, datetime):
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed, False
+    if isinstance(parsed, date):
+        return datetime.combine(parsed, datetime.min.time()), True
+    raise ValueError(f"Expected a date or date-time, got: {value}")
+
+
+def _times(props: dict[str, tuple]) -> tuple[datetime, datetime] | None:
+    """Return the start and end of an event, ``None`` if it ends before it starts."""
+    start, all_day = _to_datetime(*props["DTSTART"])
+    if "DTEND" in props:
+        end = _to_datetime(*props["DTEND"])[0]
+    elif "DURATION" in props:
+        end = start + vDDDTypes.from_ical(props["DURATION"][1])
+    else:
+        end = start + timedelta(days=1) if all_day else start
+    return (start, end) if end >= start else None
+
+
+def appointment_row(props: dict[str, tuple], categories: dict[str, int]) -> dict | None:
+    """Map a parsed ``VEVENT`` to appointment columns.
+
+    Returns ``None`` for events that cannot be imported: those without
+    ``UID`` or ``DTSTART``, moved occurrences (see :func:`override_values`)
+    and events ending before they start.
+    """
+    if "UID" not in props or "DTSTART" not in props or "RECURRENCE-ID" in props:
+        return None
+    times = _times(props)
+    if times is None:
+        return None
+    start, end = times
+    start_params = props["DTSTART"][0]
+    category = props.get("CATEGORIES", (None, ""))[1].split(",")[0].strip()
+    rule = recurrence.normalize_rule(props.get("RRULE", (None, None))[1])
+    return {
+        "uid": props["UID"][1],
+        "title": props.get("SUMMARY", (None, ""))[1] or "(untitled)",
+        "description": props.get("DESCRIPTION", (None, None))[1],
+        "start_time": start,
+        "end_time": end,
+        "timezone": start_params.get("TZID", "UTC"),
+        "category_id": categories.get(category),
+        "rrule": rule,
+        "recurrence_end": recurrence.recurrence_end(rule, start, end),
+    }
+
+
+def override_values(props: dict[str, tuple]) -> dict | None:
+    """Map a ``VEVENT`` with ``RECURRENCE-ID`` to override columns."""
+    if "UID" not in props or "DTSTART" not in props:
+        return None
+    times = _times(props)
+    if times is None:
+        return None
+    return {
+        "recurrence_id": _to_datetime(*props["RECURRENCE-ID"])[0],
+        "cancelled": False,
+        "start_time": times[0],
+        "end_time": times[1],
+        "title": props.get("SUMMARY", (None, None))[1],
+        "description": props.get("DESCRIPTION", (None, None))[1],
+    }
+
+
+def exdates(props: dict[str, tuple]) -> list[datetime]:
+    """Return the excluded starts of a recurring event."""
+    return [
+        _to_datetime(params, value)[0]
+        for params, values in props.get("EXDATE", [])
+        for value in values.split(",")
+    ]
+
+
+class IcalImport:
+    """Upsert the events of an ``.ics`` stream into appointments.
+
+    Rows are matched by ``uid`` one chunk at a time. A UID occurring more than
+    once in the file is counted as a duplicate and its last occurrence wins.
+    Moved occurrences are kept until the end and then attached to their
+    series. The caller commits or rolls back ``db``.
+    """
+
+    def __init__(self, db: Session, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.result = schemas.IcalImportResult()
+        self._seen: set[str] = set()
+        self._written: set[str] = set()
+        self._exdates: dict[str, list[datetime]] = {}
+        self._moved: dict[str, dict[datetime, dict]] = {}
+
+    def run(self, lines: Iterable[bytes]) -> schemas.IcalImportResult:
+        started = time.perf_counter()
+        categories = dict(self.db.query(models.Category.name, models.Category.id))
+        chunk: dict[str, dict] = {}
+        for number, props in enumerate(parse_vevents(lines), 1):
+            self.result.events += 1
+            try:
+                if "RECURRENCE-ID" in props:
+                    moved = override_values(props)
+                    if moved is not None:
+                        self._moved.setdefault(props["UID"][1], {})[
+                            moved["recurrence_id"]
+                        ] = moved
+                        continue
+                row = appointment_row(props, categories)
+                excluded = exdates(props) if row and row["rrule"] else []
+            except ValueError as exc:
+                raise HTTPException(
+                    status_code=400, detail=f"Invalid event {number}: {exc}"
+                )
+            if row is None:
+                self.result.skipped += 1
+                continue
+            if row["uid"] in self._seen:
+                self.result.duplicates += 1
+            self._seen.add(row["uid"])
+            chunk[row["uid"]] = row
+            if row["rrule"]:
+                self._exdates[row["uid"]] = excluded
+            else:
+                self._exdates.pop(row["uid"], None)
+            if len(chunk) >= self.chunk_size:
+                self._write(chunk)
+                chunk = {}
+        if chunk:
+            self._write(chunk)
+        self._write_moved()
+        self.result.seconds = round(time.perf_counter() - started, 3)
+        return self.result
+
+    def _write(self, chunk: dict[str, dict]) -> None:
+        existing = dict(
+            self.db.query(models.Appointment.uid, models.Appointment.id).filter(
+                models.Appointment.uid.in_(list(chunk))
+            )
+        )
+        now = datetime.utcnow()
+        new, changed = [], []
+        for uid, row in chunk.items():
+            row["updated_at"] = now
+            if uid in existing:
+                changed.append({"id": existing[uid], **row})
+            else:
+                new.append(row)
+        if new:
+            self.db.execute(insert(models.Appointment), new)
+            self.result.created += len(new)
+        if changed:
+            self.db.execute(update(models.Appointment), changed)
+            # rows written by an earlier chunk are duplicates, not updates
+            self.result.updated += sum(
+                row["uid"] not in self._written for row in changed
+            )
+            # exceptions of updated series are replaced by those in the file
+            self.db.execute(
+                delete(models.AppointmentOverride).where(
+                    models.AppointmentOverride.appointment_id.in_(
+                        [row["id"] for row in changed]
+                    )
+                )
+            )
+        self._written.update(chunk)
+        self._write_exdates([uid for uid in chunk if uid in self._exdates])
+
+    def _write_exdates(self, uids: list[str]) -> None:
+        if not uids:
+            return
+        ids = dict(
+            self.db.query(models.Appointment.uid, models.Appointment.id).filter(
+                models.Appointment.uid.in_(uids)
+            )
+        )
+        rows = [
+            {"appointment_id": ids[uid], "recurrence_id": moment, "cancelled": True}
+            for uid in uids
+            for moment in dict.fromkeys(self._exdates.pop(uid))
+        ]
+        if rows:
+            self.db.execute(insert(models.AppointmentOverride), rows)
+
+    def _write_moved(self) -> None:
+        """Attach moved occurrences to their series, skipping unknown ones."""
+        uids = list(self._moved)
+        for offset in range(0, len(uids), self.chunk_size):
+            end = offset + self.chunk_size
+            series = (
+                self.db.query(models.Appointment)
+                .options(selectinload(models.Appointment.overrides))
+                .filter(
+                    models.Appointment.uid.in_(uids[offset:end]),
+                    models.Appointment.rrule.isnot(None),
+                )
+            )
+            for appt in series:
+                overrides = {o.recurrence_id: o for o in appt.overrides}
+                for recurrence_id, values in self._moved.pop(appt.uid).items():
+                    override = overrides.get(recurrence_id)
+                    if override is None:
+                        override = models.AppointmentOverride()
+                        appt.overrides.append(override)
+                    for field, value in values.items():
+                        setattr(override, field, value)
+                    self.result.overrides += 1
+                recurrence.prepare(appt)
+        self.result.skipped += sum(len(moved) for moved in self._moved.values())
+        self._moved.clear()
+        self.db.flush()
@@ -1,55 +1,187 @@
 import logging
 import math
 import os
+from contextlib import asynccontextmanager
 from datetime import date, datetime, time, timedelta
+from typing import Any
 
 from fastapi import (
     APIRouter,
     Depends,
     FastAPI,
+    File,
     HTTPException,
+    Query,
     Request,
     Response,
+    UploadFile,
 )
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
-
-from . import models, schemas
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload, subqueryload
+
+from . import models, recurrence, schemas
+from .analytics import ProductivityReport
+from .bulk import (
+    AppointmentBulkCreate,
+    AppointmentBulkDelete,
+    BulkUpdateItem,
+    SubtaskBulkCreate,
+    SubtaskBulkDelete,
+    TaskBulkCreate,
+    TaskBulkDelete,
+    TaskBulkUpdate,
+)
+from .cache import reference_ids, response_cache
+from .columnar import COLUMNAR_FORMATS, FILE_EXTENSIONS, FocusSessionExport
+from .columnar import available as columnar_available
 from .config import ConfigLoader, setup_logging
-from .database import Base, SessionLocal, engine
-from .metrics import MetricsService
+from .counters import COUNTED_TABLES
+from .database import (
+    AsyncSessionLocal,
+    Base,
+    ReadSessionLocal,
+    SessionLocal,
+    async_engine,
+    engine,
+    get_async_db,
+    get_db,
+    get_read_db,
+    profiler,
+    read_engine,
+)
+from .dataset import EXPORT_FORMATS, DatasetImport, export_ndjson, gzip_chunks
+from .events import BROKER_URL as EVENTS_BROKER_URL
+from .events import bus, event_stream
+from .ical import IcalExport, IcalImport, feed_response, ical_components
+from .metrics import MetricsMiddleware, MetricsService, instrument_engine
+from .pagination import Page, task_includes
+from .profiler import QueryProfiler, RequestScopeMiddleware
+from .recurrence import naive_utc, occurrence_window
+from .search import Search, search_kinds
+from .sync import changes_since, prune_tombstones
+from .versioning import NOT_MODIFIED, VERSIONED_TABLES, ConditionalGet, seed_versions
 
 settings = ConfigLoader().load()
 setup_logging(settings.log_level)
 
 Base.metadata.create_all(bind=engine)
+with engine.begin() as connection:
+    seed_versions(connection)
+    prune_tombstones(connection)
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    bus.start(EVENTS_BROKER_URL)
+    yield
+    await bus.stop()
+    engine.dispose()
+    if read_engine is not engine:
+        read_engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+    profiler.close()
+
+
+app = FastAPI(lifespan=lifespan)
 router = APIRouter()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
+def check_rate_limit(request: Request) -> Response | None:
+    with SessionLocal() as db:
+        return RateLimiter(db)(request)
+
+
+async def check_rate_limit_async(request: Request) -> Response | None:
+    """Run the rate limiter on the async engine, without a threadpool worker."""
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(lambda session: RateLimiter(session)(request))
+
+
 @app.middleware("http")
 async def limit_middleware(request: Request, call_next):
-    with SessionLocal() as db:
-        limiter = RateLimiter(db)
-        res = limiter(request)
-        if isinstance(res, Response):
-            return res
+    if AsyncSessionLocal is not None:
+        res = await check_rate_limit_async(request)
+    else:
+        res = await run_in_threadpool(check_rate_limit, request)
+    if isinstance(res, Response):
+        return res
     return await call_next(request)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# added last so they wrap the rate limiter and see its queries too
+app.add_middleware(MetricsMiddleware)
+if profiler.enabled:
+    app.add_middleware(RequestScopeMiddleware)
+instrument_engine(engine)
+if read_engine is not engine:
+    instrument_engine(read_engine, "replica")
+    profiler.install(read_engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine, "async")
+    profiler.install(async_engine.sync_engine)
+
+
+LOADER_STRATEGIES = {
+    "selectin": selectinload,
+    "joined": joinedload,
+    "subquery": subqueryload,
+}
+
+
+def eager_load(
+    endpoint: str, model, default: str = "tags", include: list[str] = ()
+) -> list:
+    """Return loader options for the relationships serialized by ``endpoint``.
+
+    ``<ENDPOINT>_EAGER_LOAD`` overrides the comma separated relationships to
+    load (an empty value restores lazy loading) and ``<ENDPOINT>_LOADER``
+    selects the strategy: ``selectin`` (default), ``joined`` or ``subquery``.
+    Relationships in ``include`` are always loaded.
+    """
+    prefix = endpoint.upper()
+    names = os.getenv(f"{prefix}_EAGER_LOAD", default).split(",")
+    strategy = LOADER_STRATEGIES.get(
+        os.getenv(f"{prefix}_LOADER", "selectin"), selectinload
+    )
+    relationships = model.__mapper__.relationships
+    return [
+        strategy(relationships[name].class_attribute)
+        for name in dict.fromkeys(n.strip() for n in [*names, *include])
+        if name in relationships
+    ]
+
+
+def ensure_category(db: Session, category_id: int | None) -> None:
+    if category_id is None:
+        return
+    if category_id not in reference_ids.ids(db, models.Category):
+        raise HTTPException(status_code=404, detail="Category not found")
+
+
+def load_tags(db: Session, tag_ids: list[int]) -> list[models.Tag]:
+    """Return the existing tags among ``tag_ids`` with a single ``IN`` query.
+
+    Unknown ids are skipped. The rows are needed to link the tags anyway, so
+    checking the ids against :data:`reference_ids` first would only add a
+    query.
+    """
+    if not tag_ids:
+        return []
+    tag_ids = list(dict.fromkeys(tag_ids))
+    by_id = {
+        tag.id: tag for tag in db.query(models.Tag).filter(models.Tag.id.in_(tag_ids))
+    }
+    return [by_id[tag_id] for tag_id in tag_ids if tag_id in by_id]
 
 
 def rate_limit(request: Request, db: Session = Depends(get_db)):
@@ -80,11 +212,12 @@ def authenticate_user(db: Session, username: str, password: str) -> models.User
     return user
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> models.User | None:
-    if os.getenv("DISABLE_AUTH", "0") in {"1", "true", "True"}:
-        return None
+def auth_disabled() -> bool:
+    return os.getenv("DISABLE_AUTH", "0") in {"1", "true", "True"}
+
+
+def token_username(token: str) -> str:
+    """Return the user name in ``token``, raising ``401`` if it is invalid."""
     credentials_exception = HTTPException(
         status_code=401, detail="Could not validate credentials"
     )
@@ -95,12 +228,43 @@ def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == username).first()
+    return username
+
+
+def authorize(request: Request, user: models.User | None) -> models.User:
     if user is None:
-        raise credentials_exception
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    request.state.user = user
     return user
 
 
+def get_current_user(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> models.User | None:
+    request.state.user = None
+    if auth_disabled():
+        return None
+    username = token_username(token)
+    user = db.query(models.User).filter(models.User.username == username).first()
+    return authorize(request, user)
+
+
+async def get_current_user_async(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> models.User | None:
+    """:func:`get_current_user` for the ``DB_MODE=async`` routers."""
+    request.state.user = None
+    if auth_disabled():
+        return None
+    username = token_username(token)
+    user = await db.scalar(select(models.User).where(models.User.username == username))
+    return authorize(request, user)
+
+
 class FocusSessionService:
     """Manage focus sessions for tasks."""
 
@@ -123,12 +287,16 @@ class FocusSessionService:
         self.db.refresh(session)
         return session
 
-    def list(self, task_id: int) -> list[models.FocusSession]:
-        return (
-            self.db.query(models.FocusSession)
-            .filter(models.FocusSession.task_id == task_id)
-            .all()
+    def list(self, task_id: int, page: Page | None = None) -> list[models.FocusSession]:
+        query = self.db.query(models.FocusSession).filter(
+            models.FocusSession.task_id == task_id
         )
+        if page is None:
+            return query.all()
+        query = page.apply(
+            query, models.FocusSession.start_time, models.FocusSession.id
+        )
+        return page.rows(query.all())
 
     def update(
         self, task_id: int, session_id: int, data: schemas.FocusSessionUpdate
@@ -204,10 +372,28 @@ class TaskPlanner:
     def __init__(self, db: Session):
         self.db = db
 
-    def _collect_events(self) -> list[tuple[datetime, datetime]]:
-        events: list[tuple[datetime, datetime]] = []
-        for appt in self.db.query(models.Appointment).all():
-            events.append((appt.start_time, appt.end_time))
+    def _collect_events(self, until: date) -> list[tuple[datetime, datetime]]:
+        """Return the busy times the planned sessions must avoid.
+
+        Recurring appointments are expanded from today until
+        ``PLANNER_HORIZON_DAYS`` after ``until``, the due date, because sessions
+        that do not fit are scheduled past it.
+        """
+        start = datetime.combine(datetime.utcnow().date(), time())
+        end = datetime.combine(until, time()) + timedelta(
+            days=1 + int(os.getenv("PLANNER_HORIZON_DAYS", "14"))
+        )
+        appointments = (
+            self.db.query(models.Appointment)
+            .options(selectinload(models.Appointment.overrides))
+            .filter(
+                or_(
+                    models.Appointment.rrule.is_(None),
+                    recurrence.window_filter(start, end),
+                )
+            )
+        )
+        events = recurrence.busy_times(appointments, start, end)
         for fs in self.db.query(models.FocusSession).all():
             events.append((fs.start_time, fs.end_time))
         for task in (
@@ -1528,7 +1714,7 @@ class TaskPlanner:
         self.db.commit()
         self.db.refresh(task)
 
-        events = self._collect_events()
+        events = self._collect_events(data.due_date)
         sessions = self._schedule_sessions(
             data.estimated_duration_minutes,
             data.due_date,
@@ -1587,11 +1773,8 @@ def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_
     db.add(db_cat)
     db.commit()
     db.refresh(db_cat)
-    if db_cat.energy_curve:
-        db_cat.energy_curve = [int(x) for x in db_cat.energy_curve.split(",")]
-    else:
-        db_cat.energy_curve = None
-    return db_cat
+    response_cache.invalidate("categories")
+    return schemas.Category.from_model(db_cat)
 
 
 @router.post("/tags", response_model=schemas.Tag)
@@ -1600,23 +1783,51 @@ def create_tag(tag: schemas.TagCreate, db: Session = Depends(get_db)):
     db.add(db_tag)
     db.commit()
     db.refresh(db_tag)
+    response_cache.invalidate("tags")
     return db_tag
 
 
-@router.get("/tags", response_model=list[schemas.Tag])
-def list_tags(db: Session = Depends(get_db)):
-    return db.query(models.Tag).all()
+@router.get(
+    "/tags",
+    response_model=list[schemas.Tag],
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(ConditionalGet("tags"))],
+)
+def list_tags(
+    request: Request,
+    response: Response,
+    page: Page = Depends(),
+    db: Session = Depends(get_read_db),
+):
+    cached = response_cache.lookup("tags", request, response)
+    if cached is not None:
+        return cached
+    tags = page.rows(page.apply(db.query(models.Tag), models.Tag.id).all())
+    return response_cache.store(
+        "tags", request, response, schemas.TAG_LIST.dump_json(tags)
+    )
 
 
-@router.get("/categories", response_model=list[schemas.Category])
-def list_categories(db: Session = Depends(get_db)):
-    cats = db.query(models.Category).all()
-    for c in cats:
-        if c.energy_curve:
-            c.energy_curve = [int(x) for x in c.energy_curve.split(",")]
-        else:
-            c.energy_curve = None
-    return cats
+@router.get(
+    "/categories",
+    response_model=list[schemas.Category],
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(ConditionalGet("categories"))],
+)
+def list_categories(
+    request: Request,
+    response: Response,
+    page: Page = Depends(),
+    db: Session = Depends(get_read_db),
+):
+    cached = response_cache.lookup("categories", request, response)
+    if cached is not None:
+        return cached
+    query = page.apply(db.query(models.Category), models.Category.id)
+    cats = [schemas.Category.from_model(c) for c in page.rows(query.all())]
+    return response_cache.store(
+        "categories", request, response, schemas.CATEGORY_LIST.dump_json(cats)
+    )
 
 
 @router.put("/categories/{category_id}", response_model=schemas.Category)
@@ -1634,56 +1845,269 @@ def update_category(
         setattr(db_cat, field, value)
     db.commit()
     db.refresh(db_cat)
-    if db_cat.energy_curve:
-        db_cat.energy_curve = [int(x) for x in db_cat.energy_curve.split(",")]
-    else:
-        db_cat.energy_curve = None
-    return db_cat
+    response_cache.invalidate("categories")
+    return schemas.Category.from_model(db_cat)
 
 
 @router.post("/appointments", response_model=schemas.Appointment)
 def create_appointment(
     appointment: schemas.AppointmentCreate, db: Session = Depends(get_db)
 ):
-    if appointment.category_id is not None:
-        cat = (
-            db.query(models.Category)
-            .filter(models.Category.id == appointment.category_id)
-            .first()
-        )
-        if cat is None:
-            raise HTTPException(status_code=404, detail="Category not found")
+    ensure_category(db, appointment.category_id)
     data = appointment.dict()
     tags = data.pop("tags", [])
     db_app = models.Appointment(**data)
-    for tag_id in tags:
-        tag = db.query(models.Tag).filter(models.Tag.id == tag_id).first()
-        if tag:
-            db_app.tags.append(tag)
+    recurrence.prepare(db_app)
+    db_app.tags = load_tags(db, tags)
     db.add(db_app)
     db.commit()
     db.refresh(db_app)
     return db_app
 
 
-@router.get("/appointments", response_model=list[schemas.Appointment])
-def list_appointments(db: Session = Depends(get_db)):
-    return db.query(models.Appointment).all()
+@router.post("/appointments/bulk", response_model=schemas.BulkResult)
+def create_appointments(items: list[Any], db: Session = Depends(get_db)):
+    return AppointmentBulkCreate(db).run(items)
+
+
+@router.post("/appointments/bulk_delete", response_model=schemas.BulkResult)
+def delete_appointments(ids: list[int], db: Session = Depends(get_db)):
+    return AppointmentBulkDelete(db).run(ids)
+
+
+@router.get(
+    "/appointments",
+    response_model=list[schemas.Appointment],
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(ConditionalGet("appointments", "appointment_tags", "tags"))],
+)
+def list_appointments(
+    page: Page = Depends(),
+    window: tuple[datetime, datetime] | None = Depends(occurrence_window),
+    db: Session = Depends(get_read_db),
+):
+    """List appointments, or their occurrences in ``[start, end)`` if given.
+
+    Recurring appointments are returned once unless a window is given, which
+    expands them into occurrences. The window bounds the response, so it is
+    not paginated.
+    """
+    options = eager_load("list_appointments", models.Appointment, include=["overrides"])
+    query = db.query(models.Appointment).options(*options)
+    if window is not None:
+        query = query.filter(recurrence.window_filter(*window))
+        return recurrence.expand(query.all(), *window)
+    query = page.apply(query, models.Appointment.start_time, models.Appointment.id)
+    return page.rows(query.all())
+
+
+@router.get(
+    "/appointments/export/ical",
+    response_class=StreamingResponse,
+    responses=NOT_MODIFIED,
+    dependencies=[
+        Depends(ConditionalGet("appointments", "categories", "tasks", "focus_sessions"))
+    ],
+)
+def export_ical(
+    request: Request,
+    response: Response,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    category_id: int | None = None,
+    include: list[str] = Depends(ical_components),
+):
+    """Stream appointments (and optionally focus sessions and timed tasks).
+
+    ``start``/``end`` restrict the export to events overlapping the range. The
+    feed is cached until the exported tables change.
+    """
+    start = naive_utc(start) if start else None
+    end = naive_utc(end) if end else None
+    if start and end and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    export = IcalExport(start, end, category_id, include)
+    return feed_response(export, request, response, ReadSessionLocal)
+
+
+@router.post("/appointments/import/ical", response_model=schemas.IcalImportResult)
+def import_ical(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """Create or update appointments from an uploaded ``.ics`` file.
+
+    Events are matched to earlier imports by ``UID``. The whole file is
+    imported in one transaction; nothing is written if any event is invalid.
+    """
+    result = IcalImport(db).run(file.file)
+    db.commit()
+    return result
+
+
+@router.get(
+    "/calendar",
+    response_model=schemas.CalendarWindow,
+    responses=NOT_MODIFIED,
+    dependencies=[
+        Depends(
+            ConditionalGet(
+                "appointments",
+                "appointment_tags",
+                "tasks",
+                "task_tags",
+                "tags",
+                "focus_sessions",
+            )
+        )
+    ],
+)
+def calendar_window(start: datetime, end: datetime, db: Session = Depends(get_read_db)):
+    """Return appointments, tasks and focus sessions overlapping ``[start, end)``."""
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+    appointments = recurrence.expand(
+        db.query(models.Appointment)
+        .options(*eager_load("calendar", models.Appointment, include=["overrides"]))
+        .filter(recurrence.window_filter(start, end)),
+        start,
+        end,
+    )
+    first_day = start.date()
+    last_day = (end - timedelta(microseconds=1)).date()
+    tasks = (
+        db.query(models.Task)
+        .options(*eager_load("calendar", models.Task))
+        .filter(
+            or_(
+                and_(
+                    models.Task.start_date.isnot(None),
+                    models.Task.start_date <= last_day,
+                    func.coalesce(models.Task.end_date, models.Task.start_date)
+                    >= first_day,
+                ),
+                and_(
+                    models.Task.start_date.is_(None),
+                    models.Task.due_date.between(first_day, last_day),
+                ),
+            )
+        )
+        .order_by(models.Task.id)
+        .all()
+    )
+    sessions = (
+        db.query(models.FocusSession, models.Task.title)
+        .join(models.Task)
+        .filter(
+            models.FocusSession.start_time < end, models.FocusSession.end_time > start
+        )
+        .order_by(models.FocusSession.start_time)
+        .all()
+    )
+    return {
+        "start": start,
+        "end": end,
+        "appointments": appointments,
+        "tasks": tasks,
+        "focus_sessions": [
+            {
+                **schemas.FocusSession.model_validate(fs).model_dump(),
+                "task_title": title,
+            }
+            for fs, title in sessions
+        ],
+    }
+
+
+@router.get("/events", response_class=StreamingResponse)
+async def events(request: Request, tables: str | None = None):
+    """Stream create/update/delete notifications as Server-Sent Events."""
+    names = {t.strip() for t in tables.split(",") if t.strip()} if tables else None
+    return StreamingResponse(
+        event_stream(request, names),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/sync",
+    response_model=schemas.SyncChanges,
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(ConditionalGet(*sorted(VERSIONED_TABLES)))],
+)
+def sync(since: str | None = None, db: Session = Depends(get_db)):
+    """Return rows changed and ids deleted since the ``since`` token."""
+    return changes_since(db, since)
 
 
-@router.get("/appointments/export/ical")
-def export_ical(db: Session = Depends(get_db)):
-    from icalendar import Calendar, Event
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(ConditionalGet(*sorted(VERSIONED_TABLES)))],
+)
+def export_dataset(request: Request, response: Response, format: str = "ndjson"):
+    """Stream every category, tag, task and appointment as NDJSON."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    headers["Vary"] = "Accept-Encoding"
+    chunks = export_ndjson(ReadSessionLocal)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        chunks = gzip_chunks(chunks)
+    return StreamingResponse(chunks, media_type="application/x-ndjson", headers=headers)
+
+
+@router.post("/import", response_model=schemas.DatasetImportResult)
+def import_dataset(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """Create or update rows from an NDJSON export, gzipped or not.
+
+    Rows are matched by id. The whole file is imported in one transaction.
+    """
+    result = DatasetImport(db).run(file.file)
+    db.commit()
+    response_cache.invalidate("categories")
+    response_cache.invalidate("tags")
+    return result
 
-    cal = Calendar()
-    for appt in db.query(models.Appointment).all():
-        event = Event()
-        event.add("summary", appt.title)
-        event.add("dtstart", appt.start_time)
-        event.add("dtend", appt.end_time)
-        event.add("description", appt.description or "")
-        cal.add_component(event)
-    return Response(cal.to_ical(), media_type="text/calendar")
+
+@router.get(
+    "/focus_sessions/export",
+    response_class=StreamingResponse,
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(ConditionalGet("focus_sessions", "tasks", "categories"))],
+)
+def export_focus_sessions(
+    response: Response,
+    format: str = "parquet",
+    start: datetime | None = None,
+    end: datetime | None = None,
+    category_id: int | None = None,
+):
+    """Stream focus sessions with their task's difficulty, priority and category.
+
+    ``format`` is ``parquet`` or ``arrow`` (Arrow IPC stream). Only sessions
+    starting in ``[start, end)`` are exported.
+    """
+    if format not in COLUMNAR_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+    if not columnar_available():
+        raise HTTPException(status_code=501, detail="pyarrow is not installed")
+    start = naive_utc(start) if start else None
+    end = naive_utc(end) if end else None
+    if start and end and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    headers[
+        "Content-Disposition"
+    ] = f'attachment; filename="focus_sessions.{FILE_EXTENSIONS[format]}"'
+    export = FocusSessionExport(start, end, category_id)
+    return StreamingResponse(
+        export.stream(ReadSessionLocal, format),
+        media_type=COLUMNAR_FORMATS[format],
+        headers=headers,
+    )
 
 
 @router.put("/appointments/{appointment_id}", response_model=schemas.Appointment)
@@ -1699,29 +2123,100 @@ def update_appointment(
     )
     if not db_app:
         raise HTTPException(status_code=404, detail="Appointment not found")
-    if appointment.category_id is not None:
-        cat = (
-            db.query(models.Category)
-            .filter(models.Category.id == appointment.category_id)
-            .first()
-        )
-        if cat is None:
-            raise HTTPException(status_code=404, detail="Category not found")
+    ensure_category(db, appointment.category_id)
     data = appointment.dict()
     tags = data.pop("tags", [])
+    if (recurrence.normalize_rule(data["rrule"]), data["start_time"]) != (
+        db_app.rrule,
+        db_app.start_time,
+    ):
+        # overrides refer to occurrences of the previous rule
+        db_app.overrides = []
     for field, value in data.items():
         setattr(db_app, field, value)
+    recurrence.prepare(db_app)
     if tags:
-        db_app.tags = []
-        for tag_id in tags:
-            tag = db.query(models.Tag).filter(models.Tag.id == tag_id).first()
-            if tag:
-                db_app.tags.append(tag)
+        db_app.tags = load_tags(db, tags)
+    db.commit()
+    db.refresh(db_app)
+    return db_app
+
+
+def get_occurrence(
+    appointment_id: int, recurrence_id: datetime, db: Session = Depends(get_db)
+) -> tuple[models.Appointment, datetime]:
+    """Return a recurring appointment and the naive UTC start of an occurrence."""
+    db_app = db.get(models.Appointment, appointment_id)
+    if not db_app:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    recurrence_id = naive_utc(recurrence_id)
+    if not recurrence.is_occurrence(db_app, recurrence_id):
+        raise HTTPException(status_code=404, detail="Occurrence not found")
+    return db_app, recurrence_id
+
+
+def save_override(
+    db: Session, db_app: models.Appointment, recurrence_id: datetime, **values
+) -> models.Appointment:
+    override = next(
+        (o for o in db_app.overrides if o.recurrence_id == recurrence_id), None
+    )
+    if override is None:
+        override = models.AppointmentOverride(recurrence_id=recurrence_id)
+        db_app.overrides.append(override)
+    for field, value in values.items():
+        setattr(override, field, value)
+    recurrence.prepare(db_app)
+    # the series changes with its overrides, for caches and delta sync alike
+    db_app.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_app)
     return db_app
 
 
+@router.put(
+    "/appointments/{appointment_id}/occurrences/{recurrence_id}",
+    response_model=schemas.Appointment,
+)
+def update_occurrence(
+    data: schemas.AppointmentOverrideBase,
+    occurrence: tuple = Depends(get_occurrence),
+    db: Session = Depends(get_db),
+):
+    """Move or rename the occurrence of a series originally at ``recurrence_id``."""
+    start, end = naive_utc(data.start_time), naive_utc(data.end_time)
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    return save_override(
+        db,
+        *occurrence,
+        cancelled=False,
+        start_time=start,
+        end_time=end,
+        title=data.title,
+        description=data.description,
+    )
+
+
+@router.delete(
+    "/appointments/{appointment_id}/occurrences/{recurrence_id}",
+    response_model=schemas.Appointment,
+)
+def cancel_occurrence(
+    occurrence: tuple = Depends(get_occurrence), db: Session = Depends(get_db)
+):
+    """Remove one occurrence of a series (an ``EXDATE``)."""
+    return save_override(
+        db,
+        *occurrence,
+        cancelled=True,
+        start_time=None,
+        end_time=None,
+        title=None,
+        description=None,
+    )
+
+
 @router.delete("/appointments/{appointment_id}")
 def delete_appointment(appointment_id: int, db: Session = Depends(get_db)):
     db_app = (
@@ -1738,84 +2233,118 @@ def delete_appointment(appointment_id: int, db: Session = Depends(get_db)):
 
 @router.post("/tasks", response_model=schemas.Task)
 def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db)):
-    if task.category_id is not None:
-        cat = (
-            db.query(models.Category)
-            .filter(models.Category.id == task.category_id)
-            .first()
-        )
-        if cat is None:
-            raise HTTPException(status_code=404, detail="Category not found")
+    ensure_category(db, task.category_id)
     data = task.dict()
     tags = data.pop("tags", [])
     db_task = models.Task(**data)
-    for tag_id in tags:
-        tag = db.query(models.Tag).filter(models.Tag.id == tag_id).first()
-        if tag:
-            db_task.tags.append(tag)
+    db_task.tags = load_tags(db, tags)
     db.add(db_task)
     db.commit()
     db.refresh(db_task)
     return db_task
 
 
+@router.post("/tasks/bulk", response_model=schemas.BulkResult)
+def create_tasks(items: list[Any], db: Session = Depends(get_db)):
+    return TaskBulkCreate(db).run(items)
+
+
 @router.post("/tasks/plan", response_model=schemas.Task)
 def plan_task(data: schemas.PlanTaskCreate, db: Session = Depends(get_db)):
-    if data.category_id is not None:
-        cat = (
-            db.query(models.Category)
-            .filter(models.Category.id == data.category_id)
-            .first()
-        )
-        if cat is None:
-            raise HTTPException(status_code=404, detail="Category not found")
+    ensure_category(db, data.category_id)
     planner = TaskPlanner(db)
     return planner.plan(data)
 
 
-@router.get("/tasks", response_model=list[schemas.Task])
-def list_tasks(db: Session = Depends(get_db)):
-    return db.query(models.Task).all()
+@router.get(
+    "/tasks",
+    response_model=list[schemas.TaskDetail],
+    response_model_exclude_unset=True,
+    responses=NOT_MODIFIED,
+    dependencies=[
+        Depends(
+            ConditionalGet("tasks", "task_tags", "tags", "subtasks", "focus_sessions")
+        )
+    ],
+)
+def list_tasks(
+    include: list[str] = Depends(task_includes),
+    page: Page = Depends(),
+    db: Session = Depends(get_read_db),
+):
+    options = eager_load("list_tasks", models.Task, include=include)
+    query = page.apply(db.query(models.Task).options(*options), models.Task.id)
+    return [schemas.TaskDetail.from_task(t, include) for t in page.rows(query.all())]
 
 
-@router.get("/tasks/search", response_model=list[schemas.Task])
-def search_tasks(query: str, db: Session = Depends(get_db)):
-    return (
-        db.query(models.Task)
+@router.get(
+    "/tasks/search",
+    response_model=list[schemas.Task],
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(ConditionalGet("tasks", "task_tags", "tags"))],
+)
+def search_tasks(query: str, db: Session = Depends(get_read_db)):
+    """Return the tasks matching ``query``, ranked index matches first.
+
+    Every word of an index match starts a word of the task. Tasks containing
+    ``query`` inside a word, which the index does not find, follow by id.
+    """
+    try:
+        ranked = [row.id for row in Search(query, ["tasks"], prefix=True).rows(db)]
+    except HTTPException:
+        ranked = []  # no words, only punctuation
+    pattern = f"%{query}%"
+    found = {
+        task.id: task
+        for task in db.query(models.Task)
+        .options(*eager_load("search_tasks", models.Task))
         .filter(
-            (models.Task.title.ilike(f"%{query}%"))
-            | (models.Task.description.ilike(f"%{query}%"))
+            models.Task.id.in_(ranked)
+            | models.Task.title.ilike(pattern)
+            | models.Task.description.ilike(pattern)
         )
-        .all()
-    )
+        .order_by(models.Task.id)
+    }
+    first = [found.pop(task_id) for task_id in ranked if task_id in found]
+    return first + list(found.values())
 
 
-class BulkUpdateItem(BaseModel):
-    id: int
-    data: schemas.TaskUpdate
+@router.get(
+    "/search",
+    response_model=list[schemas.SearchHit],
+    responses=NOT_MODIFIED,
+    dependencies=[
+        Depends(
+            ConditionalGet(
+                "tasks", "task_tags", "appointments", "appointment_tags", "tags"
+            )
+        )
+    ],
+)
+def search(
+    q: str,
+    kinds: list[str] = Depends(search_kinds),
+    tag_id: int | None = None,
+    category_id: int | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    page: Page = Depends(),
+    db: Session = Depends(get_read_db),
+):
+    start = naive_utc(start) if start else None
+    end = naive_utc(end) if end else None
+    query = Search(q, kinds, tag_id, category_id, start, end)
+    return query.hits(db, page)
 
 
 @router.post("/tasks/bulk_update", response_model=list[schemas.Task])
 def bulk_update_tasks(items: list[BulkUpdateItem], db: Session = Depends(get_db)):
-    updated = []
-    for item in items:
-        task = db.query(models.Task).filter(models.Task.id == item.id).first()
-        if task:
-            payload = item.data.dict()
-            tags = payload.pop("tags", [])
-            for field, value in payload.items():
-                setattr(task, field, value)
-            if tags:
-                task.tags = []
-                for tag_id in tags:
-                    tag = db.query(models.Tag).filter(models.Tag.id == tag_id).first()
-                    if tag:
-                        task.tags.append(tag)
-            updated.append(task)
-    db.commit()
-    for t in updated:
-        db.refresh(t)
-    return updated
+    return TaskBulkUpdate(db).run(items)
+
+
+@router.post("/tasks/bulk_delete", response_model=schemas.BulkResult)
+def delete_tasks(ids: list[int], db: Session = Depends(get_db)):
+    return TaskBulkDelete(db).run(ids)
 
 
 @router.put("/tasks/{task_id}", response_model=schemas.Task)
@@ -1823,24 +2352,13 @@ def update_task(task_id: int, task: schemas.TaskUpdate, db: Session = Depends(ge
     db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
-    if task.category_id is not None:
-        cat = (
-            db.query(models.Category)
-            .filter(models.Category.id == task.category_id)
-            .first()
-        )
-        if cat is None:
-            raise HTTPException(status_code=404, detail="Category not found")
+    ensure_category(db, task.category_id)
     data = task.dict()
     tags = data.pop("tags", [])
     for field, value in data.items():
         setattr(db_task, field, value)
     if tags:
-        db_task.tags = []
-        for tag_id in tags:
-            tag = db.query(models.Tag).filter(models.Tag.id == tag_id).first()
-            if tag:
-                db_task.tags.append(tag)
+        db_task.tags = load_tags(db, tags)
     db.commit()
     db.refresh(db_task)
     return db_task
@@ -1870,9 +2388,30 @@ def create_subtask(
     return db_sub
 
 
-@router.get("/tasks/{task_id}/subtasks", response_model=list[schemas.Subtask])
-def list_subtasks(task_id: int, db: Session = Depends(get_db)):
-    return db.query(models.Subtask).filter(models.Subtask.task_id == task_id).all()
+@router.post("/tasks/{task_id}/subtasks/bulk", response_model=schemas.BulkResult)
+def create_subtasks(task_id: int, items: list[Any], db: Session = Depends(get_db)):
+    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return SubtaskBulkCreate(db, task_id).run(items)
+
+
+@router.post("/tasks/{task_id}/subtasks/bulk_delete", response_model=schemas.BulkResult)
+def delete_subtasks(task_id: int, ids: list[int], db: Session = Depends(get_db)):
+    return SubtaskBulkDelete(db, task_id).run(ids)
+
+
+@router.get(
+    "/tasks/{task_id}/subtasks",
+    response_model=list[schemas.Subtask],
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(ConditionalGet("subtasks"))],
+)
+def list_subtasks(
+    task_id: int, page: Page = Depends(), db: Session = Depends(get_read_db)
+):
+    query = db.query(models.Subtask).filter(models.Subtask.task_id == task_id)
+    return page.rows(page.apply(query, models.Subtask.id).all())
 
 
 @router.put("/tasks/{task_id}/subtasks/{subtask_id}", response_model=schemas.Subtask)
@@ -1919,11 +2458,16 @@ def create_focus_session(
 
 
 @router.get(
-    "/tasks/{task_id}/focus_sessions", response_model=list[schemas.FocusSession]
+    "/tasks/{task_id}/focus_sessions",
+    response_model=list[schemas.FocusSession],
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(ConditionalGet("focus_sessions"))],
 )
-def list_focus_sessions(task_id: int, db: Session = Depends(get_db)):
+def list_focus_sessions(
+    task_id: int, page: Page = Depends(), db: Session = Depends(get_read_db)
+):
     service = FocusSessionService(db)
-    return service.list(task_id)
+    return service.list(task_id, page)
 
 
 @router.put(
@@ -1973,7 +2517,7 @@ def remove_task_tag(task_id: int, tag_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/tasks/{task_id}/tags", response_model=list[schemas.Tag])
-def list_task_tags(task_id: int, db: Session = Depends(get_db)):
+def list_task_tags(task_id: int, db: Session = Depends(get_read_db)):
     task = db.query(models.Task).filter(models.Task.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -2011,25 +2555,77 @@ def remove_appointment_tag(appt_id: int, tag_id: int, db: Session = Depends(get_
 
 
 @router.get("/appointments/{appt_id}/tags", response_model=list[schemas.Tag])
-def list_appointment_tags(appt_id: int, db: Session = Depends(get_db)):
+def list_appointment_tags(appt_id: int, db: Session = Depends(get_read_db)):
     appt = db.query(models.Appointment).filter(models.Appointment.id == appt_id).first()
     if not appt:
         raise HTTPException(status_code=404, detail="Appointment not found")
     return appt.tags
 
 
-@router.get("/admin/stats")
-def get_stats(db: Session = Depends(get_db)):
+@router.get(
+    "/admin/stats",
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(ConditionalGet(*sorted(COUNTED_TABLES)))],
+)
+def get_stats(db: Session = Depends(get_read_db)):
     service = MetricsService(db)
     return service.stats()
 
 
 @router.get("/admin/metrics")
-def prometheus_metrics(db: Session = Depends(get_db)):
+def prometheus_metrics(db: Session = Depends(get_read_db)):
     service = MetricsService(db)
     return service.prometheus()
 
 
+@router.get("/admin/queries", response_model=schemas.QueryReport)
+def query_report(limit: int = Query(20, ge=1), order: str = "total_ms"):
+    """Return the slowest statement fingerprints seen by the query profiler.
+
+    ``order`` is one of ``total_ms``, ``count``, ``mean_ms``, ``p95_ms`` and
+    ``max_ms``.
+    """
+    if order not in QueryProfiler.ORDERS:
+        raise HTTPException(status_code=400, detail=f"Unknown order: {order}")
+    return schemas.QueryReport(
+        enabled=profiler.enabled,
+        sample_rate=profiler.sample_rate,
+        dropped=profiler.dropped,
+        statements=profiler.report(limit, order) if profiler.enabled else [],
+    )
+
+
+@router.get(
+    "/analytics/productivity",
+    response_model=schemas.ProductivityReport,
+    responses=NOT_MODIFIED,
+    dependencies=[Depends(ConditionalGet("focus_sessions", "tasks", "categories"))],
+)
+def productivity_analytics(
+    request: Request,
+    response: Response,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    category_id: int | None = None,
+    db: Session = Depends(get_read_db),
+):
+    """Completion rates and focus minutes of the sessions starting in the range.
+
+    The report is cached until focus sessions, tasks or categories change.
+    """
+    start = naive_utc(start) if start else None
+    end = naive_utc(end) if end else None
+    if start and end and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    cached = response_cache.lookup("analytics", request, response)
+    if cached is not None:
+        return cached
+    report = ProductivityReport(start, end, category_id).build(db)
+    return response_cache.store(
+        "analytics", request, response, report.model_dump_json().encode()
+    )
+
+
 @app.post("/users", response_model=schemas.User)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     hashed = get_password_hash(user.password)
@@ -2053,4 +2649,13 @@ def login(
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+if settings.db_mode == "async":
+    from .async_crud import router as async_router
+
+    replaced = {(r.path, m) for r in async_router.routes for m in r.methods}
+    router.routes = [
+        r for r in router.routes if not {(r.path, m) for m in r.methods} & replaced
+    ]
+    app.include_router(async_router, dependencies=[Depends(get_current_user_async)])
+
 app.include_router(router, dependencies=[Depends(get_current_user)])
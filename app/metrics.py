@@ -1,54 +1,211 @@
+"""Prometheus metrics: entity counts and request instrumentation.
+
+All metrics live in :attr:`MetricsService._registry` and are served by
+``/admin/metrics``. Besides the row counts, :class:`MetricsMiddleware` records
+for every HTTP request, labelled by method, route template and status:
+
+* ``http_requests_total`` and ``http_requests_in_flight`` (by method only,
+  the route is known once the request has been routed);
+* ``http_request_duration_seconds`` up to the last byte of the response, so
+  streamed responses are timed completely;
+* ``http_response_size_bytes``, counted from the body chunks sent;
+* ``http_request_queries``, the number of SQL statements the request ran,
+  fed by :func:`instrument_engine` through a context variable.
+
+:func:`instrument_engine` also times pool checkouts into
+``db_pool_checkout_seconds``, which shows requests waiting for a connection
+when the pool is exhausted. The start of a checkout is noted by the pool
+classes of :func:`app.database.build_engine`, so engines whose pool was
+created otherwise (``poolclass`` or ``pool`` passed to ``create_engine``)
+report no checkout times. Requests that match no route are labelled
+``unmatched`` so unknown paths do not create new series.
+"""
+
 from __future__ import annotations
 
+import contextvars
+import os
+import time
+
 from fastapi import Response
 from prometheus_client import (
     CONTENT_TYPE_LATEST,
     CollectorRegistry,
+    Counter,
     Gauge,
+    Histogram,
     generate_latest,
 )
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
-from . import models
-from .database import SessionLocal
+from . import counters
+from .database import SessionLocal, checkout_started
+
+ENABLED = os.getenv("ENABLE_REQUEST_METRICS", "1") in {"1", "true", "True"}
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# statements run by the current request, set by MetricsMiddleware
+_request_queries: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar(
+    "request_queries", default=None
+)
 
 
 class MetricsService:
-    """Collect and expose application metrics."""
+    """Collect and expose application metrics.
+
+    Row counts come from the counters maintained by :mod:`app.counters`, so
+    a scrape does not count the tables.
+    """
 
     _registry = CollectorRegistry()
-    _task_gauge = Gauge(
-        "tasks_total",
-        "Total number of tasks",
+    _gauges = {
+        "tasks": Gauge("tasks_total", "Total number of tasks", registry=_registry),
+        "appointments": Gauge(
+            "appointments_total",
+            "Total number of appointments",
+            registry=_registry,
+        ),
+        "categories": Gauge(
+            "categories_total",
+            "Total number of categories",
+            registry=_registry,
+        ),
+        "focus_sessions": Gauge(
+            "focus_sessions_total",
+            "Total number of focus sessions",
+            registry=_registry,
+        ),
+        "subtasks": Gauge(
+            "subtasks_total",
+            "Total number of subtasks",
+            registry=_registry,
+        ),
+        "users": Gauge("users_total", "Total number of users", registry=_registry),
+    }
+    requests = Counter(
+        "http_requests_total",
+        "HTTP requests by method, route and status code",
+        ["method", "route", "status"],
+        registry=_registry,
+    )
+    in_flight = Gauge(
+        "http_requests_in_flight",
+        "HTTP requests being handled",
+        ["method"],
         registry=_registry,
     )
-    _appt_gauge = Gauge(
-        "appointments_total",
-        "Total number of appointments",
+    latency = Histogram(
+        "http_request_duration_seconds",
+        "Time until the last byte of the response was sent",
+        ["method", "route"],
         registry=_registry,
     )
-    _category_gauge = Gauge(
-        "categories_total",
-        "Total number of categories",
+    response_size = Histogram(
+        "http_response_size_bytes",
+        "Size of response bodies",
+        ["method", "route"],
+        buckets=SIZE_BUCKETS,
+        registry=_registry,
+    )
+    queries = Histogram(
+        "http_request_queries",
+        "SQL statements executed per request",
+        ["method", "route"],
+        buckets=QUERY_BUCKETS,
+        registry=_registry,
+    )
+    checkout_wait = Histogram(
+        "db_pool_checkout_seconds",
+        "Time spent waiting for a connection from the pool",
+        ["engine"],
         registry=_registry,
     )
 
     def __init__(self, db: Session | None = None) -> None:
         self.db = db or SessionLocal()
 
+    def _counts(self) -> dict[str, int]:
+        counts = counters.stored_counts(self.db)
+        if counts is None:
+            # recount on the primary, the session may be bound to a replica
+            with SessionLocal() as db:
+                counts = counters.reconcile(db.connection())
+                db.commit()
+        return counts
+
     def _update_gauges(self) -> None:
-        self._task_gauge.set(self.db.query(models.Task).count())
-        self._appt_gauge.set(self.db.query(models.Appointment).count())
-        self._category_gauge.set(self.db.query(models.Category).count())
+        counts = self._counts()
+        for name, gauge in self._gauges.items():
+            gauge.set(counts[name])
 
     def stats(self) -> dict[str, int]:
         self._update_gauges()
-        return {
-            "tasks": int(self._task_gauge._value.get()),
-            "appointments": int(self._appt_gauge._value.get()),
-            "categories": int(self._category_gauge._value.get()),
-        }
+        return {name: int(gauge._value.get()) for name, gauge in self._gauges.items()}
 
     def prometheus(self) -> Response:
         self._update_gauges()
         return Response(generate_latest(self._registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def instrument_engine(engine, name: str = "primary") -> None:
+    """Count the statements of the current request and time pool checkouts."""
+    if not ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        counter = _request_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    wait = MetricsService.checkout_wait.labels(name)
+
+    # pool events registered on the engine are kept when the pool is recreated
+    @event.listens_for(engine, "checkout")
+    def _time_checkout(dbapi_connection, connection_record, connection_proxy):
+        started = checkout_started.get()
+        if started is not None:
+            wait.observe(time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request metrics into the metrics registry."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+        size = 0
+        queries = [0]
+        token = _request_queries.set(queries)
+        in_flight = MetricsService.in_flight.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_queries.reset(token)
+            in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path_format", None) or "unmatched"
+            MetricsService.requests.labels(method, path, str(status)).inc()
+            MetricsService.latency.labels(method, path).observe(elapsed)
+            MetricsService.response_size.labels(method, path).observe(size)
+            MetricsService.queries.labels(method, path).observe(queries[0])
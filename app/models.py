@@ -1,19 +1,35 @@
+from datetime import datetime
+
 from sqlalchemy import (
     Boolean,
     Column,
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Time,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
 
 from .database import Base
 
 
-class Category(Base):
+class Synced:
+    """Columns for models mirrored by ``GET /sync``."""
+
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        index=True,
+    )
+
+
+class Category(Synced, Base):
     __tablename__ = "categories"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -24,7 +40,7 @@ class Category(Base):
     energy_curve = Column(String, nullable=True)
 
 
-class Appointment(Base):
+class Appointment(Synced, Base):
     __tablename__ = "appointments"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -35,17 +51,56 @@ class Appointment(Base):
     start_time = Column(DateTime, nullable=False)
     end_time = Column(DateTime, nullable=False)
     timezone = Column(String, nullable=True, default="UTC")
+    # iCalendar UID of imported appointments
+    uid = Column(String, nullable=True, unique=True, index=True)
+    # RFC 5545 recurrence rule, e.g. "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10"
+    rrule = Column(String, nullable=True)
+    # end of the last occurrence, NULL for rules without COUNT or UNTIL
+    recurrence_end = Column(DateTime, nullable=True)
     tags = relationship("Tag", secondary="appointment_tags")
+    overrides = relationship(
+        "AppointmentOverride",
+        cascade="all, delete-orphan",
+        order_by="AppointmentOverride.recurrence_id",
+    )
+
+    __table_args__ = (
+        Index("ix_appointments_start_time_end_time", "start_time", "end_time"),
+    )
+
+
+class AppointmentOverride(Base):
+    """An exception to one occurrence of a recurring appointment.
+
+    ``recurrence_id`` is the original start of the occurrence. A cancelled
+    override removes the occurrence (``EXDATE``), any other one replaces its
+    times and, where set, its title and description.
+    """
+
+    __tablename__ = "appointment_overrides"
+
+    id = Column(Integer, primary_key=True, index=True)
+    appointment_id = Column(
+        Integer, ForeignKey("appointments.id", ondelete="CASCADE"), nullable=False
+    )
+    recurrence_id = Column(DateTime, nullable=False)
+    cancelled = Column(Boolean, nullable=False, default=False)
+    start_time = Column(DateTime, nullable=True)
+    end_time = Column(DateTime, nullable=True)
+    title = Column(String, nullable=True)
+    description = Column(String, nullable=True)
 
+    __table_args__ = (UniqueConstraint("appointment_id", "recurrence_id"),)
 
-class Task(Base):
+
+class Task(Synced, Base):
     __tablename__ = "tasks"
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(String, nullable=True)
-    due_date = Column(Date, nullable=False)
-    start_date = Column(Date, nullable=True)
+    due_date = Column(Date, nullable=False, index=True)
+    start_date = Column(Date, nullable=True, index=True)
     end_date = Column(Date, nullable=True)
     start_time = Column(Time, nullable=True)
     end_time = Column(Time, nullable=True)
@@ -70,7 +125,7 @@ class Task(Base):
     )
 
 
-class Subtask(Base):
+class Subtask(Synced, Base):
     __tablename__ = "subtasks"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -80,7 +135,7 @@ class Subtask(Base):
     task = relationship("Task", back_populates="subtasks")
 
 
-class FocusSession(Base):
+class FocusSession(Synced, Base):
     __tablename__ = "focus_sessions"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -91,8 +146,12 @@ class FocusSession(Base):
 
     task = relationship("Task", back_populates="focus_sessions")
 
+    __table_args__ = (
+        Index("ix_focus_sessions_start_time_end_time", "start_time", "end_time"),
+    )
+
 
-class Tag(Base):
+class Tag(Synced, Base):
     __tablename__ = "tags"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -129,3 +188,28 @@ class User(Base):
     email = Column(String, nullable=False, unique=True, index=True)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
+
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class RowCount(Base):
+    __tablename__ = "row_counts"
+
+    table_name = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    reconciled_at = Column(DateTime, nullable=False)
+
+
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
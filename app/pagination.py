@@ -0,0 +1,104 @@
+"""Keyset pagination shared by the sync and async list endpoints.
+
+Pages are ordered by one or more columns (``id`` or ``start_time, id``) and the
+cursor encodes the sort key of the last row returned, so fetching page N costs
+the same as fetching page 1. The cursor for the next page is sent in the
+``X-Next-Cursor`` response header; it is absent on the last page.
+
+:func:`task_includes` parses the ``include`` parameter of the task list.
+"""
+
+import base64
+import json
+import os
+from datetime import datetime
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import tuple_
+
+from .schemas import TASK_INCLUDES
+
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: list) -> str:
+    data = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_cursor(cursor: str, columns: tuple) -> list:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(data, list) or len(data) != len(columns):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(v) if col.type.python_type is datetime else int(v)
+            for col, v in zip(columns, data)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class Page:
+    """Optional ``limit``/``cursor`` query parameters for a list endpoint.
+
+    Without either parameter the endpoint returns every row, as before.
+    """
+
+    def __init__(
+        self,
+        response: Response,
+        limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        cursor: str | None = None,
+    ):
+        self.response = response
+        self.limit = limit
+        self.cursor = cursor
+        self.columns: tuple = ()
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit is not None or self.cursor is not None
+
+    @property
+    def size(self) -> int:
+        return self.limit or DEFAULT_PAGE_SIZE
+
+    def apply(self, query, *columns):
+        """Restrict a ``Query`` or ``Select`` to the requested page."""
+        if not self.enabled:
+            return query
+        self.columns = columns
+        if self.cursor:
+            values = decode_cursor(self.cursor, columns)
+            if len(columns) == 1:
+                query = query.filter(columns[0] > values[0])
+            else:
+                query = query.filter(tuple_(*columns) > tuple_(*values))
+        return query.order_by(*columns).limit(self.size + 1)
+
+    def rows(self, rows) -> list:
+        """Trim the look-ahead row and set the next cursor header."""
+        rows = list(rows)
+        if self.enabled and len(rows) > self.size:
+            rows = rows[: self.size]
+            last = rows[-1]
+            self.response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+                [getattr(last, col.key) for col in self.columns]
+            )
+        return rows
+
+
+def task_includes(include: str | None = None) -> list[str]:
+    """Return the relationships requested with ``include=subtasks,...``."""
+    if not include:
+        return []
+    names = list(dict.fromkeys(n.strip() for n in include.split(",") if n.strip()))
+    unknown = [n for n in names if n not in TASK_INCLUDES]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown include: {', '.join(unknown)}"
+        )
+    return names
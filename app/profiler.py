@@ -0,0 +1,263 @@
+"""SQL statement profiler with per-statement aggregation.
+
+When ``ENABLE_QUERY_PROFILING`` is set, :class:`QueryProfiler` times every
+statement run on the instrumented engines. The statement path only reads the
+clock, draws the sample and puts a tuple on a queue; a background thread does
+the rest in batches:
+
+* it normalizes the statement into a fingerprint (literals and bound
+  parameters become ``?``, ``IN`` and multi-row ``VALUES`` lists collapse to
+  one item, whitespace is squeezed), so the same query with other arguments
+  is aggregated under one entry;
+* it keeps per fingerprint the count, total and maximum time, the routes the
+  statement ran for and the durations of the last ``QUERY_PROFILING_WINDOW``
+  executions, from which ``/admin/queries`` reports the p50 and p95;
+* it appends one JSON object per statement to ``QUERY_LOG`` with one ``open``
+  and ``write`` per batch.
+
+The route is taken from the ASGI scope stored by
+:class:`RequestScopeMiddleware` when the statement runs. Statements run
+before routing (the rate limiter) are reported under ``(middleware)``, those
+outside any request under ``(background)``.
+
+``QUERY_PROFILING_SAMPLE_RATE`` (default ``1``) profiles only that fraction
+of the statements so the profiler can stay enabled in production; counts in
+the report are those of the sampled statements. Statistics are kept per
+process.
+
+The queue holds ``QUERY_PROFILING_QUEUE_SIZE`` statements. When the writer
+thread falls behind, further statements are dropped rather than queued, and
+counted in :attr:`QueryProfiler.dropped`.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+
+from sqlalchemy import event
+
+# ASGI scope of the request being handled, set by RequestScopeMiddleware
+request_scope: ContextVar[dict | None] = ContextVar("request_scope", default=None)
+
+# records written with one open() and write() at most
+BATCH_SIZE = 1000
+# statements waiting for the writer thread; further ones are dropped
+QUEUE_SIZE = int(os.getenv("QUERY_PROFILING_QUEUE_SIZE", "10000"))
+# fingerprints tracked; further statements are counted under OTHER
+MAX_STATEMENTS = int(os.getenv("QUERY_PROFILING_MAX_STATEMENTS", "1000"))
+OTHER = "(other)"
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r"(?:\?|%\(\w+\)s|\$\d+|:\w+)"
+# a parenthesized list of placeholders
+_ROW = rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)"
+_IN_LIST = re.compile(rf"\bIN {_ROW}", re.I)
+_VALUES = re.compile(rf"\bVALUES ({_ROW})(?:\s*,\s*{_ROW})+", re.I)
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """Return ``statement`` with literals and repeated parameters folded."""
+    text = _SPACE.sub(" ", statement).strip()
+    text = _STRING.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _IN_LIST.sub("IN (...)", text)
+    return _VALUES.sub(r"VALUES \1", text)
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _route(scope: dict | None) -> str:
+    if scope is None:
+        return "(background)"
+    route = scope.get("route")
+    if route is None:
+        return "(middleware)"
+    return f"{scope.get('method', 'WS')} {route.path_format}"
+
+
+class StatementStats:
+    """Timings of one statement fingerprint, in milliseconds."""
+
+    def __init__(self, statement: str, window: int):
+        self.statement = statement
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: deque[float] = deque(maxlen=window)
+        self.routes: Counter = Counter()
+
+    def add(self, duration: float, route: str) -> None:
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.recent.append(duration)
+        self.routes[route] += 1
+
+    def percentile(self, q: float) -> float:
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+    def report(self, key: str) -> dict:
+        return {
+            "fingerprint": key,
+            "statement": self.statement,
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3),
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "max_ms": round(self.max, 3),
+            "routes": dict(self.routes.most_common()),
+        }
+
+
+class QueryProfiler:
+    """Time SQL statements, aggregate them by fingerprint and log them."""
+
+    ORDERS = ("total_ms", "count", "mean_ms", "p95_ms", "max_ms")
+
+    def __init__(self, path: str | None = None) -> None:
+        self.path = path or os.getenv("QUERY_LOG", "query.log")
+        self.enabled = os.getenv("ENABLE_QUERY_PROFILING", "0") in {"1", "true", "True"}
+        self.sample_rate = float(os.getenv("QUERY_PROFILING_SAMPLE_RATE", "1"))
+        self.window = int(os.getenv("QUERY_PROFILING_WINDOW", "1000"))
+        self.logger = logging.getLogger("sql.profiler")
+        self._queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+        # statements dropped because the queue was full
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._stats: dict[str, StatementStats] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def install(self, engine) -> None:
+        if not self.enabled:
+            return
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="query-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        context._query_start_time = time.perf_counter() if sampled else None
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        start = context._query_start_time
+        if start is None:
+            return
+        duration = (time.perf_counter() - start) * 1000
+        route = _route(request_scope.get())
+        try:
+            self._queue.put_nowait((statement, duration, route, time.time()))
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def _run(self) -> None:
+        reported = 0
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                self._record([item for item in batch if item is not None])
+            except Exception:
+                # keep the thread alive, or the queue fills up and every
+                # further statement is dropped
+                self.logger.exception("Failed to record %d statements", len(batch))
+            if self.dropped > reported:
+                self.logger.warning(
+                    "Query profiler queue full, %d statements dropped",
+                    self.dropped - reported,
+                )
+                reported = self.dropped
+            if stop:
+                return
+
+    def _record(self, batch: list[tuple]) -> None:
+        lines = []
+        with self._lock:
+            for statement, duration, route, at in batch:
+                normalized = normalize(statement)
+                key = fingerprint(normalized)
+                stats = self._stats.get(key)
+                if stats is None:
+                    if len(self._stats) >= MAX_STATEMENTS:
+                        key, normalized = OTHER, OTHER
+                        stats = self._stats.get(key)
+                    if stats is None:
+                        stats = self._stats[key] = StatementStats(
+                            normalized, self.window
+                        )
+                stats.add(duration, route)
+                lines.append(
+                    json.dumps(
+                        {
+                            "time": datetime.fromtimestamp(at).isoformat(),
+                            "ms": round(duration, 3),
+                            "route": route,
+                            "fingerprint": key,
+                            "statement": statement,
+                        }
+                    )
+                )
+        if not lines:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError:
+            self.logger.warning("Failed to write query log")
+
+    def report(self, limit: int = 20, order: str = "total_ms") -> list[dict]:
+        """Return the ``limit`` fingerprints ranked highest by ``order``."""
+        with self._lock:
+            rows = [stats.report(key) for key, stats in self._stats.items()]
+        rows.sort(key=lambda row: row[order], reverse=True)
+        return rows[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def close(self) -> None:
+        """Write the queued statements and stop the background thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+class RequestScopeMiddleware:
+    """ASGI middleware making the request's scope available to the profiler."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        token = request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_scope.reset(token)
@@ -0,0 +1,222 @@
+"""Recurring appointments.
+
+A recurring appointment is stored once: its ``start_time``/``end_time`` are
+those of the first occurrence and ``rrule`` holds an RFC 5545 recurrence rule
+such as ``FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10``. Exceptions are rows of
+``appointment_overrides`` keyed by the original start of an occurrence: a
+cancelled override removes the occurrence (``EXDATE``), any other one moves or
+renames it.
+
+Occurrences are never written to the database. Endpoints expand the series
+that may overlap the requested window, and the expanded occurrences of each
+series and window are kept in :data:`occurrence_cache` until the series
+changes. ``recurrence_end`` (the end of the last occurrence, ``NULL`` for
+unbounded rules) lets the series be narrowed down in SQL first.
+"""
+
+import os
+import re
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from itertools import islice
+
+from dateutil.rrule import MINUTELY, SECONDLY, rrule, rrulestr
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+from . import models, schemas
+from .cache import LRUCache
+
+# upper bound of occurrences expanded for one series and window, and of COUNT
+MAX_OCCURRENCES = int(os.getenv("RECURRENCE_MAX_OCCURRENCES", "1000"))
+
+occurrence_cache = LRUCache(int(os.getenv("RECURRENCE_CACHE_SIZE", "1024")))
+
+# stored times are naive UTC, so the UTC designator of UNTIL is dropped
+UNTIL_UTC = re.compile(r"(UNTIL=\d{8}T\d{6})Z")
+
+
+def normalize_rule(text: str | None) -> str | None:
+    """Return ``text`` without ``RRULE:`` prefix, or ``None`` if it is empty."""
+    if not text or not text.strip():
+        return None
+    text = text.strip().upper().removeprefix("RRULE:")
+    return UNTIL_UTC.sub(r"\1", text)
+
+
+def parse_rule(text: str, dtstart: datetime) -> rrule:
+    """Parse a single recurrence rule, raising ``400`` if it is invalid."""
+    try:
+        if "\n" in text:
+            raise ValueError("only a single RRULE is supported")
+        rule = rrulestr(text, dtstart=dtstart)
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid rrule: {exc}")
+    if rule._freq in (SECONDLY, MINUTELY):
+        raise HTTPException(
+            status_code=400, detail="Invalid rrule: FREQ must be HOURLY or longer"
+        )
+    if rule._count is not None and rule._count > MAX_OCCURRENCES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid rrule: COUNT must not exceed {MAX_OCCURRENCES}",
+        )
+    return rule
+
+
+def recurrence_end(
+    text: str | None,
+    start: datetime,
+    end: datetime,
+    overrides: Iterable[models.AppointmentOverride] = (),
+) -> datetime | None:
+    """Return the end of the last occurrence of a bounded rule.
+
+    ``None`` stands for no rule as well as for rules without ``COUNT`` or
+    ``UNTIL``, which never end. For ``UNTIL`` rules with more than
+    ``MAX_OCCURRENCES`` occurrences the end of an occurrence starting at
+    ``UNTIL`` is returned instead, which may be later than the actual end.
+    """
+    if text is None:
+        return None
+    rule = parse_rule(text, start)
+    if rule._count is None and rule._until is None:
+        return None
+    # COUNT is at most MAX_OCCURRENCES. An UNTIL rule with more occurrences is
+    # not walked to its end: its last occurrence starts at UNTIL at the latest.
+    first = list(islice(rule, MAX_OCCURRENCES + 1))
+    if len(first) > MAX_OCCURRENCES:
+        last = rule._until
+    else:
+        last = first[-1] if first else start
+    ends = [last + (end - start)]
+    ends += [o.end_time for o in overrides if not o.cancelled and o.end_time]
+    return max(ends)
+
+
+def prepare(appt: models.Appointment) -> None:
+    """Normalize the rule of ``appt`` and update its ``recurrence_end``."""
+    appt.rrule = normalize_rule(appt.rrule)
+    appt.recurrence_end = recurrence_end(
+        appt.rrule, appt.start_time, appt.end_time, appt.overrides
+    )
+
+
+def is_occurrence(appt: models.Appointment, moment: datetime) -> bool:
+    if not appt.rrule:
+        return False
+    rule = parse_rule(appt.rrule, appt.start_time)
+    return rule.after(moment, inc=True) == moment
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Convert an aware datetime to the naive UTC values stored in the database."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def occurrence_window(
+    start: datetime | None = None, end: datetime | None = None
+) -> tuple[datetime, datetime] | None:
+    """Return the ``start``/``end`` window recurring appointments expand into."""
+    if start is None and end is None:
+        return None
+    if start is None or end is None:
+        raise HTTPException(
+            status_code=400, detail="start and end must be given together"
+        )
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return start, end
+
+
+def window_filter(start: datetime, end: datetime):
+    """Filter appointments that are or may recur into ``[start, end)``."""
+    appt = models.Appointment
+    return or_(
+        and_(appt.start_time < end, appt.end_time > start),
+        and_(
+            appt.rrule.isnot(None),
+            appt.start_time < end,
+            or_(appt.recurrence_end.is_(None), appt.recurrence_end > start),
+        ),
+    )
+
+
+def occurrences(appt: models.Appointment, start: datetime, end: datetime) -> list:
+    """Return ``(recurrence_id, start, end, title, description)`` tuples.
+
+    Only occurrences overlapping ``[start, end)`` are expanded. Title and
+    description are ``None`` unless an override changes them.
+    """
+    key = (appt.id, start, end)
+    version = (appt.updated_at, appt.rrule, appt.start_time, appt.end_time)
+    entry = occurrence_cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    duration = appt.end_time - appt.start_time
+    rule = parse_rule(appt.rrule, appt.start_time)
+    overrides = {o.recurrence_id: o for o in appt.overrides}
+    found = []
+    # an occurrence starting one duration before the window still overlaps it
+    for begin in islice(rule.xafter(start - duration), MAX_OCCURRENCES):
+        if begin >= end:
+            break
+        if begin not in overrides:
+            found.append((begin, begin, begin + duration, None, None))
+    for o in overrides.values():
+        if not o.cancelled and o.start_time < end and o.end_time > start:
+            found.append(
+                (o.recurrence_id, o.start_time, o.end_time, o.title, o.description)
+            )
+    found.sort(key=lambda occurrence: occurrence[1])
+    occurrence_cache.set(key, (version, found))
+    return found
+
+
+def expand(
+    appointments: Iterable[models.Appointment], start: datetime, end: datetime
+) -> list:
+    """Replace the recurring ``appointments`` by their occurrences in the window.
+
+    Occurrences keep the id of their series and carry the original start as
+    ``recurrence_id``.
+    """
+    items = []
+    for appt in appointments:
+        if not appt.rrule:
+            items.append(appt)
+            continue
+        series = schemas.Appointment.model_validate(appt)
+        for recurrence_id, begin, finish, title, description in occurrences(
+            appt, start, end
+        ):
+            items.append(
+                series.model_copy(
+                    update={
+                        "recurrence_id": recurrence_id,
+                        "start_time": begin,
+                        "end_time": finish,
+                        "title": title or series.title,
+                        "description": description or series.description,
+                        "overrides": [],
+                    }
+                )
+            )
+    items.sort(key=lambda item: (item.start_time, item.id))
+    return items
+
+
+def busy_times(
+    appointments: Iterable[models.Appointment], start: datetime, end: datetime
+) -> list[tuple[datetime, datetime]]:
+    """Return the ``(start, end)`` of every occurrence in the window."""
+    times = []
+    for appt in appointments:
+        if appt.rrule:
+            times += [(o[1], o[2]) for o in occurrences(appt, start, end)]
+        else:
+            times.append((appt.start_time, appt.end_time))
+    return times
@@ -1,6 +1,7 @@
 from datetime import date, datetime, time
+from typing import Literal
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
 
 class CategoryBase(BaseModel):
@@ -21,6 +22,21 @@ class Category(CategoryBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+    @classmethod
+    def from_model(cls, cat) -> "Category":
+        """Build from an ORM category, parsing the stored ``energy_curve``."""
+        curve = None
+        if cat.energy_curve:
+            curve = [int(x) for x in cat.energy_curve.split(",")]
+        return cls(
+            id=cat.id,
+            name=cat.name,
+            color=cat.color,
+            preferred_start_hour=cat.preferred_start_hour,
+            preferred_end_hour=cat.preferred_end_hour,
+            energy_curve=curve,
+        )
+
 
 class AppointmentBase(BaseModel):
     title: str
@@ -29,6 +45,7 @@ class AppointmentBase(BaseModel):
     end_time: datetime
     category_id: int | None = None
     timezone: str | None = "UTC"
+    rrule: str | None = None
 
 
 class AppointmentCreate(AppointmentBase):
@@ -39,9 +56,30 @@ class AppointmentUpdate(AppointmentBase):
     pass
 
 
+class AppointmentOverrideBase(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    title: str | None = None
+    description: str | None = None
+
+
+class AppointmentOverride(BaseModel):
+    recurrence_id: datetime
+    cancelled: bool = False
+    start_time: datetime | None = None
+    end_time: datetime | None = None
+    title: str | None = None
+    description: str | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class Appointment(AppointmentBase):
     id: int
     tags: list["Tag"] = []
+    overrides: list[AppointmentOverride] = []
+    # original start of an expanded occurrence of a recurring appointment
+    recurrence_id: datetime | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -163,6 +201,11 @@ class Tag(TagBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Serializers for the cached tag and category lists (see app.cache).
+TAG_LIST = TypeAdapter(list[Tag])
+CATEGORY_LIST = TypeAdapter(list[Category])
+
+
 class UserBase(BaseModel):
     username: str
     email: str
@@ -186,3 +229,160 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: str | None = None
+
+
+TASK_INCLUDES = ("subtasks", "focus_sessions")
+
+
+class TaskDetail(Task):
+    """A task with optionally embedded subtasks and focus sessions."""
+
+    subtasks: list[Subtask] | None = None
+    focus_sessions: list[FocusSession] | None = None
+
+    @classmethod
+    def from_task(cls, task, include: list[str]) -> dict:
+        """Serialize ``task`` with only the relationships named in ``include``.
+
+        Returns a dict so that omitted relationships stay unset and are
+        neither loaded from the database nor rendered in the response.
+        """
+        data = Task.model_validate(task).model_dump()
+        for name in include:
+            data[name] = getattr(task, name)
+        return data
+
+
+class CalendarFocusSession(FocusSession):
+    task_title: str
+
+
+class CalendarWindow(BaseModel):
+    start: datetime
+    end: datetime
+    appointments: list[Appointment] = []
+    tasks: list[Task] = []
+    focus_sessions: list[CalendarFocusSession] = []
+
+
+class SyncChanges(BaseModel):
+    token: str
+    full: bool
+    categories: list[Category] = []
+    tags: list[Tag] = []
+    appointments: list[Appointment] = []
+    tasks: list[Task] = []
+    subtasks: list[Subtask] = []
+    focus_sessions: list[FocusSession] = []
+    deleted: dict[str, list[int]] = {}
+
+
+class IcalImportResult(BaseModel):
+    events: int = 0
+    created: int = 0
+    updated: int = 0
+    duplicates: int = 0
+    # moved occurrences of recurring events
+    overrides: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+
+class DatasetImportResult(BaseModel):
+    # rows per table
+    created: dict[str, int] = {}
+    updated: dict[str, int] = {}
+    seconds: float = 0.0
+
+
+class SessionCounts(BaseModel):
+    sessions: int
+    completed: int
+    completion_rate: float
+
+
+class HourProductivity(SessionCounts):
+    hour: int
+
+
+class WeekdayProductivity(SessionCounts):
+    # 0 is Monday
+    weekday: int
+
+
+class CategoryProductivity(SessionCounts):
+    category_id: int | None
+    category: str | None
+    focus_minutes: int
+
+
+class DailyFocus(BaseModel):
+    day: date
+    planned_sessions: int
+    completed_sessions: int
+    planned_minutes: int
+    # minutes of completed sessions
+    focus_minutes: int
+
+
+class ProductivityReport(BaseModel):
+    start: datetime | None = None
+    end: datetime | None = None
+    category_id: int | None = None
+    planned_sessions: int
+    completed_sessions: int
+    completion_rate: float
+    focus_minutes: int
+    by_hour: list[HourProductivity]
+    by_weekday: list[WeekdayProductivity]
+    by_category: list[CategoryProductivity]
+    daily: list[DailyFocus]
+
+
+class QueryStats(BaseModel):
+    """Aggregated timings of one normalized SQL statement, in milliseconds."""
+
+    fingerprint: str
+    statement: str
+    count: int
+    total_ms: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    max_ms: float
+    # executions per route
+    routes: dict[str, int]
+
+
+class QueryReport(BaseModel):
+    enabled: bool
+    sample_rate: float
+    # statements not profiled because the profiler's queue was full
+    dropped: int
+    statements: list[QueryStats]
+
+
+class SearchHit(BaseModel):
+    """A ranked full-text match: the ``kind`` names the field carrying the row."""
+
+    kind: Literal["task", "appointment"]
+    id: int
+    score: float
+    task: Task | None = None
+    appointment: Appointment | None = None
+
+
+class BulkError(BaseModel):
+    index: int
+    detail: str
+
+
+class BulkResult(BaseModel):
+    """Outcome of a bulk create or delete.
+
+    ``ids`` follows the order of the request items, with ``None`` for the
+    items that failed; their reasons are listed in ``errors``.
+    """
+
+    ids: list[int | None] = []
+    errors: list[BulkError] = []
@@ -0,0 +1,291 @@
+"""Full-text search over tasks and appointments.
+
+The index is maintained by the database, so rows written in bulk (imports,
+bulk updates) are searchable without any ORM hooks:
+
+* on SQLite an FTS5 table per searched table (``tasks_fts``,
+  ``appointments_fts``) stores the title and description as external content
+  and triggers keep it in sync;
+* on PostgreSQL a generated ``search_vector`` ``tsvector`` column (title
+  weighted above description) carries a GIN index.
+
+Both are created with the tables by ``Base.metadata.create_all`` (and built
+for rows that already exist) or by the matching migration.
+
+Queries consist of words, which must all match, ``"quoted phrases"`` and
+``prefix*`` terms. Results are ranked by BM25 on SQLite and ``ts_rank_cd`` on
+PostgreSQL, and are paginated by a keyset cursor over ``(score, kind, id)``.
+"""
+
+import base64
+import json
+import re
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import (
+    and_,
+    column,
+    event,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+    text,
+    union_all,
+)
+from sqlalchemy.orm import Session, selectinload
+
+from . import models, recurrence, schemas
+from .database import Base
+from .pagination import NEXT_CURSOR_HEADER, Page, encode_cursor
+
+SEARCHED_TABLES = ("tasks", "appointments")
+SEARCH_KINDS = {"tasks": "task", "appointments": "appointment"}
+# text search configuration of the PostgreSQL index
+TS_CONFIG = "english"
+# relative weight of title matches over description matches
+TITLE_WEIGHT = 10.0
+
+TOKENS = re.compile(r'"([^"]*)"|(\S+)')
+WORD = re.compile(r"\w+")
+
+
+def _sqlite_ddl(name: str) -> list[str]:
+    fts = f"{name}_fts"
+    new = "new.id, new.title, new.description"
+    old = "'delete', old.id, old.title, old.description"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5(title, description,"
+        f" content='{name}', content_rowid='id',"
+        " tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {name} BEGIN"
+        f" INSERT INTO {fts}(rowid, title, description) VALUES ({new}); END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {name} BEGIN"
+        f" INSERT INTO {fts}({fts}, rowid, title, description) VALUES ({old});"
+        " END",
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF title, description"
+        f" ON {name} BEGIN"
+        f" INSERT INTO {fts}({fts}, rowid, title, description) VALUES ({old});"
+        f" INSERT INTO {fts}(rowid, title, description) VALUES ({new}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _postgresql_ddl(name: str) -> list[str]:
+    return [
+        f"ALTER TABLE {name} ADD COLUMN IF NOT EXISTS search_vector tsvector"
+        " GENERATED ALWAYS AS ("
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce(description, '')), 'B')"
+        ") STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{name}_search_vector ON {name}"
+        " USING GIN (search_vector)",
+    ]
+
+
+@event.listens_for(Base.metadata, "after_create")
+def install(target, connection, **kw) -> None:
+    """Create the search index for each searched table lacking one."""
+    for name in SEARCHED_TABLES:
+        if connection.dialect.name == "postgresql":
+            statements = _postgresql_ddl(name)
+        elif connection.dialect.name == "sqlite":
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                {"name": f"{name}_fts"},
+            ).first()
+            statements = [] if exists else _sqlite_ddl(name)
+        else:
+            statements = []
+        for statement in statements:
+            connection.execute(text(statement))
+
+
+def is_index_object(name: str | None) -> bool:
+    """Tell autogenerate apart the index objects created outside the models."""
+    return bool(name) and (
+        name == "search_vector"
+        or any(name.startswith(f"{t}_fts") for t in SEARCHED_TABLES)
+        or name in {f"ix_{t}_search_vector" for t in SEARCHED_TABLES}
+    )
+
+
+def search_kinds(types: str | None = None) -> list[str]:
+    """Return the tables requested with ``types=tasks,appointments``."""
+    if not types:
+        return list(SEARCHED_TABLES)
+    names = list(dict.fromkeys(n.strip() for n in types.split(",") if n.strip()))
+    unknown = [n for n in names if n not in SEARCHED_TABLES]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown type: {', '.join(unknown)}"
+        )
+    return names
+
+
+def parse_query(query: str, prefix: bool = False) -> list[tuple[list[str], bool]]:
+    """Split ``query`` into ``(words, is_prefix)`` terms.
+
+    Quoted text is a phrase; a trailing ``*`` (or ``prefix=True``) matches
+    words starting with the last word. Punctuation is dropped, so a term can
+    never inject query syntax.
+    """
+    terms = []
+    for phrase, word in TOKENS.findall(query):
+        words = WORD.findall(phrase or word)
+        if words:
+            terms.append((words, bool(word) and (prefix or word.endswith("*"))))
+    if not terms:
+        raise HTTPException(status_code=400, detail="Empty search query")
+    return terms
+
+
+def fts5_query(terms: list[tuple[list[str], bool]]) -> str:
+    return " ".join(
+        f'"{" ".join(words)}"' + ("*" if is_prefix else "")
+        for words, is_prefix in terms
+    )
+
+
+def tsquery(terms: list[tuple[list[str], bool]]) -> str:
+    return " & ".join(
+        "(" + " <-> ".join(words) + (":*" if is_prefix else "") + ")"
+        for words, is_prefix in terms
+    )
+
+
+def _ranked(db: Session, model, terms):
+    """Select the id and score of the ``model`` rows matching ``terms``."""
+    name = model.__tablename__
+    if db.get_bind().dialect.name == "postgresql":
+        vector = literal_column(f"{name}.search_vector")
+        query = func.to_tsquery(TS_CONFIG, tsquery(terms))
+        return select(
+            model.id.label("id"), func.ts_rank_cd(vector, query).label("score")
+        ).where(vector.op("@@")(query))
+    fts = table(f"{name}_fts", column("rowid"))
+    # bm25() scores are negative, lower is better
+    return (
+        select(
+            model.id.label("id"),
+            (-func.bm25(literal_column(fts.name), TITLE_WEIGHT, 1.0)).label("score"),
+        )
+        .join_from(fts, model, fts.c.rowid == model.id)
+        .where(literal_column(fts.name).op("MATCH")(fts5_query(terms)))
+    )
+
+
+class Search:
+    """A search request: terms, filters and the page to return."""
+
+    def __init__(
+        self,
+        query: str,
+        kinds: list[str],
+        tag_id: int | None = None,
+        category_id: int | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        prefix: bool = False,
+    ):
+        self.terms = parse_query(query, prefix)
+        self.kinds = kinds
+        self.tag_id = tag_id
+        self.category_id = category_id
+        self.start = start
+        self.end = end
+
+    def _select(self, db: Session, name: str):
+        model = models.Task if name == "tasks" else models.Appointment
+        query = _ranked(db, model, self.terms).add_columns(
+            literal(SEARCH_KINDS[name]).label("kind")
+        )
+        if self.tag_id is not None:
+            query = query.where(model.tags.any(models.Tag.id == self.tag_id))
+        if self.category_id is not None:
+            query = query.where(model.category_id == self.category_id)
+        if model is models.Task:
+            if self.start is not None:
+                query = query.where(models.Task.due_date >= self.start.date())
+            if self.end is not None:
+                last_day = (self.end - timedelta(microseconds=1)).date()
+                query = query.where(models.Task.due_date <= last_day)
+        elif self.start is not None or self.end is not None:
+            query = query.where(
+                recurrence.window_filter(
+                    self.start or datetime.min, self.end or datetime.max
+                )
+            )
+        return query
+
+    def rows(self, db: Session, page: Page | None = None) -> list:
+        """Return the ``(kind, id, score)`` rows of the page, best first."""
+        ranked = union_all(*(self._select(db, name) for name in self.kinds))
+        ranked = ranked.subquery()
+        query = select(ranked.c.kind, ranked.c.id, ranked.c.score).order_by(
+            ranked.c.score.desc(), ranked.c.kind, ranked.c.id
+        )
+        if page is not None and page.cursor:
+            score, kind, row_id = decode_cursor(page.cursor)
+            query = query.where(
+                or_(
+                    ranked.c.score < score,
+                    and_(
+                        ranked.c.score == score,
+                        or_(
+                            ranked.c.kind > kind,
+                            and_(ranked.c.kind == kind, ranked.c.id > row_id),
+                        ),
+                    ),
+                )
+            )
+        if page is None or not page.enabled:
+            return db.execute(query).all()
+        rows = db.execute(query.limit(page.size + 1)).all()
+        if len(rows) > page.size:
+            rows = rows[: page.size]
+            last = rows[-1]
+            page.response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+                [last.score, last.kind, last.id]
+            )
+        return rows
+
+    def hits(self, db: Session, page: Page | None = None) -> list[schemas.SearchHit]:
+        """Return the page of matching tasks and appointments, best first."""
+        rows = self.rows(db, page)
+        loaded = {}
+        for name in self.kinds:
+            kind = SEARCH_KINDS[name]
+            model = models.Task if name == "tasks" else models.Appointment
+            ids = [row.id for row in rows if row.kind == kind]
+            if ids:
+                options = [selectinload(model.tags)]
+                if model is models.Appointment:
+                    options.append(selectinload(model.overrides))
+                query = db.query(model).options(*options).filter(model.id.in_(ids))
+                schema = schemas.Task if model is models.Task else schemas.Appointment
+                loaded.update(
+                    {(kind, obj.id): schema.model_validate(obj) for obj in query}
+                )
+        return [
+            schemas.SearchHit(
+                kind=row.kind,
+                id=row.id,
+                score=row.score,
+                **{row.kind: loaded[(row.kind, row.id)]},
+            )
+            for row in rows
+            if (row.kind, row.id) in loaded
+        ]
+
+
+def decode_cursor(cursor: str) -> tuple[float, str, int]:
+    """Decode the ``[score, kind, id]`` cursor of a search page."""
+    try:
+        score, kind, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), str(kind), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
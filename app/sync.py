@@ -0,0 +1,121 @@
+"""Delta synchronisation for clients keeping a local mirror.
+
+Every synced model carries an ``updated_at`` column that is refreshed on each
+flush touching the row, including changes to its tag links, and deleting a row
+records a :class:`~app.models.Tombstone`. ``GET /sync?since=<token>`` returns
+the rows changed and the ids deleted after the point in time encoded in the
+token together with a new token for the next call. Without ``since`` the full
+data set is returned.
+
+Tokens are issued slightly in the past (``SYNC_OVERLAP_SECONDS``) so rows
+written by transactions that were still in flight when the token was issued
+are sent again on the next call rather than missed; applying a change twice
+is harmless for a mirror keyed by id.
+
+Tombstones are kept for ``SYNC_RETENTION_DAYS``. Older ones are deleted at
+startup and by ``GET /sync`` (at most every ``SYNC_PRUNE_SECONDS``), so a
+token older than the retention window could miss deletions: such a request
+gets the full data set with ``full`` set, as without ``since``.
+"""
+
+import base64
+import json
+import os
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, selectinload
+
+from . import models, schemas
+
+SYNC_OVERLAP = timedelta(seconds=float(os.getenv("SYNC_OVERLAP_SECONDS", "2")))
+SYNC_RETENTION = timedelta(days=float(os.getenv("SYNC_RETENTION_DAYS", "30")))
+SYNC_PRUNE_INTERVAL = timedelta(seconds=float(os.getenv("SYNC_PRUNE_SECONDS", "3600")))
+
+# when this process last deleted expired tombstones
+_pruned_at = datetime.min
+
+SYNCED_MODELS = {
+    "categories": models.Category,
+    "tags": models.Tag,
+    "appointments": models.Appointment,
+    "tasks": models.Task,
+    "subtasks": models.Subtask,
+    "focus_sessions": models.FocusSession,
+}
+
+
+@event.listens_for(Session, "before_flush")
+def _track_sync_changes(session, flush_context, instances):
+    now = datetime.utcnow()
+    for obj in session.dirty:
+        # collection-only changes (e.g. task.tags) would not issue an UPDATE
+        if isinstance(obj, models.Synced) and session.is_modified(obj):
+            obj.updated_at = now
+    for obj in session.deleted:
+        if isinstance(obj, models.Synced):
+            session.add(
+                models.Tombstone(
+                    table_name=inspect(obj).mapper.local_table.name,
+                    row_id=obj.id,
+                    deleted_at=now,
+                )
+            )
+
+
+def encode_token(moment: datetime) -> str:
+    return base64.urlsafe_b64encode(json.dumps(moment.isoformat()).encode()).decode()
+
+
+def decode_token(token: str) -> datetime:
+    try:
+        return datetime.fromisoformat(json.loads(base64.urlsafe_b64decode(token)))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+
+def prune_tombstones(connection) -> None:
+    """Delete the tombstones older than ``SYNC_RETENTION``."""
+    global _pruned_at
+    now = datetime.utcnow()
+    table = models.Tombstone.__table__
+    connection.execute(table.delete().where(table.c.deleted_at < now - SYNC_RETENTION))
+    _pruned_at = now
+
+
+def changes_since(db: Session, since: str | None) -> schemas.SyncChanges:
+    """Collect the rows changed and deleted after the ``since`` token.
+
+    Tokens older than ``SYNC_RETENTION`` get the full data set.
+    """
+    now = datetime.utcnow()
+    if now - _pruned_at >= SYNC_PRUNE_INTERVAL:
+        prune_tombstones(db.connection())
+        db.commit()
+    token = encode_token(now - SYNC_OVERLAP)
+    after = decode_token(since) if since else None
+    if after is not None and after < now - SYNC_RETENTION:
+        after = None  # its deletions may have been pruned
+    changes = {"token": token, "full": after is None, "deleted": {}}
+    for name, model in SYNCED_MODELS.items():
+        query = db.query(model)
+        if name in ("appointments", "tasks"):
+            query = query.options(selectinload(model.tags))
+        if model is models.Appointment:
+            query = query.options(selectinload(model.overrides))
+        if after is not None:
+            query = query.filter(model.updated_at >= after)
+        rows = query.order_by(model.id).all()
+        if model is models.Category:
+            rows = [schemas.Category.from_model(row) for row in rows]
+        changes[name] = rows
+    if after is not None:
+        tombstones = (
+            db.query(models.Tombstone.table_name, models.Tombstone.row_id)
+            .filter(models.Tombstone.deleted_at >= after)
+            .order_by(models.Tombstone.id)
+        )
+        for table_name, row_id in tombstones:
+            changes["deleted"].setdefault(table_name, []).append(row_id)
+    return schemas.SyncChanges.model_validate(changes)
@@ -0,0 +1,188 @@
+"""Per-table change versions and conditional GET support.
+
+Every ORM flush that inserts, updates or deletes rows of a versioned table
+increments that table's row in ``table_versions``. Read endpoints derive an
+``ETag`` and ``Last-Modified`` header from the versions of the tables they
+read, so a client repeating a request with ``If-None-Match`` (or
+``If-Modified-Since``) receives ``304 Not Modified`` after a single primary key
+lookup instead of the collection being queried and serialized again.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Depends, Header, HTTPException, Request, Response
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import get_async_db, get_read_db
+
+NOT_MODIFIED = {304: {"description": "Not Modified"}}
+
+VERSIONED_TABLES = {
+    "appointments",
+    "appointment_tags",
+    "categories",
+    "focus_sessions",
+    "subtasks",
+    "tags",
+    "task_tags",
+    "tasks",
+    "users",
+}
+
+
+def seed_versions(connection) -> None:
+    """Create missing version rows so concurrent bumps only ever update."""
+    version = models.TableVersion.__table__
+    existing = set(connection.scalars(select(version.c.table_name)))
+    now = datetime.utcnow()
+    for name in sorted(VERSIONED_TABLES - existing):
+        connection.execute(
+            insert(version).values(table_name=name, version=0, updated_at=now)
+        )
+
+
+def bump_versions(connection, tables) -> None:
+    """Increment the version of each table in ``tables`` on ``connection``."""
+    now = datetime.utcnow()
+    version = models.TableVersion.__table__
+    for name in sorted(set(tables) & VERSIONED_TABLES):
+        result = connection.execute(
+            update(version)
+            .where(version.c.table_name == name)
+            .values(version=version.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(
+                insert(version).values(table_name=name, version=1, updated_at=now)
+            )
+
+
+def _flushed_tables(session: Session) -> set[str]:
+    tables = set()
+    deleted = set(session.deleted)
+    for obj in (*session.new, *session.dirty, *deleted):
+        state = inspect(obj)
+        mapper = state.mapper
+        tables.add(mapper.local_table.name)
+        # collection changes (e.g. task.tags) are written to the secondary table
+        for rel in mapper.relationships:
+            if rel.secondary is not None and (
+                obj in deleted or state.attrs[rel.key].history.has_changes()
+            ):
+                tables.add(rel.secondary.name)
+    return tables
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changes(session, flush_context, instances):
+    session.info.setdefault("changed_tables", set()).update(_flushed_tables(session))
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed(session, flush_context):
+    tables = session.info.pop("changed_tables", set()) & VERSIONED_TABLES
+    if tables:
+        bump_versions(session.connection(), tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_bulk_statements(orm_execute_state):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or (orm_execute_state.is_delete)
+    ):
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and table.name in VERSIONED_TABLES:
+            bump_versions(orm_execute_state.session.connection(), [table.name])
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return last_modified.replace(microsecond=0) <= since
+
+
+class ConditionalGet:
+    """Dependency adding ``ETag``/``Last-Modified`` for the given tables.
+
+    Raises ``304 Not Modified`` when the request's validators still match so
+    the endpoint body never runs.
+    """
+
+    def __init__(self, *tables: str):
+        self.tables = tables
+        self.statement = select(models.TableVersion).where(
+            models.TableVersion.table_name.in_(tables)
+        )
+
+    def __call__(
+        self,
+        request: Request,
+        response: Response,
+        if_none_match: str | None = Header(None),
+        if_modified_since: str | None = Header(None),
+        db: Session = Depends(get_read_db),
+    ) -> None:
+        rows = db.scalars(self.statement).all()
+        self.check(rows, request, response, if_none_match, if_modified_since)
+
+    def check(
+        self,
+        rows: list[models.TableVersion],
+        request: Request,
+        response: Response,
+        if_none_match: str | None,
+        if_modified_since: str | None,
+    ) -> None:
+        """Set the validators of ``rows``, raising ``304`` if the request's match."""
+        versions = {row.table_name: row.version for row in rows}
+        key = ";".join(f"{t}={versions.get(t, 0)}" for t in self.tables)
+        key += f"?{request.url.query}"
+        etag = 'W/"' + hashlib.sha1(key.encode()).hexdigest()[:16] + '"'
+        last_modified = max(
+            (row.updated_at for row in rows), default=datetime(1970, 1, 1)
+        ).replace(tzinfo=timezone.utc)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+        if (if_none_match and _etag_matches(if_none_match, etag)) or (
+            not if_none_match
+            and if_modified_since
+            and _not_modified_since(if_modified_since, last_modified)
+        ):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+
+class AsyncConditionalGet(ConditionalGet):
+    """:class:`ConditionalGet` reading the versions on an ``AsyncSession``.
+
+    Used by the ``DB_MODE=async`` routers so the check does not take a
+    connection from the synchronous pool.
+    """
+
+    async def __call__(
+        self,
+        request: Request,
+        response: Response,
+        if_none_match: str | None = Header(None),
+        if_modified_since: str | None = Header(None),
+        db: AsyncSession = Depends(get_async_db),
+    ) -> None:
+        rows = (await db.scalars(self.statement)).all()
+        self.check(rows, request, response, if_none_match, if_modified_since)
@@ -0,0 +1,86 @@
+"""Measure API throughput with many simultaneous clients.
+
+Start the API in the mode to test, then run the benchmark against it::
+
+    DB_MODE=sync uvicorn app.main:app
+    python -m benchmarks.api_concurrency --clients 500
+
+    DB_MODE=async uvicorn app.main:app
+    python -m benchmarks.api_concurrency --clients 500
+
+Raise ``RATE_LIMIT`` for the server process so the benchmark is not throttled.
+Requires ``httpx``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+
+import httpx
+
+
+async def client(
+    http: httpx.AsyncClient, path: str, requests: int, latencies: list[float]
+) -> int:
+    failures = 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            resp = await http.get(path)
+        except httpx.HTTPError:
+            failures += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        if resp.status_code != 200:
+            failures += 1
+    return failures
+
+
+async def run(url: str, clients: int, requests: int, seed: int, path: str) -> None:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as http:
+        for i in range(seed):
+            await http.post(
+                "/tasks",
+                json={"title": f"bench {i}", "due_date": date.today().isoformat()},
+            )
+        latencies: list[float] = []
+        start = time.perf_counter()
+        failures = await asyncio.gather(
+            *(client(http, path, requests, latencies) for _ in range(clients))
+        )
+        elapsed = time.perf_counter() - start
+
+    total = clients * requests
+    if not latencies:
+        print(f"all {total} requests failed")
+        return
+    latencies.sort()
+    p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+    print(f"{total} requests from {clients} clients in {elapsed:.2f}s")
+    print(f"throughput: {total / elapsed:.1f} req/s, failures: {sum(failures)}")
+    print(
+        f"latency: median {statistics.median(latencies) * 1000:.1f} ms, "
+        f"p95 {p95 * 1000:.1f} ms"
+    )
+
+
+def main(args: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=20, help="tasks to create first")
+    parser.add_argument("--path", default="/tasks")
+    parsed = parser.parse_args(args)
+    asyncio.run(
+        run(parsed.url, parsed.clients, parsed.requests, parsed.seed, parsed.path)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Compare the per-row and the set-based ``/tasks/bulk_update``.
+
+Run with ``python -m benchmarks.bulk_update``. For each size a temporary SQLite
+database is filled with tasks and tags, then every task is updated (and half
+of them given new tags) once with the previous implementation, which loaded
+each task and tag with its own query and refreshed every row, and once with
+:class:`app.bulk.TaskBulkUpdate`. Elapsed time and the number of SQL
+statements sent to the database are reported.
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.bulk import BulkUpdateItem, TaskBulkUpdate
+from app.config import ConfigLoader
+from app.database import Base, build_engine
+
+TAGS = 20
+
+
+def seed(Session, tasks: int) -> None:
+    now = datetime.utcnow()
+    with Session() as db:
+        db.execute(insert(models.Tag), [{"name": f"tag{i}"} for i in range(TAGS)])
+        for offset in range(0, tasks, 5000):
+            rows = [
+                {
+                    "title": f"Task {i}",
+                    "due_date": date(2030, 1, 1) + timedelta(days=i % 365),
+                    "priority": 3,
+                    "completion_percentage": 0,
+                    "updated_at": now,
+                }
+                for i in range(offset, min(tasks, offset + 5000))
+            ]
+            db.execute(insert(models.Task), rows)
+        db.commit()
+
+
+def items(tasks: int, run: int) -> list[BulkUpdateItem]:
+    return [
+        BulkUpdateItem(
+            id=i + 1,
+            data={
+                "title": f"Task {i} (run {run})",
+                "due_date": date(2030, 6, 1),
+                "priority": 1 + i % 5,
+                "tags": [1 + (i + run) % TAGS, 1 + (i + run + 1) % TAGS]
+                if i % 2
+                else [],
+            },
+        )
+        for i in range(tasks)
+    ]
+
+
+def per_row(db, batch: list[BulkUpdateItem]) -> list[models.Task]:
+    """The implementation replaced by :class:`TaskBulkUpdate`."""
+    updated = []
+    for item in batch:
+        task = db.query(models.Task).filter(models.Task.id == item.id).first()
+        if task:
+            payload = item.data.dict()
+            tags = payload.pop("tags", [])
+            for field, value in payload.items():
+                setattr(task, field, value)
+            if tags:
+                task.tags = []
+                for tag_id in tags:
+                    tag = db.query(models.Tag).filter(models.Tag.id == tag_id).first()
+                    if tag:
+                        task.tags.append(tag)
+            updated.append(task)
+    db.commit()
+    for t in updated:
+        db.refresh(t)
+    return updated
+
+
+def set_based(db, batch: list[BulkUpdateItem]) -> list[models.Task]:
+    return TaskBulkUpdate(db).run(batch)
+
+
+def main(args: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1000, 10000])
+    parsed = parser.parse_args(args)
+
+    settings = ConfigLoader().load()
+    for tasks in parsed.tasks:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = build_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", settings)
+            Base.metadata.create_all(bind=engine)
+            Session = sessionmaker(bind=engine)
+            seed(Session, tasks)
+            statements = 0
+
+            @event.listens_for(engine, "before_cursor_execute")
+            def count(*args):
+                nonlocal statements
+                statements += 1
+
+            print(f"{tasks} items")
+            for run, (name, func) in enumerate(
+                (("per-row", per_row), ("set-based", set_based))
+            ):
+                batch = items(tasks, run)
+                statements = 0
+                start = time.perf_counter()
+                with Session() as db:
+                    assert len(func(db, batch)) == tasks
+                elapsed = time.perf_counter() - start
+                print(f"  {name:9} {elapsed:6.2f} s  {statements:7} statements")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare concurrent write throughput of default and tuned engine settings.
+
+Run with ``python -m benchmarks.db_write_throughput``. By default two temporary
+SQLite databases are created: one using SQLite's rollback journal with full
+synchronous writes and one using the configured pragmas (WAL,
+``synchronous=NORMAL``, mmap and busy timeout). Pass ``--url`` to benchmark an
+existing database such as PostgreSQL instead.
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.config import ConfigLoader, Settings
+from app.database import Base, build_engine
+
+
+def run(url: str, settings: Settings, threads: int, writes: int) -> float:
+    """Return committed writes per second for ``threads`` concurrent writers."""
+    engine = build_engine(url, settings)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    errors: list[Exception] = []
+
+    def writer(worker: int) -> None:
+        with Session() as db:
+            for i in range(writes):
+                try:
+                    db.add(models.Tag(name=f"bench-{time.time_ns()}-{worker}-{i}"))
+                    db.commit()
+                except Exception as exc:  # pragma: no cover - reported below
+                    db.rollback()
+                    errors.append(exc)
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    if errors:
+        print(f"  {len(errors)} writes failed, first error: {errors[0]}")
+    return (threads * writes - len(errors)) / elapsed
+
+
+def main(args: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="database URL to benchmark")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200)
+    parsed = parser.parse_args(args)
+
+    tuned = ConfigLoader().load()
+    baseline = replace(
+        tuned,
+        sqlite_journal_mode="DELETE",
+        sqlite_synchronous="FULL",
+        sqlite_mmap_size=0,
+        db_pool_pre_ping=False,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, settings in (("default", baseline), ("tuned", tuned)):
+            url = parsed.url or f"sqlite:///{Path(tmp) / label}.db"
+            rate = run(url, settings, parsed.threads, parsed.writes)
+            print(f"{label:>8}: {rate:10.1f} writes/s ({url})")
+
+
+if __name__ == "__main__":
+    main()
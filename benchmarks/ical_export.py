@@ -0,0 +1,108 @@
+"""Compare peak memory of the buffered and the streaming iCal export.
+
+Run with ``python -m benchmarks.ical_export``. For each size a temporary SQLite
+database is filled with appointments, then the calendar is produced once by
+building a complete ``icalendar.Calendar`` in memory (the previous
+implementation) and once by consuming :meth:`app.ical.IcalExport.stream`
+chunk by chunk. The streaming export runs twice: the second run finds every
+event already rendered in :data:`app.ical.vevent_cache`, as a feed rebuilt
+after a small change would. Peak Python allocations are measured with
+``tracemalloc``, together with the memory still held afterwards, which is
+what the event cache keeps.
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from icalendar import Calendar, Event
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.config import ConfigLoader
+from app.database import Base, build_engine
+from app.ical import IcalExport, vevent_cache
+
+
+def seed(Session, events: int) -> None:
+    start = datetime(2030, 1, 1, 8)
+    now = datetime.utcnow()
+    with Session() as db:
+        for offset in range(0, events, 5000):
+            rows = [
+                {
+                    "title": f"Event {i}",
+                    "description": "Benchmark appointment",
+                    "start_time": start + timedelta(hours=i),
+                    "end_time": start + timedelta(hours=i, minutes=30),
+                    "updated_at": now,
+                }
+                for i in range(offset, min(events, offset + 5000))
+            ]
+            db.execute(insert(models.Appointment), rows)
+        db.commit()
+
+
+def buffered(Session) -> int:
+    with Session() as db:
+        cal = Calendar()
+        for appt in db.query(models.Appointment).all():
+            event = Event()
+            event.add("summary", appt.title)
+            event.add("dtstart", appt.start_time)
+            event.add("dtend", appt.end_time)
+            event.add("description", appt.description or "")
+            cal.add_component(event)
+        return len(cal.to_ical())
+
+
+def streamed(Session) -> int:
+    return sum(len(chunk) for chunk in IcalExport().stream(Session))
+
+
+def measure(func, Session) -> tuple[float, float, float, int]:
+    """Return seconds, peak and retained MiB and output size of ``func``."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = func(Session)
+    elapsed = time.perf_counter() - start
+    retained, peak = (value / 2**20 for value in tracemalloc.get_traced_memory())
+    tracemalloc.stop()
+    return elapsed, peak, retained, size
+
+
+def main(args: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000, 50000])
+    parsed = parser.parse_args(args)
+
+    settings = ConfigLoader().load()
+    for events in parsed.events:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = build_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", settings)
+            Base.metadata.create_all(bind=engine)
+            Session = sessionmaker(bind=engine)
+            seed(Session, events)
+            print(f"{events} events")
+            vevent_cache.clear()
+            for name, func in (
+                ("buffered", buffered),
+                ("streamed", streamed),
+                ("cached", streamed),
+            ):
+                elapsed, peak, retained, size = measure(func, Session)
+                print(
+                    f"  {name:9} {elapsed:6.2f} s  peak {peak:7.1f} MiB"
+                    f"  retained {retained:6.1f} MiB  {size / 2**20:6.1f} MiB output"
+                )
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
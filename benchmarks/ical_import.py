@@ -0,0 +1,97 @@
+"""Time the iCal import of a large synthetic calendar.
+
+Run with ``python -m benchmarks.ical_import``. A calendar with ``--events``
+events (50 000 by default) is written to a temporary file and imported twice
+into an empty SQLite database with :class:`app.ical.IcalImport`: the first run
+inserts every event, the second finds every ``UID`` and updates the rows.
+With ``--memory`` peak Python allocations are measured with ``tracemalloc``
+(which slows the import down considerably); they stay bounded by the chunk
+size rather than the size of the file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.config import ConfigLoader
+from app.database import Base, build_engine
+from app.ical import IMPORT_CHUNK_SIZE, IcalImport
+
+
+def write_calendar(path: Path, events: int) -> None:
+    start = datetime(2030, 1, 1, 8)
+    with path.open("w", encoding="utf-8", newline="") as f:
+        f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Benchmark//EN\r\n")
+        for i in range(events):
+            begin = start + timedelta(hours=i)
+            f.write(
+                "BEGIN:VEVENT\r\n"
+                f"UID:bench-{i}@example.com\r\n"
+                f"DTSTAMP:{begin:%Y%m%dT%H%M%SZ}\r\n"
+                f"SUMMARY:Event {i}\r\n"
+                "DESCRIPTION:Benchmark appointment with a description long enou\r\n"
+                " gh to be folded\r\n"
+                f"DTSTART;TZID=Europe/Berlin:{begin:%Y%m%dT%H%M%S}\r\n"
+                "DURATION:PT30M\r\n"
+                "END:VEVENT\r\n"
+            )
+        f.write("END:VCALENDAR\r\n")
+
+
+def run_import(Session, path: Path, chunk_size: int, memory: bool):
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with Session() as db, path.open("rb") as f:
+        result = IcalImport(db, chunk_size).run(f)
+        db.commit()
+    elapsed = time.perf_counter() - start
+    peak = ""
+    if memory:
+        peak = f"  peak {tracemalloc.get_traced_memory()[1] / 2**20:6.1f} MiB"
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(args: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--memory", action="store_true")
+    parsed = parser.parse_args(args)
+
+    settings = ConfigLoader().load()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.ics"
+        write_calendar(path, parsed.events)
+        engine = build_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", settings)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        print(
+            f"{parsed.events} events, {path.stat().st_size / 2**20:.1f} MiB,"
+            f" chunks of {parsed.chunk_size}"
+        )
+        for name in ("insert", "upsert"):
+            result, elapsed, peak = run_import(
+                Session, path, parsed.chunk_size, parsed.memory
+            )
+            print(
+                f"  {name:7} {elapsed:6.2f} s{peak}"
+                f"  {parsed.events / elapsed:7.0f} events/s"
+                f"  created {result.created} updated {result.updated}"
+            )
+        with Session() as db:
+            assert db.query(models.Appointment).count() == parsed.events
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
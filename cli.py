@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import json
 import logging
 import os
 import sys
@@ -47,6 +48,11 @@ class TaskCLI(BaseCLI):
 
         self.subparsers.add_parser("list", help="List tasks")
 
+        sync = self.subparsers.add_parser(
+            "sync", help="Update a local JSON mirror with changes from the API"
+        )
+        sync.add_argument("--path", default="mirror.json")
+
         exp = self.subparsers.add_parser("export-config", help="Export configuration")
         exp.add_argument("--path", default="config.yaml")
 
@@ -74,6 +80,36 @@ class TaskCLI(BaseCLI):
         for task in resp.json():
             print(f"{task['id']} {task['title']} (due {task['due_date']})")
 
+    def do_sync(self, args: Any) -> None:
+        """Fetch changes since the last run and apply them to the mirror file."""
+        path = Path(args.path)
+        mirror: dict[str, Any] = {"token": None, "tables": {}}
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                mirror = json.load(f)
+        params = {"since": mirror["token"]} if mirror["token"] else {}
+        resp = requests.get(f"{self._api_url()}/sync", params=params, timeout=30)
+        resp.raise_for_status()
+        changes = resp.json()
+        tables = {} if changes["full"] else mirror["tables"]
+        # deletes first: SQLite may reuse the id of a deleted row for a new one
+        deleted = 0
+        for name, ids in changes["deleted"].items():
+            rows = tables.get(name, {})
+            for row_id in ids:
+                deleted += rows.pop(str(row_id), None) is not None
+        updated = 0
+        for name, value in changes.items():
+            if isinstance(value, list):
+                rows = tables.setdefault(name, {})
+                for row in value:
+                    rows[str(row["id"])] = row
+                updated += len(value)
+        mirror = {"token": changes["token"], "tables": tables}
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(mirror, f)
+        print(f"Synced {updated} changed and {deleted} deleted rows to {path}")
+
     def do_export_config(self, args: Any) -> None:
         """Export current configuration to a YAML file."""
         path = Path(args.path)
@@ -4,7 +4,7 @@ from sqlalchemy import engine_from_config, pool
 
 import os
 
-from app import models
+from app import models, search
 
 from alembic import context
 
@@ -24,6 +24,12 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = models.Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # the full-text index is created by app.search, not declared on the models
+    return not (reflected and search.is_index_object(name))
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -46,6 +52,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -69,7 +76,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
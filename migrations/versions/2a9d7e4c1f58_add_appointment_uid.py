@@ -0,0 +1,30 @@
+"""add appointment uid
+
+Revision ID: 2a9d7e4c1f58
+Revises: 8c41f0b7e2d6
+Create Date: 2026-10-19 15:27:44.906311
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "2a9d7e4c1f58"
+down_revision: Union[str, Sequence[str], None] = "8c41f0b7e2d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("appointments", sa.Column("uid", sa.String(), nullable=True))
+    op.create_index(op.f("ix_appointments_uid"), "appointments", ["uid"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_appointments_uid"), table_name="appointments")
+    with op.batch_alter_table("appointments") as batch_op:
+        batch_op.drop_column("uid")
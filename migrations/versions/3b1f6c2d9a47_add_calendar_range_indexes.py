@@ -0,0 +1,42 @@
+"""add calendar range indexes
+
+Revision ID: 3b1f6c2d9a47
+Revises: 872d5ee2c2ba
+Create Date: 2026-10-19 12:05:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b1f6c2d9a47"
+down_revision: Union[str, Sequence[str], None] = "872d5ee2c2ba"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_appointments_start_time_end_time",
+        "appointments",
+        ["start_time", "end_time"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_focus_sessions_start_time_end_time",
+        "focus_sessions",
+        ["start_time", "end_time"],
+        unique=False,
+    )
+    op.create_index(op.f("ix_tasks_due_date"), "tasks", ["due_date"], unique=False)
+    op.create_index(op.f("ix_tasks_start_date"), "tasks", ["start_date"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_tasks_start_date"), table_name="tasks")
+    op.drop_index(op.f("ix_tasks_due_date"), table_name="tasks")
+    op.drop_index("ix_focus_sessions_start_time_end_time", table_name="focus_sessions")
+    op.drop_index("ix_appointments_start_time_end_time", table_name="appointments")
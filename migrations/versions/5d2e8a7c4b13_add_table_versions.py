@@ -0,0 +1,33 @@
+"""add table versions
+
+Revision ID: 5d2e8a7c4b13
+Revises: 3b1f6c2d9a47
+Create Date: 2026-10-19 12:41:09.532871
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5d2e8a7c4b13"
+down_revision: Union[str, Sequence[str], None] = "3b1f6c2d9a47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "table_versions",
+        sa.Column("table_name", sa.String(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("table_name"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("table_versions")
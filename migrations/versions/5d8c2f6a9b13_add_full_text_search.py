@@ -0,0 +1,77 @@
+"""add full text search
+
+Revision ID: 5d8c2f6a9b13
+Revises: 6e3b9a1d4c72
+Create Date: 2026-10-19 18:02:41.117304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5d8c2f6a9b13"
+down_revision: Union[str, Sequence[str], None] = "6e3b9a1d4c72"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("tasks", "appointments")
+
+
+def sqlite_upgrade(name: str) -> list[str]:
+    fts = f"{name}_fts"
+    new = "new.id, new.title, new.description"
+    old = "'delete', old.id, old.title, old.description"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5(title, description,"
+        f" content='{name}', content_rowid='id',"
+        " tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {name} BEGIN"
+        f" INSERT INTO {fts}(rowid, title, description) VALUES ({new}); END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {name} BEGIN"
+        f" INSERT INTO {fts}({fts}, rowid, title, description) VALUES ({old});"
+        " END",
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF title, description"
+        f" ON {name} BEGIN"
+        f" INSERT INTO {fts}({fts}, rowid, title, description) VALUES ({old});"
+        f" INSERT INTO {fts}(rowid, title, description) VALUES ({new}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def postgresql_upgrade(name: str) -> list[str]:
+    return [
+        f"ALTER TABLE {name} ADD COLUMN search_vector tsvector"
+        " GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+        ") STORED",
+        f"CREATE INDEX ix_{name}_search_vector ON {name}" " USING GIN (search_vector)",
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    for name in TABLES:
+        if dialect == "sqlite":
+            statements = sqlite_upgrade(name)
+        elif dialect == "postgresql":
+            statements = postgresql_upgrade(name)
+        else:
+            statements = []
+        for statement in statements:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    for name in TABLES:
+        if dialect == "sqlite":
+            for trigger in ("insert", "delete", "update"):
+                op.execute(f"DROP TRIGGER IF EXISTS {name}_fts_{trigger}")
+            op.execute(f"DROP TABLE IF EXISTS {name}_fts")
+        elif dialect == "postgresql":
+            op.execute(f"DROP INDEX IF EXISTS ix_{name}_search_vector")
+            op.execute(f"ALTER TABLE {name} DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,58 @@
+"""add recurring appointments
+
+Revision ID: 6e3b9a1d4c72
+Revises: 2a9d7e4c1f58
+Create Date: 2026-10-19 16:11:08.530927
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "6e3b9a1d4c72"
+down_revision: Union[str, Sequence[str], None] = "2a9d7e4c1f58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("appointments", sa.Column("rrule", sa.String(), nullable=True))
+    op.add_column(
+        "appointments", sa.Column("recurrence_end", sa.DateTime(), nullable=True)
+    )
+    op.create_table(
+        "appointment_overrides",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("appointment_id", sa.Integer(), nullable=False),
+        sa.Column("recurrence_id", sa.DateTime(), nullable=False),
+        sa.Column("cancelled", sa.Boolean(), nullable=False),
+        sa.Column("start_time", sa.DateTime(), nullable=True),
+        sa.Column("end_time", sa.DateTime(), nullable=True),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["appointment_id"], ["appointments.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("appointment_id", "recurrence_id"),
+    )
+    op.create_index(
+        op.f("ix_appointment_overrides_id"),
+        "appointment_overrides",
+        ["id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_appointment_overrides_id"), table_name="appointment_overrides"
+    )
+    op.drop_table("appointment_overrides")
+    with op.batch_alter_table("appointments") as batch_op:
+        batch_op.drop_column("recurrence_end")
+        batch_op.drop_column("rrule")
@@ -0,0 +1,67 @@
+"""add updated_at columns and tombstones
+
+Revision ID: 8c41f0b7e2d6
+Revises: 5d2e8a7c4b13
+Create Date: 2026-10-19 14:02:37.118204
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8c41f0b7e2d6"
+down_revision: Union[str, Sequence[str], None] = "5d2e8a7c4b13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SYNCED_TABLES = (
+    "categories",
+    "appointments",
+    "tasks",
+    "subtasks",
+    "focus_sessions",
+    "tags",
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    now = datetime.utcnow()
+    for table in SYNCED_TABLES:
+        op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=True))
+        op.execute(
+            sa.table(table, sa.column("updated_at", sa.DateTime()))
+            .update()
+            .values(updated_at=now)
+        )
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                "updated_at", existing_type=sa.DateTime(), nullable=False
+            )
+        op.create_index(
+            op.f(f"ix_{table}_updated_at"), table, ["updated_at"], unique=False
+        )
+    op.create_table(
+        "tombstones",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("table_name", sa.String(), nullable=False),
+        sa.Column("row_id", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_tombstones_deleted_at"), "tombstones", ["deleted_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_tombstones_deleted_at"), table_name="tombstones")
+    op.drop_table("tombstones")
+    for table in reversed(SYNCED_TABLES):
+        op.drop_index(op.f(f"ix_{table}_updated_at"), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("updated_at")
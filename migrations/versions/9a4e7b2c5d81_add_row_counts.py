@@ -0,0 +1,33 @@
+"""add row counts
+
+Revision ID: 9a4e7b2c5d81
+Revises: 5d8c2f6a9b13
+Create Date: 2026-10-19 21:14:52.308417
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9a4e7b2c5d81"
+down_revision: Union[str, Sequence[str], None] = "5d8c2f6a9b13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "row_counts",
+        sa.Column("table_name", sa.String(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("reconciled_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("table_name"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("row_counts")
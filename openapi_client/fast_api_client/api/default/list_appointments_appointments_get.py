@@ -1,26 +1,60 @@
 from http import HTTPStatus
-from typing import Any, Optional, Union
+from typing import Any, Optional, Union, cast
 
 import httpx
 
 from ... import errors
 from ...client import AuthenticatedClient, Client
 from ...models.appointment import Appointment
-from ...types import Response
+from ...models.http_validation_error import HTTPValidationError
+from ...types import UNSET, Response, Unset
 
 
-def _get_kwargs() -> dict[str, Any]:
+def _get_kwargs(
+    *,
+    limit: Union[None, Unset, int] = UNSET,
+    cursor: Union[None, Unset, str] = UNSET,
+    if_none_match: Union[None, Unset, str] = UNSET,
+    if_modified_since: Union[None, Unset, str] = UNSET,
+) -> dict[str, Any]:
+    headers: dict[str, Any] = {}
+    if not isinstance(if_none_match, Unset):
+        headers["if-none-match"] = if_none_match
+
+    if not isinstance(if_modified_since, Unset):
+        headers["if-modified-since"] = if_modified_since
+
+    params: dict[str, Any] = {}
+
+    json_limit: Union[None, Unset, int]
+    if isinstance(limit, Unset):
+        json_limit = UNSET
+    else:
+        json_limit = limit
+    params["limit"] = json_limit
+
+    json_cursor: Union[None, Unset, str]
+    if isinstance(cursor, Unset):
+        json_cursor = UNSET
+    else:
+        json_cursor = cursor
+    params["cursor"] = json_cursor
+
+    params = {k: v for k, v in params.items() if v is not UNSET and v is not None}
+
     _kwargs: dict[str, Any] = {
         "method": "get",
         "url": "/appointments",
+        "params": params,
     }
 
+    _kwargs["headers"] = headers
     return _kwargs
 
 
 def _parse_response(
     *, client: Union[AuthenticatedClient, Client], response: httpx.Response
-) -> Optional[list["Appointment"]]:
+) -> Optional[Union[Any, HTTPValidationError, list["Appointment"]]]:
     if response.status_code == 200:
         response_200 = []
         _response_200 = response.json()
@@ -30,6 +64,13 @@ def _parse_response(
             response_200.append(response_200_item)
 
         return response_200
+    if response.status_code == 304:
+        response_304 = cast(Any, None)
+        return response_304
+    if response.status_code == 422:
+        response_422 = HTTPValidationError.from_dict(response.json())
+
+        return response_422
     if client.raise_on_unexpected_status:
         raise errors.UnexpectedStatus(response.status_code, response.content)
     else:
@@ -38,7 +79,7 @@ def _parse_response(
 
 def _build_response(
     *, client: Union[AuthenticatedClient, Client], response: httpx.Response
-) -> Response[list["Appointment"]]:
+) -> Response[Union[Any, HTTPValidationError, list["Appointment"]]]:
     return Response(
         status_code=HTTPStatus(response.status_code),
         content=response.content,
@@ -50,18 +91,33 @@ def _build_response(
 def sync_detailed(
     *,
     client: Union[AuthenticatedClient, Client],
-) -> Response[list["Appointment"]]:
+    limit: Union[None, Unset, int] = UNSET,
+    cursor: Union[None, Unset, str] = UNSET,
+    if_none_match: Union[None, Unset, str] = UNSET,
+    if_modified_since: Union[None, Unset, str] = UNSET,
+) -> Response[Union[Any, HTTPValidationError, list["Appointment"]]]:
     """List Appointments
 
+    Args:
+        limit (Union[None, Unset, int]):
+        cursor (Union[None, Unset, str]):
+        if_none_match (Union[None, Unset, str]):
+        if_modified_since (Union[None, Unset, str]):
+
     Raises:
         errors.UnexpectedStatus: If the server returns an undocumented status code and Client.raise_on_unexpected_status is True.
         httpx.TimeoutException: If the request takes longer than Client.timeout.
 
     Returns:
-        Response[list['Appointment']]
+        Response[Union[Any, HTTPValidationError, list['Appointment']]]
     """
 
-    kwargs = _get_kwargs()
+    kwargs = _get_kwargs(
+        limit=limit,
+        cursor=cursor,
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
+    )
 
     response = client.get_httpx_client().request(
         **kwargs,
@@ -73,18 +129,32 @@ def sync_detailed(
 def sync(
     *,
     client: Union[AuthenticatedClient, Client],
-) -> Optional[list["Appointment"]]:
+    limit: Union[None, Unset, int] = UNSET,
+    cursor: Union[None, Unset, str] = UNSET,
+    if_none_match: Union[None, Unset, str] = UNSET,
+    if_modified_since: Union[None, Unset, str] = UNSET,
+) -> Optional[Union[Any, HTTPValidationError, list["Appointment"]]]:
     """List Appointments
 
+    Args:
+        limit (Union[None, Unset, int]):
+        cursor (Union[None, Unset, str]):
+        if_none_match (Union[None, Unset, str]):
+        if_modified_since (Union[None, Unset, str]):
+
     Raises:
         errors.UnexpectedStatus: If the server returns an undocumented status code and Client.raise_on_unexpected_status is True.
         httpx.TimeoutException: If the request takes longer than Client.timeout.
 
     Returns:
-        list['Appointment']
+        Union[Any, HTTPValidationError, list['Appointment']]
     """
 
     return sync_detailed(
+        limit=limit,
+        cursor=cursor,
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
         client=client,
     ).parsed
 
@@ -92,18 +162,33 @@ def sync(
 async def asyncio_detailed(
     *,
     client: Union[AuthenticatedClient, Client],
-) -> Response[list["Appointment"]]:
+    limit: Union[None, Unset, int] = UNSET,
+    cursor: Union[None, Unset, str] = UNSET,
+    if_none_match: Union[None, Unset, str] = UNSET,
+    if_modified_since: Union[None, Unset, str] = UNSET,
+) -> Response[Union[Any, HTTPValidationError, list["Appointment"]]]:
     """List Appointments
 
+    Args:
+        limit (Union[None, Unset, int]):
+        cursor (Union[None, Unset, str]):
+        if_none_match (Union[None, Unset, str]):
+        if_modified_since (Union[None, Unset, str]):
+
     Raises:
         errors.UnexpectedStatus: If the server returns an undocumented status code and Client.raise_on_unexpected_status is True.
         httpx.TimeoutException: If the request takes longer than Client.timeout.
 
     Returns:
-        Response[list['Appointment']]
+        Response[Union[Any, HTTPValidationError, list['Appointment']]]
     """
 
-    kwargs = _get_kwargs()
+    kwargs = _get_kwargs(
+        limit=limit,
+        cursor=cursor,
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
+    )
 
     response = await client.get_async_httpx_client().request(**kwargs)
 
@@ -113,19 +198,33 @@ async def asyncio_detailed(
 async def asyncio(
     *,
     client: Union[AuthenticatedClient, Client],
-) -> Optional[list["Appointment"]]:
+    limit: Union[None, Unset, int] = UNSET,
+    cursor: Union[None, Unset, str] = UNSET,
+    if_none_match: Union[None, Unset, str] = UNSET,
+    if_modified_since: Union[None, Unset, str] = UNSET,
+) -> Optional[Union[Any, HTTPValidationError, list["Appointment"]]]:
     """List Appointments
 
+    Args:
+        limit (Union[None, Unset, int]):
+        cursor (Union[None, Unset, str]):
+        if_none_match (Union[None, Unset, str]):
+        if_modified_since (Union[None, Unset, str]):
+
     Raises:
         errors.UnexpectedStatus: If the server returns an undocumented status code and Client.raise_on_unexpected_status is True.
         httpx.TimeoutException: If the request takes longer than Client.timeout.
 
     Returns:
-        list['Appointment']
+        Union[Any, HTTPValidationError, list['Appointment']]
     """
 
     return (
         await asyncio_detailed(
+            limit=limit,
+            cursor=cursor,
+            if_none_match=if_none_match,
+            if_modified_since=if_modified_since,
             client=client,
         )
     ).parsed
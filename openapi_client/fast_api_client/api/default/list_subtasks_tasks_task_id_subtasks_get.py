@@ -1,5 +1,5 @@
 from http import HTTPStatus
-from typing import Any, Optional, Union
+from typing import Any, Optional, Union, cast
 
 import httpx
 
@@ -7,23 +7,55 @@ from ... import errors
 from ...client import AuthenticatedClient, Client
 from ...models.http_validation_error import HTTPValidationError
 from ...models.subtask import Subtask
-from ...types import Response
+from ...types import UNSET, Response, Unset
 
 
 def _get_kwargs(
     task_id: int,
+    *,
+    limit: Union[None, Unset, int] = UNSET,
+    cursor: Union[None, Unset, str] = UNSET,
+    if_none_match: Union[None, Unset, str] = UNSET,
+    if_modified_since: Union[None, Unset, str] = UNSET,
 ) -> dict[str, Any]:
+    headers: dict[str, Any] = {}
+    if not isinstance(if_none_match, Unset):
+        headers["if-none-match"] = if_none_match
+
+    if not isinstance(if_modified_since, Unset):
+        headers["if-modified-since"] = if_modified_since
+
+    params: dict[str, Any] = {}
+
+    json_limit: Union[None, Unset, int]
+    if isinstance(limit, Unset):
+        json_limit = UNSET
+    else:
+        json_limit = limit
+    params["limit"] = json_limit
+
+    json_cursor: Union[None, Unset, str]
+    if isinstance(cursor, Unset):
+        json_cursor = UNSET
+    else:
+        json_cursor = cursor
+    params["cursor"] = json_cursor
+
+    params = {k: v for k, v in params.items() if v is not UNSET and v is not None}
+
     _kwargs: dict[str, Any] = {
         "method": "get",
         "url": f"/tasks/{task_id}/subtasks",
+        "params": params,
     }
 
+    _kwargs["headers"] = headers
     return _kwargs
 
 
 def _parse_response(
     *, client: Union[AuthenticatedClient, Client], response: httpx.Response
-) -> Optional[Union[HTTPValidationError, list["Subtask"]]]:
+) -> Optional[Union[Any, HTTPValidationError, list["Subtask"]]]:
     if response.status_code == 200:
         response_200 = []
         _response_200 = response.json()
@@ -33,6 +65,9 @@ def _parse_response(
             response_200.append(response_200_item)
 
         return response_200
+    if response.status_code == 304:
+        response_304 = cast(Any, None)
+        return response_304
     if response.status_code == 422:
         response_422 = HTTPValidationError.from_dict(response.json())
 
@@ -45,7 +80,7 @@ def _parse_response(
 
 def _build_response(
     *, client: Union[AuthenticatedClient, Client], response: httpx.Response
-) -> Response[Union[HTTPValidationError, list["Subtask"]]]:
+) -> Response[Union[Any, HTTPValidationError, list["Subtask"]]]:
     return Response(
         status_code=HTTPStatus(response.status_code),
         content=response.content,
@@ -58,22 +93,34 @@ def sync_detailed(
     task_id: int,
     *,
     client: Union[AuthenticatedClient, Client],
-) -> Response[Union[HTTPValidationError, list["Subtask"]]]:
+    limit: Union[None, Unset, int] = UNSET,
+    cursor: Union[None, Unset, str] = UNSET,
+    if_none_match: Union[None, Unset, str] = UNSET,
+    if_modified_since: Union[None, Unset, str] = UNSET,
+) -> Response[Union[Any, HTTPValidationError, list["Subtask"]]]:
     """List Subtasks
 
     Args:
         task_id (int):
+        limit (Union[None, Unset, int]):
+        cursor (Union[None, Unset, str]):
+        if_none_match (Union[None, Unset, str]):
+        if_modified_since (Union[None, Unset, str]):
 
     Raises:
         errors.UnexpectedStatus: If the server returns an undocumented status code and Client.raise_on_unexpected_status is True.
         httpx.TimeoutException: If the request takes longer than Client.timeout.
 
     Returns:
-        Response[Union[HTTPValidationError, list['Subtask']]]
+        Response[Union[Any, HTTPValidationError, list['Subtask']]]
     """
 
     kwargs = _get_kwargs(
         task_id=task_id,
+        limit=limit,
+        cursor=cursor,
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
     )
 
     response = client.get_httpx_client().request(
@@ -87,22 +134,34 @@ def sync(
     task_id: int,
     *,
     client: Union[AuthenticatedClient, Client],
-) -> Optional[Union[HTTPValidationError, list["Subtask"]]]:
+    limit: Union[None, Unset, int] = UNSET,
+    cursor: Union[None, Unset, str] = UNSET,
+    if_none_match: Union[None, Unset, str] = UNSET,
+    if_modified_since: Union[None, Unset, str] = UNSET,
+) -> Optional[Union[Any, HTTPValidationError, list["Subtask"]]]:
     """List Subtasks
 
     Args:
         task_id (int):
+        limit (Union[None, Unset, int]):
+        cursor (Union[None, Unset, str]):
+        if_none_match (Union[None, Unset, str]):
+        if_modified_since (Union[None, Unset, str]):
 
     Raises:
         errors.UnexpectedStatus: If the server returns an undocumented status code and Client.raise_on_unexpected_status is True.
         httpx.TimeoutException: If the request takes longer than Client.timeout.
 
     Returns:
-        Union[HTTPValidationError, list['Subtask']]
+        Union[Any, HTTPValidationError, list['Subtask']]
     """
 
     return sync_detailed(
         task_id=task_id,
+        limit=limit,
+        cursor=cursor,
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
         client=client,
     ).parsed
 
@@ -111,22 +170,34 @@ async def asyncio_detailed(
     task_id: int,
     *,
     client: Union[AuthenticatedClient, Client],
-) -> Response[Union[HTTPValidationError, list["Subtask"]]]:
+    limit: Union[None, Unset, int] = UNSET,
+    cursor: Union[None, Unset, str] = UNSET,
+    if_none_match: Union[None, Unset, str] = UNSET,
+    if_modified_since: Union[None, Unset, str] = UNSET,
+) -> Response[Union[Any, HTTPValidationError, list["Subtask"]]]:
     """List Subtasks
 
     Args:
         task_id (int):
+        limit (Union[None, Unset, int]):
+        cursor (Union[None, Unset, str]):
+        if_none_match (Union[None, Unset, str]):
+        if_modified_since (Union[None, Unset, str]):
 
     Raises:
         errors.UnexpectedStatus: If the server returns an undocumented status code and Client.raise_on_unexpected_status is True.
         httpx.TimeoutException: If the request takes longer than Client.timeout.
 
     Returns:
-        Response[Union[HTTPValidationError, list['Subtask']]]
+        Response[Union[Any, HTTPValidationError, list['Subtask']]]
     """
 
     kwargs = _get_kwargs(
         task_id=task_id,
+        limit=limit,
+        cursor=cursor,
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
     )
 
     response = await client.get_async_httpx_client().request(**kwargs)
@@ -138,23 +209,35 @@ async def asyncio(
     task_id: int,
     *,
     client: Union[AuthenticatedClient, Client],
-) -> Optional[Union[HTTPValidationError, list["Subtask"]]]:
+    limit: Union[None, Unset, int] = UNSET,
+    cursor: Union[None, Unset, str] = UNSET,
+    if_none_match: Union[None, Unset, str] = UNSET,
+    if_modified_since: Union[None, Unset, str] = UNSET,
+) -> Optional[Union[Any, HTTPValidationError, list["Subtask"]]]:
     """List Subtasks
 
     Args:
         task_id (int):
+        limit (Union[None, Unset, int]):
+        cursor (Union[None, Unset, str]):
+        if_none_match (Union[None, Unset, str]):
+        if_modified_since (Union[None, Unset, str]):
 
     Raises:
         errors.UnexpectedStatus: If the server returns an undocumented status code and Client.raise_on_unexpected_status is True.
         httpx.TimeoutException: If the request takes longer than Client.timeout.
 
     Returns:
-        Union[HTTPValidationError, list['Subtask']]
+        Union[Any, HTTPValidationError, list['Subtask']]
     """
 
     return (
         await asyncio_detailed(
             task_id=task_id,
+            limit=limit,
+            cursor=cursor,
+            if_none_match=if_none_match,
+            if_modified_since=if_modified_since,
             client=client,
         )
     ).parsed
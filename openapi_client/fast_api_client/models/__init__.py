@@ -13,6 +13,9 @@ from .plan_task_create import PlanTaskCreate
 from .subtask import Subtask
 from .subtask_create import SubtaskCreate
 from .subtask_update import SubtaskUpdate
+from .sync_changes import SyncChanges
+from .sync_changes_deleted import SyncChangesDeleted
+from .tag import Tag
 from .task import Task
 from .task_create import TaskCreate
 from .task_update import TaskUpdate
@@ -32,6 +35,9 @@ __all__ = (
     "Subtask",
     "SubtaskCreate",
     "SubtaskUpdate",
+    "SyncChanges",
+    "SyncChangesDeleted",
+    "Tag",
     "Task",
     "TaskCreate",
     "TaskUpdate",
@@ -0,0 +1,217 @@
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any, TypeVar, Union
+
+from attrs import define as _attrs_define
+from attrs import field as _attrs_field
+
+from ..types import UNSET, Unset
+
+if TYPE_CHECKING:
+    from ..models.appointment import Appointment
+    from ..models.category import Category
+    from ..models.focus_session import FocusSession
+    from ..models.subtask import Subtask
+    from ..models.sync_changes_deleted import SyncChangesDeleted
+    from ..models.tag import Tag
+    from ..models.task import Task
+
+
+T = TypeVar("T", bound="SyncChanges")
+
+
+@_attrs_define
+class SyncChanges:
+    """
+    Attributes:
+        token (str):
+        full (bool):
+        categories (Union[Unset, list['Category']]):
+        tags (Union[Unset, list['Tag']]):
+        appointments (Union[Unset, list['Appointment']]):
+        tasks (Union[Unset, list['Task']]):
+        subtasks (Union[Unset, list['Subtask']]):
+        focus_sessions (Union[Unset, list['FocusSession']]):
+        deleted (Union[Unset, SyncChangesDeleted]):
+    """
+
+    token: str
+    full: bool
+    categories: Union[Unset, list["Category"]] = UNSET
+    tags: Union[Unset, list["Tag"]] = UNSET
+    appointments: Union[Unset, list["Appointment"]] = UNSET
+    tasks: Union[Unset, list["Task"]] = UNSET
+    subtasks: Union[Unset, list["Subtask"]] = UNSET
+    focus_sessions: Union[Unset, list["FocusSession"]] = UNSET
+    deleted: Union[Unset, "SyncChangesDeleted"] = UNSET
+    additional_properties: dict[str, Any] = _attrs_field(init=False, factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        token = self.token
+
+        full = self.full
+
+        categories: Union[Unset, list[dict[str, Any]]] = UNSET
+        if not isinstance(self.categories, Unset):
+            categories = []
+            for categories_item_data in self.categories:
+                categories_item = categories_item_data.to_dict()
+                categories.append(categories_item)
+
+        tags: Union[Unset, list[dict[str, Any]]] = UNSET
+        if not isinstance(self.tags, Unset):
+            tags = []
+            for tags_item_data in self.tags:
+                tags_item = tags_item_data.to_dict()
+                tags.append(tags_item)
+
+        appointments: Union[Unset, list[dict[str, Any]]] = UNSET
+        if not isinstance(self.appointments, Unset):
+            appointments = []
+            for appointments_item_data in self.appointments:
+                appointments_item = appointments_item_data.to_dict()
+                appointments.append(appointments_item)
+
+        tasks: Union[Unset, list[dict[str, Any]]] = UNSET
+        if not isinstance(self.tasks, Unset):
+            tasks = []
+            for tasks_item_data in self.tasks:
+                tasks_item = tasks_item_data.to_dict()
+                tasks.append(tasks_item)
+
+        subtasks: Union[Unset, list[dict[str, Any]]] = UNSET
+        if not isinstance(self.subtasks, Unset):
+            subtasks = []
+            for subtasks_item_data in self.subtasks:
+                subtasks_item = subtasks_item_data.to_dict()
+                subtasks.append(subtasks_item)
+
+        focus_sessions: Union[Unset, list[dict[str, Any]]] = UNSET
+        if not isinstance(self.focus_sessions, Unset):
+            focus_sessions = []
+            for focus_sessions_item_data in self.focus_sessions:
+                focus_sessions_item = focus_sessions_item_data.to_dict()
+                focus_sessions.append(focus_sessions_item)
+
+        deleted: Union[Unset, dict[str, Any]] = UNSET
+        if not isinstance(self.deleted, Unset):
+            deleted = self.deleted.to_dict()
+
+        field_dict: dict[str, Any] = {}
+        field_dict.update(self.additional_properties)
+        field_dict.update(
+            {
+                "token": token,
+                "full": full,
+            }
+        )
+        if categories is not UNSET:
+            field_dict["categories"] = categories
+        if tags is not UNSET:
+            field_dict["tags"] = tags
+        if appointments is not UNSET:
+            field_dict["appointments"] = appointments
+        if tasks is not UNSET:
+            field_dict["tasks"] = tasks
+        if subtasks is not UNSET:
+            field_dict["subtasks"] = subtasks
+        if focus_sessions is not UNSET:
+            field_dict["focus_sessions"] = focus_sessions
+        if deleted is not UNSET:
+            field_dict["deleted"] = deleted
+
+        return field_dict
+
+    @classmethod
+    def from_dict(cls: type[T], src_dict: Mapping[str, Any]) -> T:
+        from ..models.appointment import Appointment
+        from ..models.category import Category
+        from ..models.focus_session import FocusSession
+        from ..models.subtask import Subtask
+        from ..models.sync_changes_deleted import SyncChangesDeleted
+        from ..models.tag import Tag
+        from ..models.task import Task
+
+        d = dict(src_dict)
+        token = d.pop("token")
+
+        full = d.pop("full")
+
+        categories = []
+        _categories = d.pop("categories", UNSET)
+        for categories_item_data in _categories or []:
+            categories_item = Category.from_dict(categories_item_data)
+
+            categories.append(categories_item)
+
+        tags = []
+        _tags = d.pop("tags", UNSET)
+        for tags_item_data in _tags or []:
+            tags_item = Tag.from_dict(tags_item_data)
+
+            tags.append(tags_item)
+
+        appointments = []
+        _appointments = d.pop("appointments", UNSET)
+        for appointments_item_data in _appointments or []:
+            appointments_item = Appointment.from_dict(appointments_item_data)
+
+            appointments.append(appointments_item)
+
+        tasks = []
+        _tasks = d.pop("tasks", UNSET)
+        for tasks_item_data in _tasks or []:
+            tasks_item = Task.from_dict(tasks_item_data)
+
+            tasks.append(tasks_item)
+
+        subtasks = []
+        _subtasks = d.pop("subtasks", UNSET)
+        for subtasks_item_data in _subtasks or []:
+            subtasks_item = Subtask.from_dict(subtasks_item_data)
+
+            subtasks.append(subtasks_item)
+
+        focus_sessions = []
+        _focus_sessions = d.pop("focus_sessions", UNSET)
+        for focus_sessions_item_data in _focus_sessions or []:
+            focus_sessions_item = FocusSession.from_dict(focus_sessions_item_data)
+
+            focus_sessions.append(focus_sessions_item)
+
+        _deleted = d.pop("deleted", UNSET)
+        deleted: Union[Unset, SyncChangesDeleted]
+        if isinstance(_deleted, Unset):
+            deleted = UNSET
+        else:
+            deleted = SyncChangesDeleted.from_dict(_deleted)
+
+        sync_changes = cls(
+            token=token,
+            full=full,
+            categories=categories,
+            tags=tags,
+            appointments=appointments,
+            tasks=tasks,
+            subtasks=subtasks,
+            focus_sessions=focus_sessions,
+            deleted=deleted,
+        )
+
+        sync_changes.additional_properties = d
+        return sync_changes
+
+    @property
+    def additional_keys(self) -> list[str]:
+        return list(self.additional_properties.keys())
+
+    def __getitem__(self, key: str) -> Any:
+        return self.additional_properties[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.additional_properties[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self.additional_properties[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.additional_properties
@@ -1,5 +1,10 @@
 import calendar
+import json
 import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 from datetime import time as dtime
 from datetime import timedelta
@@ -9,6 +14,19 @@ import streamlit as st
 from streamlit_calendar import calendar as st_calendar
 
 API_URL = "http://localhost:8000"
+PAGE_SIZE = int(os.getenv("GUI_PAGE_SIZE", "50"))
+CALENDAR_CACHE_SECONDS = int(os.getenv("GUI_CALENDAR_CACHE_SECONDS", "60"))
+LIVE_EVENTS = os.getenv("GUI_LIVE_EVENTS", "0") in {"1", "true", "True"}
+
+# tables whose changes affect the response of each top-level path
+PATH_TABLES = {
+    "tasks": ("tasks", "subtasks", "focus_sessions", "tags"),
+    "appointments": ("appointments", "tags"),
+    "categories": ("categories",),
+    "tags": ("tags",),
+    "calendar": ("appointments", "tasks", "focus_sessions", "tags"),
+    "admin": ("tasks", "appointments", "categories"),
+}
 
 st.title("Calendar App")
 st.markdown(
@@ -76,46 +94,212 @@ if "calendar_view" not in st.session_state:
     st.session_state["calendar_view"] = "Day"
 if "calendar_date" not in st.session_state:
     st.session_state["calendar_date"] = date.today()
+if "calendar_cache" not in st.session_state:
+    st.session_state["calendar_cache"] = {}
 
 
 if "stats" not in st.session_state:
     st.session_state["stats"] = {}
+if "etag_cache" not in st.session_state:
+    st.session_state["etag_cache"] = {}
+
+
+class ChangeFeed:
+    """Follow ``GET /events`` in a background thread, counting changes per table."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.counts: Counter = Counter()
+        self.connected = False
+        self._stopped = threading.Event()
+        self._response: requests.Response | None = None
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def close(self) -> None:
+        """Stop following the feed and close the open stream."""
+        self._stopped.set()
+        if self._response is not None:
+            self._response.close()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                with requests.get(self.url, stream=True, timeout=60) as resp:
+                    self._response = resp
+                    for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+                        if line == ": connected":
+                            self.connected = True
+                        elif line.startswith("data: "):
+                            self.counts[json.loads(line[6:])["table"]] += 1
+            # close() from another thread leaves urllib3 without a file object
+            except (requests.RequestException, ValueError, AttributeError):
+                pass
+            self._response = None
+            self.connected = False
+            self._stopped.wait(3)
+
+    def snapshot(self, path: str) -> tuple | None:
+        """Change counts of the tables behind ``path``; ``None`` when offline."""
+        tables = PATH_TABLES.get(path.strip("/").split("/")[0])
+        if not self.connected or tables is None:
+            return None
+        return tuple(self.counts[t] for t in tables)
 
 
-def refresh():
-    resp = requests.get(f"{API_URL}/appointments")
-    if resp.status_code == 200:
-        st.session_state["appointments"] = resp.json()
+@st.cache_resource(on_release=lambda feed: feed and feed.close())
+def change_feed() -> ChangeFeed | None:
+    return ChangeFeed(f"{API_URL}/events") if LIVE_EVENTS else None
 
 
-def refresh_categories():
-    resp = requests.get(f"{API_URL}/categories")
-    if resp.status_code == 200:
-        st.session_state["categories"] = resp.json()
+def feed_snapshot(path: str) -> tuple | None:
+    feed = change_feed()
+    return feed.snapshot(path) if feed else None
 
 
-def refresh_tasks():
-    resp = requests.get(f"{API_URL}/tasks")
-    if resp.status_code == 200:
-        tasks = resp.json()
-        for t in tasks:
-            sresp = requests.get(f"{API_URL}/tasks/{t['id']}/subtasks")
-            t["subtasks"] = sresp.json() if sresp.status_code == 200 else []
-            fresp = requests.get(f"{API_URL}/tasks/{t['id']}/focus_sessions")
-            t["focus_sessions"] = fresp.json() if fresp.status_code == 200 else []
-        st.session_state["tasks"] = tasks
+def cached_get(path: str, params: dict | None = None):
+    """GET ``path`` revalidating with the last ``ETag`` seen for it.
+
+    Returns the JSON body and response headers, reusing the cached copy when
+    the API answers ``304 Not Modified``, or ``(None, {})`` on errors. With
+    ``GUI_LIVE_EVENTS`` the cached copy is reused without a request as long as
+    no change to the tables behind ``path`` has been announced on ``/events``.
+    """
+    cache = st.session_state["etag_cache"]
+    key = (path, tuple(sorted((params or {}).items())))
+    cached = cache.get(key)
+    # taken before the request so changes made meanwhile are not missed
+    snapshot = feed_snapshot(path)
+    if cached and snapshot is not None and cached[3] == snapshot:
+        return cached[1], cached[2]
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    resp = requests.get(f"{API_URL}{path}", params=params, headers=headers)
+    if resp.status_code == 304 and cached:
+        cache[key] = (*cached[:3], snapshot)
+        return cached[1], cached[2]
+    if resp.status_code != 200:
+        return None, {}
+    data = resp.json()
+    if "ETag" in resp.headers:
+        cache[key] = (resp.headers["ETag"], data, resp.headers.copy(), snapshot)
+    return data, resp.headers
+
+
+def revalidate(path: str) -> None:
+    """Make the next ``cached_get`` of ``path`` ask the API after our own writes.
+
+    The ``/events`` notification for a write may arrive after the rerun that
+    displays its result.
+    """
+    cache = st.session_state["etag_cache"]
+    for key, entry in cache.items():
+        if key[0] == path:
+            cache[key] = (*entry[:3], None)
+
+
+def fetch_page(path: str, cursor: str | None = None, params: dict | None = None):
+    """Return one page of ``path`` and the cursor of the next page."""
+    params = {**(params or {}), "limit": PAGE_SIZE}
+    if cursor:
+        params["cursor"] = cursor
+    items, headers = cached_get(path, params)
+    if items is None:
+        return None, None
+    return items, headers.get("X-Next-Cursor")
+
+
+def load_pages(
+    key: str, path: str, pages: int | None = None, params: dict | None = None
+) -> list:
+    """Load ``pages`` pages of ``path`` (all when ``None``) into session state."""
+    items: list = []
+    cursor = None
+    loaded = 0
+    while pages is None or loaded < pages:
+        page, cursor = fetch_page(path, cursor, params)
+        if page is None:
+            return []
+        items += page
+        loaded += 1
+        if not cursor:
+            break
+    st.session_state[key] = items
+    st.session_state[f"{key}_cursor"] = cursor
+    return items
+
+
+def show_more(key: str) -> None:
+    """Show one more page of ``key`` on the next run."""
+    st.session_state[f"{key}_pages"] = st.session_state.get(f"{key}_pages", 1) + 1
+
+
+@st.cache_resource
+def prefetch_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=2)
+
+
+def fetch_calendar(start: datetime, end: datetime) -> dict:
+    params = {"start": start.isoformat(), "end": end.isoformat()}
+    resp = requests.get(f"{API_URL}/calendar", params=params)
+    if resp.status_code != 200:
+        return {"appointments": [], "tasks": [], "focus_sessions": []}
+    return resp.json()
+
+
+def calendar_window(start: datetime, end: datetime, prefetch: bool = False):
+    """Return calendar data for a window, reusing fetched or prefetched windows.
+
+    With ``prefetch`` the window is requested in the background and ``None`` is
+    returned immediately.
+    """
+    cache = st.session_state["calendar_cache"]
+    key = (start.isoformat(), end.isoformat())
+    entry = cache.get(key)
+    snapshot = feed_snapshot("/calendar")
+    if entry is None or (
+        entry[2] != snapshot
+        if snapshot is not None
+        else time.monotonic() - entry[0] > CALENDAR_CACHE_SECONDS
+    ):
+        future = prefetch_pool().submit(fetch_calendar, start, end)
+        entry = (time.monotonic(), future, snapshot)
+        cache[key] = entry
+    if prefetch:
+        return None
+    return entry[1].result()
+
+
+def refresh(invalidate: bool = True):
+    if invalidate:
+        st.session_state["calendar_cache"] = {}
+        revalidate("/appointments")
+    pages = st.session_state.get("appointments_pages", 1)
+    load_pages("appointments", "/appointments", pages)
+
+
+def refresh_categories(invalidate: bool = True):
+    if invalidate:
+        revalidate("/categories")
+    load_pages("categories", "/categories")
+
+
+def refresh_tasks(invalidate: bool = True):
+    if invalidate:
+        st.session_state["calendar_cache"] = {}
+        revalidate("/tasks")
+    pages = st.session_state.get("tasks_pages", 1)
+    load_pages("tasks", "/tasks", pages, {"include": "subtasks,focus_sessions"})
 
 
 def refresh_stats():
-    resp = requests.get(f"{API_URL}/admin/stats")
-    if resp.status_code == 200:
-        st.session_state["stats"] = resp.json()
+    stats, _ = cached_get("/admin/stats")
+    if stats is not None:
+        st.session_state["stats"] = stats
 
 
-refresh()
+refresh(invalidate=False)
 refresh_stats()
-refresh_categories()
-refresh_tasks()
+refresh_categories(invalidate=False)
+refresh_tasks(invalidate=False)
 
 
 tabs = st.tabs(
@@ -228,6 +412,7 @@ with tabs[0]:
                         "start_time": start.isoformat(),
                         "end_time": end.isoformat(),
                         "category_id": category_id,
+                        "rrule": appt.get("rrule"),
                     }
                     resp = requests.put(
                         f'{API_URL}/appointments/{appt["id"]}', json=data
@@ -246,6 +431,13 @@ with tabs[0]:
                     refresh_categories()
                 else:
                     st.error("Error deleting")
+    if st.session_state.get("appointments_cursor"):
+        st.button(
+            "Load more appointments",
+            key="more-appointments",
+            on_click=show_more,
+            args=("appointments",),
+        )
 
 with tabs[1]:
     if st.button("Refresh Tasks", key="refresh-tasks"):
@@ -456,25 +648,25 @@ with tabs[1]:
                     sdate = st.date_input(
                         "Start Date",
                         value=date.fromisoformat(
-                            task.get("start_date", task["due_date"])
+                            task.get("start_date") or task["due_date"]
                         ),
                         key=f'sdate_{task["id"]}',
                     )
                     stime = st.time_input(
                         "Start Time",
-                        value=dtime.fromisoformat(task.get("start_time", "00:00:00")),
+                        value=dtime.fromisoformat(task.get("start_time") or "00:00:00"),
                         key=f'stime_{task["id"]}',
                     )
                     edate = st.date_input(
                         "End Date",
                         value=date.fromisoformat(
-                            task.get("end_date", task["due_date"])
+                            task.get("end_date") or task["due_date"]
                         ),
                         key=f'edate_{task["id"]}',
                     )
                     etime = st.time_input(
                         "End Time",
-                        value=dtime.fromisoformat(task.get("end_time", "00:00:00")),
+                        value=dtime.fromisoformat(task.get("end_time") or "00:00:00"),
                         key=f'etime_{task["id"]}',
                     )
                     cat_opts = {
@@ -667,12 +859,19 @@ with tabs[1]:
                     refresh_tasks()
                 else:
                     st.error("Error deleting task")
+    if st.session_state.get("tasks_cursor"):
+        st.button(
+            "Load more tasks", key="more-tasks", on_click=show_more, args=("tasks",)
+        )
 with tabs[2]:
     refresh_stats()
     st.header("System Metrics")
     st.metric("Tasks", st.session_state["stats"].get("tasks", 0))
     st.metric("Appointments", st.session_state["stats"].get("appointments", 0))
     st.metric("Categories", st.session_state["stats"].get("categories", 0))
+    st.metric("Focus Sessions", st.session_state["stats"].get("focus_sessions", 0))
+    st.metric("Subtasks", st.session_state["stats"].get("subtasks", 0))
+    st.metric("Users", st.session_state["stats"].get("users", 0))
 
 with tabs[3]:
     view = st.selectbox(
@@ -699,17 +898,33 @@ with tabs[3]:
         day = min(d.day, calendar.monthrange(year, month)[1])
         return date(year, month, day)
 
-    def shift(step: int):
-        if st.session_state["calendar_view"] == "Day":
-            st.session_state["calendar_date"] += timedelta(days=step)
-        elif st.session_state["calendar_view"] == "Week":
-            st.session_state["calendar_date"] += timedelta(days=7 * step)
-        elif st.session_state["calendar_view"] == "Two Weeks":
-            st.session_state["calendar_date"] += timedelta(days=14 * step)
+    def step_date(view: str, d: date, step: int) -> date:
+        if view == "Day":
+            return d + timedelta(days=step)
+        if view == "Week":
+            return d + timedelta(days=7 * step)
+        if view == "Two Weeks":
+            return d + timedelta(days=14 * step)
+        return add_months(d, step)
+
+    def visible_window(view: str, d: date) -> tuple[datetime, datetime]:
+        """Return the date range shown by the calendar for ``view``."""
+        if view == "Day":
+            start = d
+            end = d + timedelta(days=1)
+        elif view in ("Week", "Two Weeks"):
+            start = d - timedelta(days=(d.weekday() + 1) % 7)
+            end = start + timedelta(weeks=1 if view == "Week" else 2)
         else:
-            st.session_state["calendar_date"] = add_months(
-                st.session_state["calendar_date"], step
-            )
+            first = d.replace(day=1)
+            start = first - timedelta(days=(first.weekday() + 1) % 7)
+            end = start + timedelta(weeks=6)
+        return datetime.combine(start, dtime()), datetime.combine(end, dtime())
+
+    def shift(step: int):
+        st.session_state["calendar_date"] = step_date(
+            st.session_state["calendar_view"], st.session_state["calendar_date"], step
+        )
         st.session_state["calendar-date"] = st.session_state["calendar_date"]
 
     col1, col2 = st.columns(2)
@@ -723,15 +938,24 @@ with tabs[3]:
         "Month": "dayGridMonth",
     }
 
+    window = calendar_window(*visible_window(view, st.session_state["calendar_date"]))
+    for step in (-1, 1):
+        adjacent = step_date(view, st.session_state["calendar_date"], step)
+        calendar_window(*visible_window(view, adjacent), prefetch=True)
+
     events = []
     cat_lookup = {c["id"]: c for c in st.session_state["categories"]}
-    for appt in st.session_state["appointments"]:
+    for appt in window["appointments"]:
         start_dt = datetime.fromisoformat(appt["start_time"])
         end_dt = datetime.fromisoformat(appt["end_time"])
         color = cat_lookup.get(appt.get("category_id"), {}).get("color")
+        # occurrences of a recurring appointment share the id of the series
+        event_id = appt["id"]
+        if appt.get("recurrence_id"):
+            event_id = f"{appt['id']}@{appt['recurrence_id']}"
         events.append(
             {
-                "id": appt["id"],
+                "id": event_id,
                 "title": f"{appt['title']} - {start_dt.strftime('%H:%M')} - {end_dt.strftime('%H:%M')}",
                 "start": appt["start_time"],
                 "end": appt["end_time"],
@@ -739,7 +963,7 @@ with tabs[3]:
             }
         )
 
-    for task in st.session_state["tasks"]:
+    for task in window["tasks"]:
         if task.get("start_date") and task.get("start_time"):
             sdt = datetime.combine(
                 date.fromisoformat(task["start_date"]),
@@ -764,16 +988,16 @@ with tabs[3]:
                 **({"color": color} if color else {}),
             }
         )
-        for fs in task.get("focus_sessions", []):
-            events.append(
-                {
-                    "id": f"fs{fs['id']}",
-                    "title": f"Focus: {task['title']}",
-                    "start": fs["start_time"],
-                    "end": fs["end_time"],
-                    "color": "#888888",
-                }
-            )
+    for fs in window["focus_sessions"]:
+        events.append(
+            {
+                "id": f"fs{fs['id']}",
+                "title": f"Focus: {fs['task_title']}",
+                "start": fs["start_time"],
+                "end": fs["end_time"],
+                "color": "#888888",
+            }
+        )
 
     options = {
         "initialDate": st.session_state["calendar_date"].isoformat(),
@@ -798,7 +1022,7 @@ with tabs[3]:
     if state.get("eventChange"):
         ev = state["eventChange"]["event"]
         appt_id = int(ev["id"])
-        for appt in st.session_state["appointments"]:
+        for appt in window["appointments"]:
             if appt["id"] == appt_id:
                 data = appt.copy()
                 data["start_time"] = ev["start"]
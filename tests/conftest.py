@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+import requests
+
+API_URL = "http://localhost:8000"
+# open /events streams must not keep a stopped server alive
+SERVER_COMMAND = [
+    sys.executable,
+    "-m",
+    "uvicorn",
+    "app.main:app",
+    "--timeout-graceful-shutdown",
+    "5",
+]
+
+
+def wait_for_api(url: str, timeout: float = 5.0):
+    start = time.time()
+    while time.time() - start < timeout:
+        try:
+            if requests.get(url).status_code == 200:
+                return True
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    return False
+
+
+def remove_db_files(*names: str):
+    for name in names or ("appointments.db",):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(name + suffix):
+                os.remove(name + suffix)
+
+
+@pytest.fixture
+def server_env(request):
+    """Environment of the API server, updated by the test's ``env`` marker."""
+    env = os.environ.copy()
+    marker = request.node.get_closest_marker("env")
+    if marker:
+        env.update(marker.kwargs)
+    env.setdefault("DISABLE_AUTH", "1")
+    return env
+
+
+def remove_query_log(env: dict):
+    path = env.get("QUERY_LOG")
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+@pytest.fixture
+def start_server(server_env):
+    """Run the API server on a fresh database for the duration of a test.
+
+    The database and the ``QUERY_LOG`` of the server are removed afterwards,
+    also when the test fails.
+    """
+    remove_db_files()
+    remove_query_log(server_env)
+    proc = subprocess.Popen(SERVER_COMMAND, env=server_env)
+    try:
+        assert wait_for_api(f"{API_URL}/appointments")
+        yield proc
+    finally:
+        proc.terminate()
+        proc.wait()
+        remove_db_files()
+        remove_query_log(server_env)
@@ -1,3 +1,6 @@
+import gzip
+import itertools
+import json
 import math
 import os
 import subprocess
@@ -9,43 +12,14 @@ from datetime import timedelta
 
 import pytest
 import requests
+from conftest import API_URL, wait_for_api
 
+pytestmark = pytest.mark.usefixtures("start_server")
 
-def wait_for_api(url: str, timeout: float = 5.0):
-    start = time.time()
-    while time.time() - start < timeout:
-        try:
-            if requests.get(url).status_code == 200:
-                return True
-        except requests.exceptions.ConnectionError:
-            time.sleep(0.1)
-    return False
-
-
-API_URL = "http://localhost:8000"
 TODAY = date.today()
 TOMORROW = TODAY + timedelta(days=1)
 
 
-@pytest.fixture(autouse=True)
-def start_server(monkeypatch, request):
-    if os.path.exists("appointments.db"):
-        os.remove("appointments.db")
-    env = os.environ.copy()
-    marker = request.node.get_closest_marker("env")
-    if marker:
-        env.update(marker.kwargs)
-    if "DISABLE_AUTH" not in env:
-        env["DISABLE_AUTH"] = "1"
-    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app"], env=env)
-    assert wait_for_api(f"{API_URL}/appointments")
-    yield
-    proc.terminate()
-    proc.wait()
-    if os.path.exists("appointments.db"):
-        os.remove("appointments.db")
-
-
 def test_create_list_update_delete():
     cat = {"name": "Work", "color": "#ff0000"}
     r = requests.post(f"{API_URL}/categories", json=cat)
@@ -460,7 +434,6 @@ def test_planner_spreads_sessions(monkeypatch):
 
 @pytest.mark.env(SESSION_LENGTH_MINUTES="50")
 def test_custom_session_length(monkeypatch):
-
     data = {
         "title": "Long",
         "description": "",
@@ -773,7 +746,6 @@ curve_imp[17] = 2
     ENERGY_CURVE=",".join(str(x) for x in curve_imp),
 )
 def test_energy_curve_importance():
-
     high = {
         "title": "HighImpCurve",
         "description": "",
@@ -1414,7 +1386,14 @@ def test_admin_stats_and_metrics():
     r = requests.get(f"{API_URL}/admin/stats")
     assert r.status_code == 200
     data = r.json()
-    assert set(data.keys()) == {"tasks", "appointments", "categories"}
+    assert set(data.keys()) == {
+        "tasks",
+        "appointments",
+        "categories",
+        "focus_sessions",
+        "subtasks",
+        "users",
+    }
 
     r = requests.get(f"{API_URL}/admin/metrics")
     assert r.status_code == 200
@@ -1443,3 +1422,1529 @@ def test_rate_limit(monkeypatch):
     assert r1.status_code == 200
     assert r2.status_code == 200
     assert r3.status_code == 429
+
+
+def test_sqlite_wal_mode():
+    import sqlite3
+    from contextlib import closing
+
+    with closing(sqlite3.connect("appointments.db")) as conn:
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode.lower() == "wal"
+
+
+@pytest.mark.env(SQLITE_JOURNAL_MODE="DELETE")
+def test_sqlite_journal_mode_configurable():
+    import sqlite3
+    from contextlib import closing
+
+    with closing(sqlite3.connect("appointments.db")) as conn:
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode.lower() == "delete"
+
+
+def primary_checkouts() -> float:
+    for line in requests.get(f"{API_URL}/admin/metrics").text.splitlines():
+        if line.startswith('db_pool_checkout_seconds_count{engine="primary"}'):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+@pytest.mark.env(DB_MODE="async")
+def test_async_requests_skip_sync_pool():
+    first = primary_checkouts()
+    scrape = primary_checkouts() - first  # the scrape itself reads the primary
+    before = primary_checkouts()
+    task = {"title": "Async", "due_date": TOMORROW.isoformat()}
+    assert requests.post(f"{API_URL}/tasks", json=task).status_code == 200
+    etag = requests.get(f"{API_URL}/tasks").headers["ETag"]
+    r = requests.get(f"{API_URL}/tasks", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert requests.get(f"{API_URL}/categories").status_code == 200
+    assert primary_checkouts() - before == scrape
+
+
+@pytest.mark.env(DB_MODE="async")
+def test_async_crud():
+    r = requests.post(f"{API_URL}/categories", json={"name": "Work", "color": "#f00"})
+    assert r.status_code == 200
+    category = r.json()
+    r = requests.put(
+        f"{API_URL}/categories/{category['id']}",
+        json={"name": "Work", "color": "#0f0", "energy_curve": [1] * 24},
+    )
+    assert r.json()["energy_curve"] == [1] * 24
+    r = requests.post(f"{API_URL}/tags", json={"name": "urgent"})
+    tag = r.json()
+    assert [t["name"] for t in requests.get(f"{API_URL}/tags").json()] == ["urgent"]
+    etag = requests.get(f"{API_URL}/tags").headers["ETag"]
+    r = requests.get(f"{API_URL}/tags", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+
+    task = {
+        "title": "Async",
+        "due_date": TOMORROW.isoformat(),
+        "category_id": category["id"],
+        "tags": [tag["id"]],
+    }
+    r = requests.post(f"{API_URL}/tasks", json=task)
+    assert r.status_code == 200
+    created = r.json()
+    assert created["tags"] == [tag]
+    r = requests.post(f"{API_URL}/tasks", json=task | {"category_id": 999})
+    assert r.status_code == 404
+
+    r = requests.put(
+        f"{API_URL}/tasks/{created['id']}", json=task | {"title": "Renamed"}
+    )
+    assert r.json()["title"] == "Renamed"
+    assert requests.get(f"{API_URL}/tasks").json()[0]["tags"] == [tag]
+    detailed = requests.get(f"{API_URL}/tasks?include=subtasks").json()
+    assert detailed[0]["subtasks"] == []
+    requests.post(f"{API_URL}/tasks", json=task)
+    pages = collect_pages(f"{API_URL}/tasks", 1)
+    assert [t["id"] for p in pages for t in p] == [created["id"], created["id"] + 1]
+
+    r = requests.post(
+        f"{API_URL}/tasks/{created['id']}/focus_sessions", json={"duration_minutes": 25}
+    )
+    session = r.json()
+    r = requests.put(
+        f"{API_URL}/tasks/{created['id']}/focus_sessions/{session['id']}",
+        json={"completed": True},
+    )
+    assert r.json()["completed"] is True
+    r = requests.get(f"{API_URL}/tasks/{created['id']}/focus_sessions")
+    assert len(r.json()) == 1
+    r = requests.delete(
+        f"{API_URL}/tasks/{created['id']}/focus_sessions/{session['id']}"
+    )
+    assert r.status_code == 200
+
+    appt = {
+        "title": "Meeting",
+        "start_time": datetime.combine(TOMORROW, dtime(9, 0)).isoformat(),
+        "end_time": datetime.combine(TOMORROW, dtime(10, 0)).isoformat(),
+    }
+    r = requests.post(f"{API_URL}/appointments", json=appt)
+    assert r.status_code == 200
+    appt_id = r.json()["id"]
+    r = requests.put(
+        f"{API_URL}/appointments/{appt_id}", json=appt | {"title": "Moved"}
+    )
+    assert r.json()["title"] == "Moved"
+    assert requests.get(f"{API_URL}/appointments").json()[0]["title"] == "Moved"
+    r = requests.put(
+        f"{API_URL}/appointments/{appt_id}", json=appt | {"rrule": "FREQ=DAILY"}
+    )
+    assert r.json()["overrides"] == []
+    window = {
+        "start": datetime.combine(TOMORROW, dtime(0, 0)).isoformat(),
+        "end": datetime.combine(TOMORROW + timedelta(days=3), dtime(0, 0)).isoformat(),
+    }
+    r = requests.get(f"{API_URL}/appointments", params=window)
+    assert len(r.json()) == 3
+    assert requests.delete(f"{API_URL}/appointments/{appt_id}").status_code == 200
+    etag = requests.get(f"{API_URL}/tasks").headers["ETag"]
+    r = requests.get(f"{API_URL}/tasks", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert requests.delete(f"{API_URL}/tasks/{created['id']}").status_code == 200
+    r = requests.get(f"{API_URL}/tasks", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    remaining = r.json()
+    assert [t["id"] for t in remaining] == [created["id"] + 1]
+
+
+def read_query_log(log_path: str, settle: float = 0.2) -> str:
+    """Return the query log once the profiler's writer thread has caught up."""
+    size, stable_since = -1, time.monotonic()
+    while time.monotonic() - stable_since < settle:
+        current = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        if current != size:
+            size, stable_since = current, time.monotonic()
+        time.sleep(0.02)
+    with open(log_path, encoding="utf-8") as f:
+        return f.read()
+
+
+def clear_query_log(log_path: str) -> None:
+    read_query_log(log_path)  # let statements of earlier requests be written
+    with open(log_path, "w", encoding="utf-8"):
+        pass
+
+
+def count_queries(log_path: str, url: str) -> int:
+    clear_query_log(log_path)
+    assert requests.get(url).status_code == 200
+    return sum(1 for line in read_query_log(log_path).splitlines() if "SELECT" in line)
+
+
+def assert_constant_list_queries(log_path: str):
+    tag = requests.post(f"{API_URL}/tags", json={"name": "n+1"}).json()
+    for i in range(10):
+        requests.post(
+            f"{API_URL}/tasks",
+            json={
+                "title": f"T{i}",
+                "due_date": TOMORROW.isoformat(),
+                "tags": [tag["id"]],
+            },
+        )
+        start = datetime.combine(TOMORROW, dtime(9 + i % 8, 0))
+        appt = requests.post(
+            f"{API_URL}/appointments",
+            json={
+                "title": f"A{i}",
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(minutes=30)).isoformat(),
+            },
+        ).json()
+        requests.post(f"{API_URL}/appointments/{appt['id']}/tags/{tag['id']}")
+        if i == 0:
+            tasks_one = count_queries(log_path, f"{API_URL}/tasks")
+            appts_one = count_queries(log_path, f"{API_URL}/appointments")
+    assert count_queries(log_path, f"{API_URL}/tasks") == tasks_one
+    assert count_queries(log_path, f"{API_URL}/appointments") == appts_one
+    assert all(t["tags"] == [tag] for t in requests.get(f"{API_URL}/tasks").json())
+
+
+@pytest.mark.env(ENABLE_QUERY_PROFILING="1", QUERY_LOG="test_eager_query.log")
+def test_list_query_count_constant():
+    assert_constant_list_queries("test_eager_query.log")
+
+
+@pytest.mark.env(
+    ENABLE_QUERY_PROFILING="1",
+    QUERY_LOG="test_eager_query.log",
+    LIST_TASKS_LOADER="joined",
+    LIST_TASKS_EAGER_LOAD="tags,subtasks,focus_sessions",
+)
+def test_list_query_count_constant_joined():
+    assert_constant_list_queries("test_eager_query.log")
+
+
+def collect_pages(url: str, limit: int) -> list[list[dict]]:
+    pages = []
+    params = {"limit": limit}
+    while True:
+        r = requests.get(url, params=params)
+        assert r.status_code == 200
+        pages.append(r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+        params = {"limit": limit, "cursor": cursor}
+
+
+def test_keyset_pagination():
+    for i in range(5):
+        requests.post(f"{API_URL}/tags", json={"name": f"tag{i}"})
+        requests.post(
+            f"{API_URL}/tasks",
+            json={"title": f"T{i}", "due_date": TOMORROW.isoformat()},
+        )
+        start = datetime.combine(TOMORROW, dtime(16 - i, 0))
+        requests.post(
+            f"{API_URL}/appointments",
+            json={
+                "title": f"A{i}",
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(minutes=30)).isoformat(),
+            },
+        )
+    task_id = requests.get(f"{API_URL}/tasks").json()[0]["id"]
+    for i in range(3):
+        requests.post(f"{API_URL}/tasks/{task_id}/subtasks", json={"title": f"S{i}"})
+        requests.post(
+            f"{API_URL}/tasks/{task_id}/focus_sessions",
+            json={
+                "duration_minutes": 25,
+                "start_time": datetime.combine(TOMORROW, dtime(12 - i, 0)).isoformat(),
+            },
+        )
+
+    pages = collect_pages(f"{API_URL}/tasks", 2)
+    assert [len(p) for p in pages] == [2, 2, 1]
+    assert [t["title"] for p in pages for t in p] == [f"T{i}" for i in range(5)]
+    assert len(sum(collect_pages(f"{API_URL}/tags", 3), [])) == 5
+
+    appts = sum(collect_pages(f"{API_URL}/appointments", 2), [])
+    assert [a["title"] for a in appts] == [f"A{i}" for i in reversed(range(5))]
+
+    subtasks = sum(collect_pages(f"{API_URL}/tasks/{task_id}/subtasks", 2), [])
+    assert [s["title"] for s in subtasks] == ["S0", "S1", "S2"]
+    sessions = sum(collect_pages(f"{API_URL}/tasks/{task_id}/focus_sessions", 1), [])
+    assert [s["start_time"] for s in sessions] == sorted(
+        s["start_time"] for s in sessions
+    )
+    assert len(sessions) == 3
+
+    r = requests.get(f"{API_URL}/tasks", params={"limit": 10})
+    assert len(r.json()) == 5
+    assert "X-Next-Cursor" not in r.headers
+    assert len(requests.get(f"{API_URL}/tasks").json()) == 5
+    r = requests.get(f"{API_URL}/tasks", params={"cursor": "not-a-cursor"})
+    assert r.status_code == 400
+
+
+def test_calendar_window():
+    day = datetime.combine(TOMORROW, dtime(0, 0))
+
+    def appointment(title, start, minutes):
+        requests.post(
+            f"{API_URL}/appointments",
+            json={
+                "title": title,
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(minutes=minutes)).isoformat(),
+            },
+        )
+
+    appointment("Inside", day + timedelta(hours=10), 60)
+    appointment("Overlapping", day - timedelta(hours=1), 120)
+    appointment("Before", day - timedelta(hours=3), 60)
+    appointment("After", day + timedelta(days=1), 60)
+
+    due = requests.post(
+        f"{API_URL}/tasks", json={"title": "Due", "due_date": TOMORROW.isoformat()}
+    ).json()
+    requests.post(
+        f"{API_URL}/tasks",
+        json={"title": "Later", "due_date": (TOMORROW + timedelta(days=5)).isoformat()},
+    )
+    requests.post(
+        f"{API_URL}/tasks",
+        json={
+            "title": "Spanning",
+            "due_date": (TOMORROW + timedelta(days=5)).isoformat(),
+            "start_date": TODAY.isoformat(),
+            "end_date": (TOMORROW + timedelta(days=2)).isoformat(),
+            "start_time": "09:00:00",
+            "end_time": "17:00:00",
+        },
+    )
+    requests.post(
+        f"{API_URL}/tasks/{due['id']}/focus_sessions",
+        json={
+            "duration_minutes": 25,
+            "start_time": (day + timedelta(hours=14)).isoformat(),
+        },
+    )
+    requests.post(
+        f"{API_URL}/tasks/{due['id']}/focus_sessions",
+        json={
+            "duration_minutes": 25,
+            "start_time": (day + timedelta(days=2)).isoformat(),
+        },
+    )
+
+    r = requests.get(
+        f"{API_URL}/calendar",
+        params={
+            "start": day.isoformat(),
+            "end": (day + timedelta(days=1)).isoformat(),
+        },
+    )
+    assert r.status_code == 200
+    window = r.json()
+    assert [a["title"] for a in window["appointments"]] == ["Overlapping", "Inside"]
+    assert [t["title"] for t in window["tasks"]] == ["Due", "Spanning"]
+    assert len(window["focus_sessions"]) == 1
+    assert window["focus_sessions"][0]["task_title"] == "Due"
+
+    r = requests.get(
+        f"{API_URL}/calendar",
+        params={"start": day.isoformat(), "end": day.isoformat()},
+    )
+    assert r.status_code == 400
+
+
+@pytest.mark.env(ENABLE_QUERY_PROFILING="1", QUERY_LOG="test_include_query.log")
+def test_list_tasks_include_relationships():
+    ids = []
+    for i in range(3):
+        task = requests.post(
+            f"{API_URL}/tasks",
+            json={"title": f"T{i}", "due_date": TOMORROW.isoformat()},
+        ).json()
+        ids.append(task["id"])
+        requests.post(f"{API_URL}/tasks/{task['id']}/subtasks", json={"title": "S"})
+        requests.post(
+            f"{API_URL}/tasks/{task['id']}/focus_sessions",
+            json={"duration_minutes": 25},
+        )
+        if i == 0:
+            url = f"{API_URL}/tasks?include=subtasks,focus_sessions"
+            one = count_queries("test_include_query.log", url)
+
+    assert count_queries("test_include_query.log", url) == one
+    tasks = requests.get(url).json()
+    assert [t["id"] for t in tasks] == ids
+    assert all(len(t["subtasks"]) == 1 for t in tasks)
+    assert all(t["focus_sessions"][0]["task_id"] == t["id"] for t in tasks)
+
+    plain = requests.get(f"{API_URL}/tasks").json()[0]
+    assert "subtasks" not in plain and "focus_sessions" not in plain
+    only_subtasks = requests.get(f"{API_URL}/tasks?include=subtasks").json()[0]
+    assert "subtasks" in only_subtasks and "focus_sessions" not in only_subtasks
+    assert requests.get(f"{API_URL}/tasks?include=owner").status_code == 400
+
+
+@pytest.mark.env(ENABLE_QUERY_PROFILING="1", QUERY_LOG="test_etag_query.log")
+def test_conditional_get():
+    requests.post(
+        f"{API_URL}/tasks", json={"title": "Cached", "due_date": TOMORROW.isoformat()}
+    )
+    r = requests.get(f"{API_URL}/tasks")
+    etag = r.headers["ETag"]
+    assert r.headers["Last-Modified"]
+    categories_etag = requests.get(f"{API_URL}/categories").headers["ETag"]
+
+    clear_query_log("test_etag_query.log")
+    r = requests.get(f"{API_URL}/tasks", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["ETag"] == etag
+    assert "FROM tasks" not in read_query_log("test_etag_query.log")
+
+    r = requests.get(
+        f"{API_URL}/tasks",
+        headers={"If-Modified-Since": r.headers["Last-Modified"]},
+    )
+    assert r.status_code == 304
+    r = requests.get(f"{API_URL}/tasks?limit=1", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+
+    task = requests.get(f"{API_URL}/tasks").json()[0]
+    tag = requests.post(f"{API_URL}/tags", json={"name": "fresh"}).json()
+    requests.post(f"{API_URL}/tasks/{task['id']}/tags/{tag['id']}")
+    r = requests.get(f"{API_URL}/tasks", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()[0]["tags"] == [tag]
+    etag = r.headers["ETag"]
+
+    requests.post(f"{API_URL}/tasks/{task['id']}/subtasks", json={"title": "S"})
+    r = requests.get(f"{API_URL}/tasks", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+
+    r = requests.get(
+        f"{API_URL}/categories", headers={"If-None-Match": categories_etag}
+    )
+    assert r.status_code == 304
+    requests.post(f"{API_URL}/categories", json={"name": "New", "color": "#000"})
+    r = requests.get(
+        f"{API_URL}/categories", headers={"If-None-Match": categories_etag}
+    )
+    assert r.status_code == 200
+
+
+@pytest.mark.env(ENABLE_QUERY_PROFILING="1", QUERY_LOG="test_cache_query.log")
+def test_response_cache():
+    requests.post(
+        f"{API_URL}/categories",
+        json={"name": "Cache", "color": "#111", "energy_curve": [1] * 24},
+    )
+    requests.post(f"{API_URL}/tags", json={"name": "cached"})
+    first = requests.get(f"{API_URL}/categories")
+    tags = requests.get(f"{API_URL}/tags?limit=1")
+
+    clear_query_log("test_cache_query.log")
+    r = requests.get(f"{API_URL}/categories")
+    assert r.content == first.content
+    assert r.headers["ETag"] == first.headers["ETag"]
+    assert r.json()[-1]["energy_curve"] == [1] * 24
+    r = requests.get(f"{API_URL}/tags?limit=1")
+    assert r.content == tags.content
+    assert r.headers.get("X-Next-Cursor") == tags.headers.get("X-Next-Cursor")
+    log = read_query_log("test_cache_query.log")
+    assert "FROM categories" not in log
+    assert "FROM tags" not in log
+
+    cat_id = first.json()[-1]["id"]
+    requests.put(
+        f"{API_URL}/categories/{cat_id}", json={"name": "Renamed", "color": "#111"}
+    )
+    r = requests.get(f"{API_URL}/categories")
+    assert r.json()[-1]["name"] == "Renamed"
+    requests.post(f"{API_URL}/tags", json={"name": "later"})
+    assert "later" in [t["name"] for t in requests.get(f"{API_URL}/tags").json()]
+
+
+@pytest.mark.env(
+    DB_MODE="async", ENABLE_QUERY_PROFILING="1", QUERY_LOG="test_cache_query.log"
+)
+def test_response_cache_async():
+    test_response_cache()
+
+
+@pytest.mark.env(SYNC_OVERLAP_SECONDS="0")
+def test_delta_sync():
+    task = requests.post(
+        f"{API_URL}/tasks", json={"title": "Mirror", "due_date": TOMORROW.isoformat()}
+    ).json()
+    other = requests.post(
+        f"{API_URL}/tasks", json={"title": "Other", "due_date": TOMORROW.isoformat()}
+    ).json()
+    tag = requests.post(f"{API_URL}/tags", json={"name": "sync"}).json()
+    sub = requests.post(
+        f"{API_URL}/tasks/{task['id']}/subtasks", json={"title": "Step"}
+    ).json()
+
+    full = requests.get(f"{API_URL}/sync").json()
+    assert full["full"] is True
+    assert {t["id"] for t in full["tasks"]} == {task["id"], other["id"]}
+    assert full["tags"] == [tag]
+    assert full["subtasks"] == [sub]
+    assert full["deleted"] == {}
+
+    empty = requests.get(f"{API_URL}/sync", params={"since": full["token"]}).json()
+    assert empty["full"] is False
+    assert empty["tasks"] == [] and empty["tags"] == [] and empty["deleted"] == {}
+
+    requests.post(f"{API_URL}/tasks/{task['id']}/tags/{tag['id']}")
+    requests.put(
+        f"{API_URL}/tasks/{task['id']}/subtasks/{sub['id']}",
+        json={"title": "Step", "completed": True},
+    )
+    delta = requests.get(f"{API_URL}/sync", params={"since": empty["token"]}).json()
+    assert [t["id"] for t in delta["tasks"]] == [task["id"]]
+    assert delta["tasks"][0]["tags"] == [tag]
+    assert delta["subtasks"][0]["completed"] is True
+    assert delta["appointments"] == []
+
+    requests.delete(f"{API_URL}/tasks/{task['id']}")
+    delta = requests.get(f"{API_URL}/sync", params={"since": delta["token"]}).json()
+    assert delta["tasks"] == []
+    assert delta["deleted"] == {"tasks": [task["id"]], "subtasks": [sub["id"]]}
+
+    r = requests.get(f"{API_URL}/sync", params={"since": "not-a-token"})
+    assert r.status_code == 400
+
+
+@pytest.mark.env(
+    SYNC_OVERLAP_SECONDS="0", SYNC_RETENTION_DAYS="0.00002", SYNC_PRUNE_SECONDS="0"
+)
+def test_delta_sync_expired_token():
+    task = requests.post(
+        f"{API_URL}/tasks", json={"title": "Gone", "due_date": TOMORROW.isoformat()}
+    ).json()
+    token = requests.get(f"{API_URL}/sync").json()["token"]
+    requests.delete(f"{API_URL}/tasks/{task['id']}")
+
+    delta = requests.get(f"{API_URL}/sync", params={"since": token}).json()
+    assert delta["full"] is False
+    assert delta["deleted"] == {"tasks": [task["id"]]}
+
+    # the retention window is under two seconds
+    time.sleep(2)
+    delta = requests.get(f"{API_URL}/sync", params={"since": token}).json()
+    assert delta["full"] is True
+    assert delta["tasks"] == [] and delta["deleted"] == {}
+
+
+def next_events(lines, count: int) -> list[dict]:
+    events = []
+    for line in lines:
+        if line.startswith("data: "):
+            events.append(json.loads(line.removeprefix("data: ")))
+            if len(events) == count:
+                return events
+    return events
+
+
+def test_events_stream():
+    stream = requests.get(
+        f"{API_URL}/events",
+        params={"tables": "tasks,subtasks"},
+        stream=True,
+        timeout=10,
+    )
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    lines = stream.iter_lines(decode_unicode=True)
+    assert ": connected" in list(itertools.takewhile(bool, lines))
+
+    task = requests.post(
+        f"{API_URL}/tasks", json={"title": "Live", "due_date": TOMORROW.isoformat()}
+    ).json()
+    requests.post(f"{API_URL}/tags", json={"name": "ignored"})
+    requests.post(f"{API_URL}/tasks/{task['id']}/subtasks", json={"title": "Sub"})
+    requests.put(
+        f"{API_URL}/tasks/{task['id']}",
+        json={"title": "Live 2", "due_date": TOMORROW.isoformat()},
+    )
+    requests.delete(f"{API_URL}/tasks/{task['id']}")
+    events = next_events(lines, 5)
+    assert events[:3] == [
+        {"table": "tasks", "op": "created", "id": task["id"]},
+        {"table": "subtasks", "op": "created", "id": events[1]["id"]},
+        {"table": "tasks", "op": "updated", "id": task["id"]},
+    ]
+    assert {(e["table"], e["op"]) for e in events[3:]} == {
+        ("tasks", "deleted"),
+        ("subtasks", "deleted"),
+    }
+
+    planned = requests.post(
+        f"{API_URL}/tasks/plan",
+        json={
+            "title": "Planned",
+            "estimated_difficulty": 1,
+            "estimated_duration_minutes": 30,
+            "due_date": (TOMORROW + timedelta(days=2)).isoformat(),
+        },
+    ).json()
+    (created,) = next_events(lines, 1)
+    assert created == {"table": "tasks", "op": "created", "id": planned["id"]}
+    stream.close()
+
+
+def test_events_stream_ends_on_shutdown(start_server):
+    stream = requests.get(f"{API_URL}/events", stream=True, timeout=10)
+    lines = stream.iter_lines(decode_unicode=True)
+    assert ": connected" in list(itertools.takewhile(bool, lines))
+    started = time.monotonic()
+    start_server.terminate()
+    start_server.wait(timeout=10)
+    # well before the --timeout-graceful-shutdown of the fixture
+    assert time.monotonic() - started < 3
+    assert list(lines) == []
+    stream.close()
+
+
+@pytest.mark.env(EVENTS_BROKER_URL="tcp://127.0.0.1:8765")
+def test_events_broker_relays_between_workers():
+    env = {**os.environ, "DISABLE_AUTH": "1"}
+    env["EVENTS_BROKER_URL"] = "tcp://127.0.0.1:8765"
+    broker = subprocess.Popen([sys.executable, "-m", "app.events", "--port", "8765"])
+    time.sleep(2)  # let the first worker reconnect to the broker
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", "8001"], env=env
+    )
+    try:
+        assert wait_for_api("http://localhost:8001/appointments")
+        stream = requests.get(
+            "http://localhost:8001/events", params={"tables": "tags"}, stream=True
+        )
+        lines = stream.iter_lines(decode_unicode=True)
+        assert ": connected" in list(itertools.takewhile(bool, lines))
+        tag = requests.post(f"{API_URL}/tags", json={"name": "relayed"}).json()
+        assert next_events(lines, 1) == [
+            {"table": "tags", "op": "created", "id": tag["id"]}
+        ]
+        stream.close()
+    finally:
+        worker.terminate()
+        worker.wait()
+        broker.terminate()
+        broker.wait()
+
+
+def test_ical_export_streaming_filters():
+    cat = requests.post(f"{API_URL}/categories", json={"name": "Ops", "color": "#0f0"})
+    cat_id = cat.json()["id"]
+    for day, category in ((1, cat_id), (2, None), (10, cat_id)):
+        start = datetime.combine(TODAY + timedelta(days=day), dtime(9, 0))
+        requests.post(
+            f"{API_URL}/appointments",
+            json={
+                "title": f"Day {day}",
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+                "category_id": category,
+            },
+        )
+    task = requests.post(
+        f"{API_URL}/tasks",
+        json={
+            "title": "Timed",
+            "due_date": (TODAY + timedelta(days=3)).isoformat(),
+            "start_date": (TODAY + timedelta(days=2)).isoformat(),
+            "start_time": "14:00:00",
+            "end_time": "15:00:00",
+            "category_id": cat_id,
+        },
+    ).json()
+    requests.post(
+        f"{API_URL}/tasks/{task['id']}/focus_sessions",
+        json={
+            "duration_minutes": 25,
+            "start_time": datetime.combine(
+                TODAY + timedelta(days=2), dtime(14, 0)
+            ).isoformat(),
+        },
+    )
+
+    r = requests.get(f"{API_URL}/appointments/export/ical")
+    assert r.headers["content-type"].startswith("text/calendar")
+    assert r.headers["transfer-encoding"] == "chunked"
+    assert r.headers["ETag"]
+    assert r.text.startswith("BEGIN:VCALENDAR") and r.text.endswith("END:VCALENDAR\r\n")
+    assert r.text.count("BEGIN:VEVENT") == 3
+    assert "CATEGORIES:Ops" in r.text
+    assert "UID:appointment-" in r.text
+
+    window = {
+        "start": datetime.combine(TODAY + timedelta(days=1), dtime(0, 0)).isoformat(),
+        "end": datetime.combine(TODAY + timedelta(days=5), dtime(0, 0)).isoformat(),
+    }
+    r = requests.get(f"{API_URL}/appointments/export/ical", params=window)
+    assert "SUMMARY:Day 1" in r.text and "SUMMARY:Day 2" in r.text
+    assert "Day 10" not in r.text
+
+    params = {**window, "category_id": cat_id, "include": "tasks,focus_sessions"}
+    r = requests.get(f"{API_URL}/appointments/export/ical", params=params)
+    summaries = [
+        line.removeprefix("SUMMARY:")
+        for line in r.text.splitlines()
+        if line.startswith("SUMMARY:")
+    ]
+    assert summaries == ["Day 1", "Focus: Timed", "Timed"]
+
+    r = requests.get(f"{API_URL}/appointments/export/ical", params={"include": "bogus"})
+    assert r.status_code == 400
+
+
+@pytest.mark.env(ENABLE_QUERY_PROFILING="1", QUERY_LOG="test_ical_query.log")
+def test_ical_feed_cache():
+    ids = []
+    for i in range(3):
+        start = datetime.combine(TOMORROW, dtime(9 + i, 0))
+        r = requests.post(
+            f"{API_URL}/appointments",
+            json={
+                "title": f"Feed {i}",
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(minutes=30)).isoformat(),
+            },
+        )
+        ids.append(r.json()["id"])
+    url = f"{API_URL}/appointments/export/ical"
+
+    first = requests.get(url)
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["transfer-encoding"] == "chunked"
+    assert first.text.count("BEGIN:VEVENT") == 3
+
+    clear_query_log("test_ical_query.log")
+    cached = requests.get(url)
+    assert cached.headers["content-encoding"] == "gzip"
+    assert "content-length" in cached.headers
+    assert cached.text == first.text
+    assert "FROM appointments" not in read_query_log("test_ical_query.log")
+
+    plain = requests.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.text == first.text
+    assert plain.headers["Vary"] == "Accept-Encoding"
+
+    r = requests.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert r.status_code == 304
+
+    requests.put(
+        f"{API_URL}/appointments/{ids[1]}",
+        json={
+            "title": "Moved",
+            "start_time": datetime.combine(TOMORROW, dtime(15, 0)).isoformat(),
+            "end_time": datetime.combine(TOMORROW, dtime(16, 0)).isoformat(),
+        },
+    )
+    r = requests.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert r.status_code == 200
+    assert "SUMMARY:Moved" in r.text and "Feed 1" not in r.text
+    assert r.text.count("BEGIN:VEVENT") == 3
+
+
+def test_ical_import():
+    category = requests.post(
+        f"{API_URL}/categories", json={"name": "Imported", "color": "#00ff00"}
+    ).json()
+    ics = (
+        "BEGIN:VCALENDAR\r\nVERSION:2.0\r\n"
+        "BEGIN:VEVENT\r\nUID:one@example.com\r\nSUMMARY:First\\, meeting\r\n"
+        "DTSTART;TZID=Europe/Berlin:20300107T100000\r\n"
+        "DURATION:PT1H30M\r\nCATEGORIES:Imported\r\n"
+        "BEGIN:VALARM\r\nACTION:DISPLAY\r\nDESCRIPTION:Alarm\r\nEND:VALARM\r\n"
+        "END:VEVENT\r\n"
+        "BEGIN:VEVENT\r\nUID:two@example.com\r\nSUMMARY:Holiday\r\n"
+        "DESCRIPTION:A long description that is folded onto\r\n  a second line\r\n"
+        "DTSTART;VALUE=DATE:20300108\r\nCATEGORIES:Imported,Other\r\nEND:VEVENT\r\n"
+        "BEGIN:VEVENT\r\nUID:one@example.com\r\nSUMMARY:First meeting\r\n"
+        "DTSTART:20300107T090000Z\r\nDTEND:20300107T110000Z\r\nEND:VEVENT\r\n"
+        "BEGIN:VEVENT\r\nSUMMARY:No uid\r\nDTSTART:20300107T090000Z\r\nEND:VEVENT\r\n"
+        "END:VCALENDAR\r\n"
+    )
+    url = f"{API_URL}/appointments/import/ical"
+    r = requests.post(url, files={"file": ("cal.ics", ics, "text/calendar")})
+    assert r.status_code == 200
+    result = r.json()
+    assert result["seconds"] >= 0
+    assert {k: v for k, v in result.items() if k != "seconds"} == {
+        "events": 4,
+        "created": 2,
+        "updated": 0,
+        "duplicates": 1,
+        "overrides": 0,
+        "skipped": 1,
+    }
+    appts = {a["title"]: a for a in requests.get(f"{API_URL}/appointments").json()}
+    assert set(appts) == {"First meeting", "Holiday"}
+    first = appts["First meeting"]
+    assert first["start_time"] == "2030-01-07T09:00:00"
+    assert first["end_time"] == "2030-01-07T11:00:00"
+    assert first["category_id"] is None
+    holiday = appts["Holiday"]
+    assert holiday["category_id"] == category["id"]
+    assert holiday["end_time"] == "2030-01-09T00:00:00"
+    assert holiday["description"].endswith("folded onto a second line")
+
+    # importing the export updates the same appointments
+    feed = requests.get(f"{API_URL}/appointments/export/ical").text
+    assert "UID:one@example.com" in feed
+    r = requests.post(url, files={"file": ("cal.ics", feed, "text/calendar")})
+    assert r.json()["created"] == 0 and r.json()["updated"] == 2
+    assert len(requests.get(f"{API_URL}/appointments").json()) == 2
+
+    r = requests.post(
+        url,
+        files={"file": ("cal.ics", ics.replace("20300108", "soon"), "text/calendar")},
+    )
+    assert r.status_code == 400
+    r = requests.post(url, files={"file": ("cal.ics", "hello", "text/plain")})
+    assert r.status_code == 400
+    titles = {a["title"] for a in requests.get(f"{API_URL}/appointments").json()}
+    assert titles == {"First meeting", "Holiday"}
+
+
+def test_recurring_appointments():
+    r = requests.post(
+        f"{API_URL}/appointments",
+        json={
+            "title": "Standup",
+            "start_time": "2030-01-07T09:00:00",
+            "end_time": "2030-01-07T09:30:00",
+            "rrule": "RRULE:FREQ=WEEKLY;COUNT=4",
+        },
+    )
+    assert r.status_code == 200
+    series = r.json()
+    assert series["rrule"] == "FREQ=WEEKLY;COUNT=4"
+    url = f"{API_URL}/appointments/{series['id']}/occurrences"
+    window = {"start": "2030-01-01T00:00:00", "end": "2030-02-01T00:00:00"}
+
+    # stored once, expanded only for a window
+    assert len(requests.get(f"{API_URL}/appointments").json()) == 1
+    occurrences = requests.get(f"{API_URL}/appointments", params=window).json()
+    assert [o["start_time"] for o in occurrences] == [
+        "2030-01-07T09:00:00",
+        "2030-01-14T09:00:00",
+        "2030-01-21T09:00:00",
+        "2030-01-28T09:00:00",
+    ]
+    assert {o["id"] for o in occurrences} == {series["id"]}
+    assert occurrences[1]["recurrence_id"] == "2030-01-14T09:00:00"
+
+    r = requests.delete(f"{url}/2030-01-14T09:00:00")
+    assert r.status_code == 200
+    assert r.json()["overrides"][0]["cancelled"] is True
+    r = requests.put(
+        f"{url}/2030-01-21T09:00:00",
+        json={
+            "start_time": "2030-01-21T15:00:00",
+            "end_time": "2030-01-21T16:00:00",
+            "title": "Moved standup",
+        },
+    )
+    assert r.status_code == 200
+    assert (
+        requests.put(
+            f"{url}/2030-01-15T09:00:00",
+            json={
+                "start_time": "2030-01-15T10:00:00",
+                "end_time": "2030-01-15T11:00:00",
+            },
+        ).status_code
+        == 404
+    )
+
+    occurrences = requests.get(f"{API_URL}/appointments", params=window).json()
+    assert [(o["start_time"], o["title"]) for o in occurrences] == [
+        ("2030-01-07T09:00:00", "Standup"),
+        ("2030-01-21T15:00:00", "Moved standup"),
+        ("2030-01-28T09:00:00", "Standup"),
+    ]
+    r = requests.get(
+        f"{API_URL}/calendar",
+        params={"start": "2030-01-21T00:00:00", "end": "2030-01-22T00:00:00"},
+    )
+    assert [a["title"] for a in r.json()["appointments"]] == ["Moved standup"]
+
+    feed = requests.get(f"{API_URL}/appointments/export/ical").text
+    assert "RRULE:FREQ=WEEKLY;COUNT=4" in feed
+    assert "EXDATE:20300114T090000" in feed
+    assert "RECURRENCE-ID:20300121T090000" in feed
+    r = requests.post(
+        f"{API_URL}/appointments/import/ical",
+        files={"file": ("cal.ics", feed, "text/calendar")},
+    )
+    assert r.json()["created"] == 1 and r.json()["overrides"] == 1
+    imported = [
+        (o["start_time"], o["title"])
+        for o in requests.get(f"{API_URL}/appointments", params=window).json()
+        if o["id"] != series["id"]
+    ]
+    assert imported == [
+        ("2030-01-07T09:00:00", "Standup"),
+        ("2030-01-21T15:00:00", "Moved standup"),
+        ("2030-01-28T09:00:00", "Standup"),
+    ]
+
+    # changing the rule drops the overrides of the old one
+    r = requests.put(
+        f"{API_URL}/appointments/{series['id']}",
+        json={**series, "rrule": "FREQ=DAILY;UNTIL=20300108T090000Z"},
+    )
+    assert r.status_code == 200 and r.json()["overrides"] == []
+    occurrences = requests.get(f"{API_URL}/appointments", params=window).json()
+    assert len([o for o in occurrences if o["id"] == series["id"]]) == 2
+
+    r = requests.post(
+        f"{API_URL}/appointments",
+        json={**series, "rrule": "FREQ=FORTNIGHTLY"},
+    )
+    assert r.status_code == 400
+    r = requests.get(f"{API_URL}/appointments", params={"start": window["start"]})
+    assert r.status_code == 400
+
+
+def test_recurrence_rules_are_bounded():
+    appt = {
+        "title": "Tick",
+        "start_time": "2030-01-07T09:00:00",
+        "end_time": "2030-01-07T09:30:00",
+    }
+    for rule in (
+        "FREQ=SECONDLY;UNTIL=20300101T000000",
+        "FREQ=MINUTELY;COUNT=10",
+        "FREQ=DAILY;COUNT=1001",
+    ):
+        r = requests.post(f"{API_URL}/appointments", json={**appt, "rrule": rule})
+        assert r.status_code == 400 and r.json()["detail"].startswith("Invalid rrule")
+    r = requests.post(
+        f"{API_URL}/appointments/bulk",
+        json=[{**appt, "rrule": "FREQ=SECONDLY;UNTIL=20300101T000000"}],
+    )
+    assert r.json()["errors"][0]["detail"].startswith("Invalid rrule")
+
+    # the end of a long UNTIL rule is not searched occurrence by occurrence
+    start = time.perf_counter()
+    r = requests.post(
+        f"{API_URL}/appointments",
+        json={**appt, "rrule": "FREQ=HOURLY;UNTIL=99991231T000000"},
+        timeout=10,
+    )
+    assert r.status_code == 200 and time.perf_counter() - start < 5
+    window = {"start": "2030-01-07T00:00:00", "end": "2030-01-07T12:00:00"}
+    r = requests.get(f"{API_URL}/appointments", params=window)
+    assert len(r.json()) == 3
+
+
+def test_plan_task_avoids_recurring_appointments():
+    start = datetime.combine(TODAY - timedelta(days=1), dtime(9, 0))
+    r = requests.post(
+        f"{API_URL}/appointments",
+        json={
+            "title": "Daily block",
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=6)).isoformat(),
+            "rrule": "FREQ=DAILY",
+        },
+    )
+    assert r.status_code == 200
+    data = {
+        "title": "Around the block",
+        "estimated_difficulty": 3,
+        "estimated_duration_minutes": 50,
+        "due_date": (TOMORROW + timedelta(days=1)).isoformat(),
+        "priority": 3,
+    }
+    task = requests.post(f"{API_URL}/tasks/plan", json=data).json()
+    sessions = requests.get(f"{API_URL}/tasks/{task['id']}/focus_sessions").json()
+    assert sessions
+    for s in sessions:
+        s_start = datetime.fromisoformat(s["start_time"])
+        assert s_start.time() >= dtime(15, 0)
+
+
+def test_full_text_search():
+    cat = requests.post(
+        f"{API_URL}/categories", json={"name": "Reports", "color": "#123456"}
+    ).json()
+    tag = requests.post(f"{API_URL}/tags", json={"name": "finance"}).json()
+    tasks = [
+        {"title": "Quarterly report", "description": "Numbers for the board"},
+        {"title": "Review budget", "description": "Check the quarterly report draft"},
+        {"title": "Café réservation", "description": "Book a table"},
+        {"title": "Report the bug", "description": "Crash in the board view"},
+    ]
+    ids = []
+    for i, data in enumerate(tasks):
+        data["due_date"] = (TODAY + timedelta(days=i)).isoformat()
+        if i == 0:
+            data["category_id"], data["tags"] = cat["id"], [tag["id"]]
+        ids.append(requests.post(f"{API_URL}/tasks", json=data).json()["id"])
+    start = datetime.combine(TOMORROW, dtime(10, 0))
+    appt = requests.post(
+        f"{API_URL}/appointments",
+        json={
+            "title": "Board meeting",
+            "description": "Present the quarterly report",
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=1)).isoformat(),
+            "rrule": "FREQ=WEEKLY;COUNT=3",
+        },
+    ).json()
+
+    def search(q, **params):
+        r = requests.get(f"{API_URL}/search", params={"q": q, **params})
+        assert r.status_code == 200, r.text
+        return [(hit["kind"], hit["id"]) for hit in r.json()]
+
+    # ranked: title matches before description matches, every word must match
+    hits = search("quarterly report")
+    assert hits[0] == ("task", ids[0])
+    assert set(hits) == {
+        ("task", ids[0]),
+        ("task", ids[1]),
+        ("appointment", appt["id"]),
+    }
+    r = requests.get(f"{API_URL}/search", params={"q": "board"}).json()
+    assert r[0]["score"] >= r[-1]["score"]
+    assert {h["kind"] for h in r} == {"task", "appointment"}
+    assert r[0]["task"] or r[0]["appointment"]
+    # phrase, prefix and diacritics
+    assert search('"report the"') == [("task", ids[3])]
+    assert search("quart*", types="tasks") == search("quarterly", types="tasks")
+    assert search("quart") == []
+    assert search("cafe reserv*") == [("task", ids[2])]
+    assert search("board", types="appointments") == [("appointment", appt["id"])]
+    # filters
+    assert search("report", tag_id=tag["id"]) == [("task", ids[0])]
+    assert search("report", category_id=cat["id"]) == [("task", ids[0])]
+    later = (datetime.combine(TODAY, dtime(0, 0)) + timedelta(days=7)).isoformat()
+    assert set(search("report", start=TOMORROW.isoformat(), end=later)) == {
+        ("task", ids[1]),
+        ("task", ids[3]),
+        ("appointment", appt["id"]),
+    }
+    # a recurring appointment matches any window one of its occurrences is in
+    week = datetime.combine(TOMORROW + timedelta(days=14), dtime(0, 0))
+    window = {"start": week.isoformat(), "end": (week + timedelta(days=1)).isoformat()}
+    assert search("board", **window) == [("appointment", appt["id"])]
+
+    pages = collect_pages(f"{API_URL}/search?q=report", 1)
+    assert [len(p) for p in pages] == [1, 1, 1, 1]
+    assert [(h["kind"], h["id"]) for p in pages for h in p] == search("report")
+
+    # the index follows updates and deletes
+    data = {"title": "Annual report", "due_date": TODAY.isoformat()}
+    assert requests.put(f"{API_URL}/tasks/{ids[2]}", json=data).status_code == 200
+    assert ("task", ids[2]) in search("annual")
+    assert search("reservation") == []
+    requests.delete(f"{API_URL}/tasks/{ids[3]}")
+    assert ("task", ids[3]) not in search("report")
+
+    # the task search matches word prefixes
+    r = requests.get(f"{API_URL}/tasks/search", params={"query": "Quarter"})
+    assert [t["id"] for t in r.json()] == [ids[0], ids[1]]
+    # and adds substring matches, which the index does not find, after them
+    r = requests.get(f"{API_URL}/tasks/search", params={"query": "uarte"})
+    assert [t["id"] for t in r.json()] == [ids[0], ids[1]]
+    data = {"title": "Port visit", "due_date": TODAY.isoformat()}
+    port = requests.post(f"{API_URL}/tasks", json=data).json()["id"]
+    r = requests.get(f"{API_URL}/tasks/search", params={"query": "port"})
+    assert [t["id"] for t in r.json()] == [port, ids[0], ids[1], ids[2]]
+
+    for params in ({"q": "?!"}, {"q": "x", "types": "x"}, {"q": "x", "cursor": "?"}):
+        assert requests.get(f"{API_URL}/search", params=params).status_code == 400
+
+
+def test_bulk_update_tasks():
+    tags = [
+        requests.post(f"{API_URL}/tags", json={"name": f"bulk{i}"}).json()["id"]
+        for i in range(3)
+    ]
+    ids = [
+        requests.post(
+            f"{API_URL}/tasks",
+            json={"title": f"B{i}", "due_date": TODAY.isoformat(), "tags": tags[:1]},
+        ).json()["id"]
+        for i in range(3)
+    ]
+    due = TOMORROW.isoformat()
+    items = [
+        {"id": ids[0], "data": {"title": "B0!", "due_date": due, "tags": tags[1:]}},
+        {"id": ids[1], "data": {"title": "B1!", "due_date": due, "priority": 5}},
+        {"id": 999999, "data": {"title": "missing", "due_date": due}},
+        {"id": ids[2], "data": {"title": "B2!", "due_date": due, "tags": [999999]}},
+    ]
+    r = requests.post(f"{API_URL}/tasks/bulk_update", json=items)
+    assert r.status_code == 200
+    updated = r.json()
+    assert [t["id"] for t in updated] == [ids[0], ids[1], ids[2]]
+    assert [t["title"] for t in updated] == ["B0!", "B1!", "B2!"]
+    assert {t["due_date"] for t in updated} == {due}
+    # tags are replaced when given, kept otherwise; unknown tags are skipped
+    assert sorted(t["id"] for t in updated[0]["tags"]) == tags[1:]
+    assert [t["id"] for t in updated[1]["tags"]] == tags[:1]
+    assert updated[1]["priority"] == 5
+    assert updated[2]["tags"] == []
+    stored = {t["id"]: t for t in requests.get(f"{API_URL}/tasks").json()}[ids[0]]
+    assert stored["title"] == "B0!"
+    assert sorted(t["id"] for t in stored["tags"]) == tags[1:]
+    assert [t["id"] for t in requests.get(f"{API_URL}/search?q=b1").json()] == [ids[1]]
+    assert requests.post(f"{API_URL}/tasks/bulk_update", json=[]).json() == []
+
+
+@pytest.mark.env(BULK_CHUNK_SIZE="2", SYNC_OVERLAP_SECONDS="0")
+def test_bulk_create_and_delete():
+    tag = requests.post(f"{API_URL}/tags", json={"name": "bulk"}).json()
+    due = TOMORROW.isoformat()
+    items = [
+        {"title": "Import 0", "due_date": due, "tags": [tag["id"], 999999]},
+        {"title": "Import 1"},
+        {"title": "Import 2", "due_date": due, "category_id": 999999},
+        "not an object",
+        {"title": "Import 4", "due_date": due},
+        {"title": "Import 5", "due_date": due, "priority": 5},
+    ]
+    r = requests.post(f"{API_URL}/tasks/bulk", json=items)
+    assert r.status_code == 200
+    result = r.json()
+    ids = result["ids"]
+    assert [i is not None for i in ids] == [True, False, False, False, True, True]
+    errors = {e["index"]: e["detail"] for e in result["errors"]}
+    assert sorted(errors) == [1, 2, 3]
+    assert "due_date" in errors[1]
+    assert errors[2] == "Category not found"
+    tasks = {t["id"]: t for t in requests.get(f"{API_URL}/tasks").json()}
+    assert [tasks[i]["title"] for i in ids if i] == ["Import 0", "Import 4", "Import 5"]
+    assert tasks[ids[0]]["tags"] == [tag]
+    assert tasks[ids[5]]["priority"] == 5
+
+    start = datetime.combine(TOMORROW, dtime(9, 0))
+    appointment = {
+        "title": "Bulk",
+        "start_time": start.isoformat(),
+        "end_time": (start + timedelta(hours=1)).isoformat(),
+    }
+    created = requests.post(
+        f"{API_URL}/appointments/bulk",
+        json=[appointment, {**appointment, "rrule": "FREQ=SOMETIMES"}, appointment],
+    ).json()
+    appointments = created["ids"]
+    assert appointments[1] is None and None not in appointments[::2]
+    assert created["errors"][0]["index"] == 1
+    assert created["errors"][0]["detail"].startswith("Invalid rrule")
+
+    url = f"{API_URL}/tasks/{ids[0]}/subtasks"
+    r = requests.post(f"{url}/bulk", json=[{"title": f"S{i}"} for i in range(3)])
+    subtasks = r.json()["ids"]
+    assert [s["id"] for s in requests.get(url).json()] == subtasks
+    r = requests.post(f"{API_URL}/tasks/999999/subtasks/bulk", json=[{"title": "S"}])
+    assert r.status_code == 404
+    r = requests.post(f"{url}/bulk_delete", json=[subtasks[0], 999999]).json()
+    assert r["ids"] == [subtasks[0], None]
+    assert r["errors"] == [{"index": 1, "detail": "Subtask not found"}]
+    assert [s["id"] for s in requests.get(url).json()] == subtasks[1:]
+
+    token = requests.get(f"{API_URL}/sync").json()["token"]
+    time.sleep(0.01)
+    r = requests.post(f"{API_URL}/tasks/bulk_delete", json=[ids[0], ids[4], 999999])
+    assert r.json()["ids"] == [ids[0], ids[4], None]
+    remaining = {t["id"] for t in requests.get(f"{API_URL}/tasks").json()}
+    assert ids[0] not in remaining and ids[4] not in remaining and ids[5] in remaining
+    assert requests.get(url).json() == []
+    deleted = requests.get(f"{API_URL}/sync", params={"since": token}).json()["deleted"]
+    assert sorted(deleted["tasks"]) == sorted([ids[0], ids[4]])
+    assert sorted(deleted["subtasks"]) == subtasks[1:]
+    hits = requests.get(f"{API_URL}/search", params={"q": "import"}).json()
+    assert [h["id"] for h in hits] == [ids[5]]
+
+    r = requests.post(f"{API_URL}/appointments/bulk_delete", json=appointments[::2])
+    assert r.json() == {"ids": appointments[::2], "errors": []}
+    assert requests.get(f"{API_URL}/appointments").json() == []
+
+
+@pytest.mark.env(ENABLE_QUERY_PROFILING="1", QUERY_LOG="test_tag_query.log")
+def test_tag_linking_query_count_constant():
+    tags = [
+        requests.post(f"{API_URL}/tags", json={"name": f"link{i}"}).json()["id"]
+        for i in range(10)
+    ]
+    cat = requests.post(
+        f"{API_URL}/categories", json={"name": "Linked", "color": "#abcdef"}
+    ).json()
+
+    def write(method, url, tag_ids):
+        clear_query_log("test_tag_query.log")
+        data = {
+            "title": "Linked",
+            "due_date": TOMORROW.isoformat(),
+            "category_id": cat["id"],
+            "tags": tag_ids,
+        }
+        r = requests.request(method, url, json=data)
+        assert r.status_code == 200
+        log = read_query_log("test_tag_query.log")
+        return sum(1 for line in log.splitlines() if "SELECT" in line), r.json()
+
+    write("POST", f"{API_URL}/tasks", tags[:1])  # loads the known category ids
+    none, task = write("POST", f"{API_URL}/tasks", [])
+    one, task = write("POST", f"{API_URL}/tasks", tags[:1])
+    assert one == none + 1  # the tags, nothing to validate them first
+    many, task = write("POST", f"{API_URL}/tasks", tags + [999999, tags[0]])
+    assert many == one
+    assert [t["id"] for t in task["tags"]] == tags
+    url = f"{API_URL}/tasks/{task['id']}"
+    assert write("PUT", url, tags[:1])[0] == write("PUT", url, tags)[0]
+
+    # tags and categories created later are known at once
+    tag = requests.post(f"{API_URL}/tags", json={"name": "later"}).json()
+    assert write("PUT", url, [tag["id"]])[1]["tags"] == [tag]
+    other = requests.post(
+        f"{API_URL}/categories", json={"name": "Later", "color": "#000000"}
+    ).json()
+    data = {"title": "x", "due_date": TOMORROW.isoformat(), "category_id": other["id"]}
+    assert requests.post(f"{API_URL}/tasks", json=data).status_code == 200
+    data["category_id"] = 999999
+    assert requests.post(f"{API_URL}/tasks", json=data).status_code == 404
+
+
+@pytest.mark.env(EXPORT_BATCH_SIZE="2", IMPORT_CHUNK_SIZE="2")
+def test_ndjson_export_and_import():
+    cat = requests.post(
+        f"{API_URL}/categories", json={"name": "Backup", "color": "#101010"}
+    ).json()
+    tags = [
+        requests.post(f"{API_URL}/tags", json={"name": f"b{i}"}).json()["id"]
+        for i in range(2)
+    ]
+    tasks = []
+    for i in range(3):
+        task = requests.post(
+            f"{API_URL}/tasks",
+            json={
+                "title": f"Backup {i}",
+                "due_date": TOMORROW.isoformat(),
+                "category_id": cat["id"],
+                "tags": tags[: i + 1],
+            },
+        ).json()
+        requests.post(f"{API_URL}/tasks/{task['id']}/subtasks", json={"title": "Step"})
+        tasks.append(task)
+    start = datetime.combine(TOMORROW, dtime(8, 0))
+    requests.post(
+        f"{API_URL}/tasks/{tasks[0]['id']}/focus_sessions",
+        json={"duration_minutes": 25, "start_time": start.isoformat()},
+    )
+    appt = requests.post(
+        f"{API_URL}/appointments",
+        json={
+            "title": "Weekly backup",
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=1)).isoformat(),
+            "rrule": "FREQ=WEEKLY;COUNT=3",
+        },
+    ).json()
+    skipped = (start + timedelta(days=7)).isoformat()
+    requests.delete(f"{API_URL}/appointments/{appt['id']}/occurrences/{skipped}")
+
+    r = requests.get(f"{API_URL}/export", params={"format": "ndjson"})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/x-ndjson"
+    assert r.headers["content-encoding"] == "gzip"  # decoded by requests
+    records = [json.loads(line) for line in r.text.splitlines()]
+    assert [r["type"] for r in records] == (
+        ["category"] + ["tag"] * 2 + ["task"] * 3 + ["appointment"]
+    )
+    exported = records[3]
+    assert exported["tags"] == tags[:1] and len(exported["focus_sessions"]) == 1
+    assert exported["subtasks"][0]["title"] == "Step"
+    assert records[-1]["overrides"][0]["cancelled"] is True
+    plain = requests.get(f"{API_URL}/export", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.text == r.text
+    assert requests.get(f"{API_URL}/export?format=xml").status_code == 400
+
+    # damage the data, then restore it from the gzipped export
+    requests.delete(f"{API_URL}/tasks/{tasks[1]['id']}")
+    requests.put(
+        f"{API_URL}/tasks/{tasks[0]['id']}",
+        json={"title": "Changed", "due_date": TODAY.isoformat(), "tags": tags},
+    )
+    requests.delete(f"{API_URL}/appointments/{appt['id']}")
+    body = gzip.compress(plain.content)
+    r = requests.post(f"{API_URL}/import", files={"file": ("backup.ndjson.gz", body)})
+    assert r.status_code == 200, r.text
+    result = r.json()
+    assert result["created"]["tasks"] == 1 and result["updated"]["tasks"] == 2
+    assert result["created"]["appointments"] == 1
+    assert result["updated"]["categories"] == 1
+    after = requests.get(f"{API_URL}/export", params={"format": "ndjson"}).text
+
+    def strip(value):
+        # the import stamps every row with its own updated_at
+        if isinstance(value, list):
+            return [strip(item) for item in value]
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items() if k != "updated_at"}
+        return value
+
+    def parse(text):
+        return strip([json.loads(line) for line in text.splitlines()])
+
+    assert parse(after) == parse(plain.text)
+    window = {
+        "start": start.isoformat(),
+        "end": (start + timedelta(days=30)).isoformat(),
+    }
+    assert len(requests.get(f"{API_URL}/appointments", params=window).json()) == 2
+    hits = requests.get(f"{API_URL}/search", params={"q": "backup"}).json()
+    assert len(hits) == 4
+
+    # an invalid line rejects the whole file
+    lines = plain.text.splitlines()
+    broken = "\n".join([lines[0].replace("Backup", "Renamed"), '{"type": "task"}'])
+    r = requests.post(f"{API_URL}/import", files={"file": ("b.ndjson", broken)})
+    assert r.status_code == 400
+    assert r.json()["detail"].startswith("Line 2")
+    assert requests.get(f"{API_URL}/categories").json()[0]["name"] == "Backup"
+
+
+@pytest.mark.env(COLUMNAR_ROW_GROUP_SIZE="2")
+def test_focus_session_columnar_export():
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    from pyarrow import ipc
+
+    cat = requests.post(
+        f"{API_URL}/categories", json={"name": "Deep", "color": "#202020"}
+    ).json()
+    task = requests.post(
+        f"{API_URL}/tasks",
+        json={
+            "title": "Analyse",
+            "due_date": TOMORROW.isoformat(),
+            "priority": 2,
+            "estimated_difficulty": 4,
+            "category_id": cat["id"],
+        },
+    ).json()
+    start = datetime.combine(TOMORROW, dtime(8, 0))
+    for hour in range(5):
+        requests.post(
+            f"{API_URL}/tasks/{task['id']}/focus_sessions",
+            json={
+                "duration_minutes": 25,
+                "start_time": (start + timedelta(hours=hour)).isoformat(),
+            },
+        )
+
+    r = requests.get(f"{API_URL}/focus_sessions/export")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/vnd.apache.parquet"
+    parquet = pq.ParquetFile(pa.BufferReader(r.content))
+    assert parquet.metadata.num_row_groups == 3
+    rows = parquet.read().to_pylist()
+    assert [row["start_time"].hour for row in rows] == [8, 9, 10, 11, 12]
+    assert rows[0]["category"] == "Deep" and rows[0]["estimated_difficulty"] == 4
+    assert rows[0]["priority"] == 2 and rows[0]["completed"] is False
+
+    window = {
+        "format": "arrow",
+        "start": (start + timedelta(hours=1)).isoformat(),
+        "end": (start + timedelta(hours=3)).isoformat(),
+    }
+    r = requests.get(f"{API_URL}/focus_sessions/export", params=window)
+    assert r.status_code == 200
+    table = ipc.open_stream(r.content).read_all()
+    assert [t.hour for t in table.column("start_time").to_pylist()] == [9, 10]
+    other = {"category_id": cat["id"] + 1, "format": "arrow"}
+    r = requests.get(f"{API_URL}/focus_sessions/export", params=other)
+    assert ipc.open_stream(r.content).read_all().num_rows == 0
+    assert (
+        requests.get(f"{API_URL}/focus_sessions/export?format=csv").status_code == 400
+    )
+
+
+@pytest.mark.env(ENABLE_QUERY_PROFILING="1", QUERY_LOG="test_analytics_query.log")
+def test_productivity_analytics():
+    cat = requests.post(
+        f"{API_URL}/categories", json={"name": "Study", "color": "#303030"}
+    ).json()
+    studied = requests.post(
+        f"{API_URL}/tasks",
+        json={
+            "title": "Read",
+            "due_date": TOMORROW.isoformat(),
+            "category_id": cat["id"],
+        },
+    ).json()
+    other = requests.post(
+        f"{API_URL}/tasks", json={"title": "Chores", "due_date": TOMORROW.isoformat()}
+    ).json()
+    start = datetime.combine(TOMORROW, dtime(9, 0))
+    sessions = [
+        (studied, start, True),
+        (studied, start + timedelta(hours=1), True),
+        (other, start + timedelta(minutes=30), False),
+        (studied, start + timedelta(days=1), False),
+    ]
+    for task, begin, completed in sessions:
+        fs = requests.post(
+            f"{API_URL}/tasks/{task['id']}/focus_sessions",
+            json={"duration_minutes": 25, "start_time": begin.isoformat()},
+        ).json()
+        if completed:
+            requests.put(
+                f"{API_URL}/tasks/{task['id']}/focus_sessions/{fs['id']}",
+                json={"completed": True},
+            )
+
+    url = f"{API_URL}/analytics/productivity"
+    r = requests.get(url)
+    assert r.status_code == 200
+    report = r.json()
+    assert report["planned_sessions"] == 4 and report["completed_sessions"] == 2
+    assert report["completion_rate"] == 0.5 and report["focus_minutes"] == 50
+    assert [(h["hour"], h["sessions"], h["completed"]) for h in report["by_hour"]] == [
+        (9, 3, 1),
+        (10, 1, 1),
+    ]
+    weekdays = {w["weekday"]: w["completion_rate"] for w in report["by_weekday"]}
+    assert weekdays == {TOMORROW.weekday(): 0.6667, (TOMORROW.weekday() + 1) % 7: 0}
+    categories = {c["category"]: c for c in report["by_category"]}
+    assert categories["Study"]["sessions"] == 3
+    assert categories["Study"]["focus_minutes"] == 50
+    assert categories[None]["completion_rate"] == 0
+    assert report["daily"][0] == {
+        "day": TOMORROW.isoformat(),
+        "planned_sessions": 3,
+        "completed_sessions": 2,
+        "planned_minutes": 75,
+        "focus_minutes": 50,
+    }
+
+    window = {
+        "start": start.isoformat(),
+        "end": (start + timedelta(days=1)).isoformat(),
+    }
+    r = requests.get(url, params={**window, "category_id": cat["id"]})
+    assert r.json()["planned_sessions"] == 2
+    assert r.json()["by_category"][0]["completion_rate"] == 1
+    r = requests.get(url, headers={"If-None-Match": r.headers["ETag"]}, params=window)
+    assert r.status_code == 200
+    etag = requests.get(url).headers["ETag"]
+    assert requests.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    # the report is aggregated in SQL: more sessions cost no more queries
+    requests.get(url, params={"category_id": 0})
+    queries = count_queries("test_analytics_query.log", f"{url}?start=2000-01-01")
+    for hour in range(5):
+        requests.post(
+            f"{API_URL}/tasks/{other['id']}/focus_sessions",
+            json={
+                "duration_minutes": 25,
+                "start_time": (start + timedelta(hours=hour)).isoformat(),
+            },
+        )
+    assert (
+        count_queries("test_analytics_query.log", f"{url}?start=2000-01-01") == queries
+    )
+
+
+@pytest.mark.env(ENABLE_QUERY_PROFILING="1", QUERY_LOG="test_stats_query.log")
+def test_stats_counters_follow_writes():
+    stats_url = f"{API_URL}/admin/stats"
+    assert requests.get(stats_url).json()["tasks"] == 0
+    task = requests.post(
+        f"{API_URL}/tasks", json={"title": "Counted", "due_date": TOMORROW.isoformat()}
+    ).json()
+    for i in range(2):
+        requests.post(f"{API_URL}/tasks/{task['id']}/subtasks", json={"title": f"S{i}"})
+    requests.post(
+        f"{API_URL}/tasks/{task['id']}/focus_sessions", json={"duration_minutes": 25}
+    )
+    created = requests.post(
+        f"{API_URL}/tasks/bulk",
+        json=[
+            {"title": f"Bulk {i}", "due_date": TOMORROW.isoformat()} for i in range(3)
+        ],
+    ).json()["ids"]
+    requests.post(f"{API_URL}/categories", json={"name": "C", "color": "#000000"})
+    stats = requests.get(stats_url).json()
+    assert stats == {
+        "tasks": 4,
+        "appointments": 0,
+        "categories": 1,
+        "focus_sessions": 1,
+        "subtasks": 2,
+        "users": 0,
+    }
+
+    # deleting a task removes its subtasks and focus sessions as well
+    requests.delete(f"{API_URL}/tasks/{task['id']}")
+    requests.post(f"{API_URL}/tasks/bulk_delete", json=created[:2])
+    stats = requests.get(stats_url).json()
+    assert (stats["tasks"], stats["subtasks"], stats["focus_sessions"]) == (1, 0, 0)
+    metrics = requests.get(f"{API_URL}/admin/metrics").text
+    assert "tasks_total 1.0" in metrics and "subtasks_total 0.0" in metrics
+
+    # a scrape reads the counters instead of counting the tables
+    requests.post(
+        f"{API_URL}/tasks", json={"title": "Fresh", "due_date": TOMORROW.isoformat()}
+    )
+    clear_query_log("test_stats_query.log")
+    assert requests.get(stats_url).json()["tasks"] == 2
+    log = read_query_log("test_stats_query.log")
+    assert "row_counts" in log and "count(*)" not in log.lower()
+
+
+@pytest.mark.env(METRICS_RECONCILE_SECONDS="0")
+def test_stats_counters_reconcile():
+    requests.post(
+        f"{API_URL}/tasks", json={"title": "One", "due_date": TOMORROW.isoformat()}
+    )
+    assert requests.get(f"{API_URL}/admin/stats").json()["tasks"] == 1
+
+
+def test_request_metrics():
+    for _ in range(3):
+        assert requests.get(f"{API_URL}/tasks").status_code == 200
+    requests.post(f"{API_URL}/tasks", json={"title": "Bad"})
+    requests.get(f"{API_URL}/no/such/path")
+    requests.put(f"{API_URL}/categories/12345", json={"name": "X", "color": "#000000"})
+
+    samples = {}
+    for line in requests.get(f"{API_URL}/admin/metrics").text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    tasks = 'method="GET",route="/tasks"'
+    assert samples[f'http_requests_total{{{tasks},status="200"}}'] == 3
+    assert (
+        samples['http_requests_total{method="POST",route="/tasks",status="422"}'] == 1
+    )
+    assert (
+        samples['http_requests_total{method="GET",route="unmatched",status="404"}'] == 1
+    )
+    category = 'method="PUT",route="/categories/{category_id}"'
+    assert samples[f'http_requests_total{{{category},status="404"}}'] == 1
+    assert samples[f"http_request_duration_seconds_count{{{tasks}}}"] == 3
+    assert samples[f"http_response_size_bytes_sum{{{tasks}}}"] == 6  # "[]" each
+    # the scrape itself is in flight
+    assert samples['http_requests_in_flight{method="GET"}'] == 1
+    assert samples[f"http_request_queries_count{{{tasks}}}"] == 3
+    # every listing reads the rate limit, table versions and rows
+    assert samples[f"http_request_queries_sum{{{tasks}}}"] >= 3 * 3
+    assert samples['db_pool_checkout_seconds_count{engine="primary"}'] > 0
@@ -20,10 +20,15 @@ def wait_for_api(url: str, timeout: float = 5.0):
     return False
 
 
+def remove_db_files():
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists("appointments.db" + suffix):
+            os.remove("appointments.db" + suffix)
+
+
 @pytest.fixture
 def server():
-    if os.path.exists("appointments.db"):
-        os.remove("appointments.db")
+    remove_db_files()
     env = os.environ.copy()
     env["DISABLE_AUTH"] = "0"
     env["RATE_LIMIT"] = "1000"
@@ -32,8 +37,7 @@ def server():
     yield
     proc.terminate()
     proc.wait()
-    if os.path.exists("appointments.db"):
-        os.remove("appointments.db")
+    remove_db_files()
 
 
 def test_register_login(server):
@@ -1,3 +1,4 @@
+import json
 import os
 import subprocess
 import sys
@@ -28,17 +29,20 @@ def wait_for_api(url: str, timeout: float = 5.0):
     return False
 
 
+def remove_db_files():
+    for suffix in ("", "-wal", "-shm"):
+        Path("appointments.db" + suffix).unlink(missing_ok=True)
+
+
 @pytest.fixture
 def server():
-    if Path("appointments.db").exists():
-        Path("appointments.db").unlink()
+    remove_db_files()
     proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app"])
     assert wait_for_api(f"{API_URL}/appointments")
     yield
     proc.terminate()
     proc.wait()
-    if Path("appointments.db").exists():
-        Path("appointments.db").unlink()
+    remove_db_files()
 
 
 def test_cli_add_and_list(server, capsys):
@@ -73,3 +77,25 @@ def test_cli_export_import(tmp_path, capsys):
     with open(os.environ["CONFIG_FILE"], "r", encoding="utf-8") as f:
         data = yaml.safe_load(f)
     assert data == {k: str(v) for k, v in updated.items()}
+
+
+def test_cli_sync(server, tmp_path, capsys, monkeypatch):
+    monkeypatch.delenv("CONFIG_FILE", raising=False)
+    mirror = tmp_path / "mirror.json"
+    cli = TaskCLI()
+    cli.run(["add", "Mirrored", "--due-date", TODAY])
+    cli.run(["sync", "--path", str(mirror)])
+    captured = capsys.readouterr()
+    assert "Synced 1 changed" in captured.out
+    data = json.loads(mirror.read_text(encoding="utf-8"))
+    (task,) = data["tables"]["tasks"].values()
+    assert task["title"] == "Mirrored"
+
+    import requests
+
+    requests.delete(f"{API_URL}/tasks/{task['id']}")
+    cli.run(["sync", "--path", str(mirror)])
+    captured = capsys.readouterr()
+    assert "1 deleted" in captured.out
+    data = json.loads(mirror.read_text(encoding="utf-8"))
+    assert data["tables"]["tasks"] == {}
@@ -5,11 +5,14 @@ import time
 from datetime import date
 from datetime import time as dtime
 from datetime import timedelta
+from pathlib import Path
 
 import requests
+import streamlit as st
 from streamlit.testing.v1 import AppTest
 
 API_URL = "http://localhost:8000"
+APP_PATH = str(Path(__file__).resolve().parent.parent / "streamlit_app.py")
 TODAY = date.today()
 TOMORROW = TODAY + timedelta(days=1)
 
@@ -25,10 +28,24 @@ def wait_for_api(url: str, timeout: float = 5.0):
     return False
 
 
+def remove_db_files():
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists("appointments.db" + suffix):
+            os.remove("appointments.db" + suffix)
+
+
 def start_server():
-    if os.path.exists("appointments.db"):
-        os.remove("appointments.db")
-    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app"])
+    remove_db_files()
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--timeout-graceful-shutdown",
+            "5",
+        ]
+    )
     assert wait_for_api(f"{API_URL}/appointments")
     return proc
 
@@ -36,14 +53,13 @@ def start_server():
 def stop_server(proc):
     proc.terminate()
     proc.wait()
-    if os.path.exists("appointments.db"):
-        os.remove("appointments.db")
+    remove_db_files()
 
 
 def test_full_gui_interaction():
     proc = start_server()
     try:
-        at = AppTest.from_file("streamlit_app.py").run()
+        at = AppTest.from_file(APP_PATH).run()
 
         # enable dark mode
         at = at.checkbox(key="dark-mode").check().run()
@@ -211,3 +227,115 @@ def test_full_gui_interaction():
 
     finally:
         stop_server(proc)
+
+
+def test_gui_loads_tasks_lazily(monkeypatch):
+    proc = start_server()
+    try:
+        for title in ["First", "Second"]:
+            requests.post(
+                f"{API_URL}/tasks",
+                json={"title": title, "due_date": TOMORROW.isoformat()},
+            )
+        monkeypatch.setenv("GUI_PAGE_SIZE", "1")
+        at = AppTest.from_file(APP_PATH).run()
+        labels = [e.label for e in at.expander]
+        assert "First" in labels and "Second" not in labels
+
+        at = at.button(key="more-tasks").click().run()
+        labels = [e.label for e in at.expander]
+        assert "First" in labels and "Second" in labels
+        assert not any(b.key == "more-tasks" for b in at.button)
+    finally:
+        stop_server(proc)
+
+
+def test_gui_calendar_fetches_visible_window():
+    proc = start_server()
+    try:
+        for title, day in [("Near", TODAY), ("Far", TODAY + timedelta(days=60))]:
+            requests.post(
+                f"{API_URL}/appointments",
+                json={
+                    "title": title,
+                    "start_time": f"{day.isoformat()}T10:00:00",
+                    "end_time": f"{day.isoformat()}T11:00:00",
+                },
+            )
+        at = AppTest.from_file(APP_PATH).run()
+        events = [m.value for m in at.tabs[3].markdown]
+        assert "- Near - 10:00 - 11:00" in events
+        assert not any("Far" in e for e in events)
+        # the current window and both adjacent windows are cached
+        assert len(at.session_state["calendar_cache"]) == 3
+
+        at = at.button(key="cal-next").click().run()
+        events = [m.value for m in at.tabs[3].markdown]
+        assert not any("Near" in e for e in events)
+        assert len(at.session_state["calendar_cache"]) == 4
+    finally:
+        stop_server(proc)
+
+
+def test_gui_revalidates_with_etag():
+    proc = start_server()
+    try:
+        requests.post(
+            f"{API_URL}/tasks",
+            json={"title": "Cached", "due_date": TOMORROW.isoformat()},
+        )
+        at = AppTest.from_file(APP_PATH).run()
+        cache = at.session_state["etag_cache"]
+        assert any(path == "/tasks" for path, _ in cache)
+        etags = {key: value[0] for key, value in cache.items()}
+
+        at = at.button(key="refresh-tasks").click().run()
+        assert any(e.label == "Cached" for e in at.expander)
+        cache = at.session_state["etag_cache"]
+        assert {key: value[0] for key, value in cache.items()} == etags
+
+        requests.post(
+            f"{API_URL}/tasks",
+            json={"title": "Fresh", "due_date": TOMORROW.isoformat()},
+        )
+        at = at.button(key="refresh-tasks").click().run()
+        assert any(e.label == "Fresh" for e in at.expander)
+    finally:
+        stop_server(proc)
+
+
+def test_gui_live_events_skip_revalidation(monkeypatch):
+    monkeypatch.setenv("GUI_LIVE_EVENTS", "1")
+    monkeypatch.setenv("ENABLE_QUERY_PROFILING", "1")
+    monkeypatch.setenv("QUERY_LOG", "test_gui_events.log")
+    st.cache_resource.clear()
+    proc = start_server()
+    try:
+        requests.post(
+            f"{API_URL}/tasks",
+            json={"title": "Known", "due_date": TOMORROW.isoformat()},
+        )
+        at = AppTest.from_file(APP_PATH).run()
+        time.sleep(1)  # let the change feed connect
+        at = at.run()
+
+        with open("test_gui_events.log", "w", encoding="utf-8"):
+            pass
+        at = at.run()
+        assert any(e.label == "Known" for e in at.expander)
+        with open("test_gui_events.log", encoding="utf-8") as f:
+            assert "table_versions" not in f.read()
+
+        requests.post(
+            f"{API_URL}/tasks",
+            json={"title": "Pushed", "due_date": TOMORROW.isoformat()},
+        )
+        time.sleep(0.5)
+        at = at.run()
+        assert any(e.label == "Pushed" for e in at.expander)
+    finally:
+        # stop the ChangeFeed before the server it is subscribed to
+        st.cache_resource.clear()
+        stop_server(proc)
+        if os.path.exists("test_gui_events.log"):
+            os.remove("test_gui_events.log")
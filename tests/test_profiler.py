@@ -1,42 +1,13 @@
-import os
-import subprocess
-import sys
+import json
 import time
 from datetime import date, timedelta
 from pathlib import Path
 
 import pytest
 import requests
+from conftest import API_URL, wait_for_api
 
-API_URL = "http://localhost:8000"
-
-
-def wait_for_api(url: str, timeout: float = 5.0):
-    start = time.time()
-    while time.time() - start < timeout:
-        try:
-            if requests.get(url).status_code == 200:
-                return True
-        except requests.exceptions.ConnectionError:
-            time.sleep(0.1)
-    return False
-
-
-@pytest.fixture(autouse=True)
-def start_server(request):
-    if os.path.exists("appointments.db"):
-        os.remove("appointments.db")
-    env = os.environ.copy()
-    marker = request.node.get_closest_marker("env")
-    if marker:
-        env.update(marker.kwargs)
-    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app"], env=env)
-    assert wait_for_api(f"{API_URL}/appointments")
-    yield
-    proc.terminate()
-    proc.wait()
-    if os.path.exists("appointments.db"):
-        os.remove("appointments.db")
+pytestmark = pytest.mark.usefixtures("start_server")
 
 
 def wait_for_log(path: Path, timeout: float = 5.0) -> bool:
@@ -55,8 +26,6 @@ TOMORROW = TODAY + timedelta(days=1)
 @pytest.mark.env(ENABLE_QUERY_PROFILING="1", QUERY_LOG="test_query.log")
 def test_query_log_created():
     log_path = Path("test_query.log")
-    if log_path.exists():
-        log_path.unlink()
     r = requests.get(f"{API_URL}/appointments")
     assert r.status_code == 200
     assert wait_for_api(f"{API_URL}/appointments")
@@ -64,3 +33,71 @@ def test_query_log_created():
     with log_path.open("r", encoding="utf-8") as f:
         content = f.read()
     assert "SELECT" in content
+
+
+def wait_for_report(predicate, timeout: float = 5.0, **params) -> dict:
+    start = time.time()
+    while True:
+        report = requests.get(f"{API_URL}/admin/queries", params=params).json()
+        if predicate(report) or time.time() - start > timeout:
+            return report
+        time.sleep(0.1)
+
+
+@pytest.mark.env(ENABLE_QUERY_PROFILING="1", QUERY_LOG="test_report_query.log")
+def test_query_report():
+    for i in range(3):
+        task = {"title": f"Profiled {i}", "due_date": TOMORROW.isoformat()}
+        assert requests.post(f"{API_URL}/tasks", json=task).status_code == 200
+        assert requests.get(f"{API_URL}/tasks", params={"limit": i + 1}).ok
+
+    def listing(report):
+        return [
+            s
+            for s in report["statements"]
+            if s["statement"].startswith("SELECT tasks.id")
+            and "GET /tasks" in s["routes"]
+        ]
+
+    report = wait_for_report(
+        lambda r: sum(s["count"] for s in listing(r)) >= 3, order="count", limit=100
+    )
+    assert report["enabled"] is True and report["sample_rate"] == 1
+    assert report["dropped"] == 0
+    stats = listing(report)
+    # the limits are bound parameters: one fingerprint for all three listings
+    assert len(stats) == 1 and stats[0]["routes"]["GET /tasks"] == 3
+    assert "LIMIT ?" in stats[0]["statement"]
+    assert 0 < stats[0]["p50_ms"] <= stats[0]["p95_ms"] <= stats[0]["max_ms"]
+    counts = [s["count"] for s in report["statements"]]
+    assert counts == sorted(counts, reverse=True)
+    assert any("(middleware)" in s["routes"] for s in report["statements"])
+    top = requests.get(f"{API_URL}/admin/queries", params={"limit": 2}).json()
+    assert len(top["statements"]) == 2
+    assert requests.get(f"{API_URL}/admin/queries?order=name").status_code == 400
+
+    log_path = Path("test_report_query.log")
+    assert wait_for_log(log_path)
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert {"time", "ms", "route", "fingerprint", "statement"} <= set(records[0])
+    fingerprint = stats[0]["fingerprint"]
+    assert sum(r["fingerprint"] == fingerprint for r in records) >= 3
+
+
+@pytest.mark.env(ENABLE_QUERY_PROFILING="1", QUERY_PROFILING_SAMPLE_RATE="0")
+def test_query_sampling():
+    task = {"title": "Unsampled", "due_date": TOMORROW.isoformat()}
+    assert requests.post(f"{API_URL}/tasks", json=task).status_code == 200
+    time.sleep(0.3)
+    report = requests.get(f"{API_URL}/admin/queries").json()
+    assert report["enabled"] is True and report["statements"] == []
+
+
+def test_query_report_disabled():
+    report = requests.get(f"{API_URL}/admin/queries").json()
+    assert report == {
+        "enabled": False,
+        "sample_rate": 1.0,
+        "dropped": 0,
+        "statements": [],
+    }
@@ -0,0 +1,61 @@
+import sqlite3
+from contextlib import closing
+from datetime import date
+
+import pytest
+import requests
+from conftest import API_URL, remove_db_files
+from sqlalchemy import create_engine
+
+pytestmark = pytest.mark.usefixtures("start_server")
+
+TODAY = date.today()
+REPLICA = "replica.db"
+
+
+@pytest.fixture
+def server_env(server_env):
+    """Point the server at a replica database with the primary's schema."""
+    remove_db_files(REPLICA)
+    from app import models
+
+    replica = create_engine(f"sqlite:///./{REPLICA}")
+    models.Base.metadata.create_all(bind=replica)
+    replica.dispose()
+    server_env.setdefault("READ_DATABASE_URL", f"sqlite:///./{REPLICA}")
+    yield server_env
+    remove_db_files(REPLICA)
+
+
+def copy_primary_to_replica():
+    with closing(sqlite3.connect("appointments.db")) as src, closing(
+        sqlite3.connect(REPLICA)
+    ) as dest:
+        src.backup(dest)
+
+
+def test_reads_use_replica():
+    task = {"title": "Primary", "due_date": TODAY.isoformat()}
+    r = requests.post(f"{API_URL}/tasks", json=task)
+    assert r.status_code == 200
+
+    r = requests.get(f"{API_URL}/tasks")
+    assert r.status_code == 200
+    assert r.json() == []
+
+    copy_primary_to_replica()
+    r = requests.get(f"{API_URL}/tasks")
+    assert [t["title"] for t in r.json()] == ["Primary"]
+    r = requests.get(f"{API_URL}/admin/stats")
+    assert r.json()["tasks"] == 1
+
+
+@pytest.mark.env(READ_DATABASE_URL="sqlite:////nonexistent/dir/replica.db")
+def test_replica_fallback_to_primary():
+    task = {"title": "Primary", "due_date": TODAY.isoformat()}
+    r = requests.post(f"{API_URL}/tasks", json=task)
+    assert r.status_code == 200
+
+    r = requests.get(f"{API_URL}/tasks")
+    assert r.status_code == 200
+    assert [t["title"] for t in r.json()] == ["Primary"]